@@ -3,24 +3,25 @@ Application File
 """
 import csv
 import flask
+import hashlib
 import flask.logging
 from flask import Flask, Response, make_response, request, render_template, redirect, url_for, session
 from io import StringIO
 import logging
 import os
-import random
 import re
 import sys
+import time
 import traceback
 import urllib.parse
 import requests
-import threading
 from wtforms import ValidationError
 from flask_wtf.csrf import CSRFProtect
 
 from webapp import default_config
-from webapp.common import readfile, to_xml_bytes, to_json_bytes, Filters, support_cors, simplify_attr_list, is_null, \
-    escape, cache_control_private, PreJSON, is_true, GRIDTYPE_1, GRIDTYPE_2, NamespacesFilters
+from webapp.common import readfile, iter_xml_bytes, to_xml_bytes, to_json_bytes, Filters, support_cors, simplify_attr_list, is_null, \
+    escape, cache_control_private, PreJSON, is_true, GRIDTYPE_1, GRIDTYPE_2, NamespacesFilters, set_json_backend, \
+    set_yaml_cache_dir
 from webapp.flask_common import create_accepted_response
 from webapp.exceptions import DataError, ResourceNotRegistered, ResourceMissingServices
 from webapp.forms import GenerateDowntimeForm, GenerateResourceGroupDowntimeForm, GenerateProjectForm
@@ -65,6 +66,11 @@ if "TOPOLOGY_CONFIG" in os.environ:
     app.config.from_envvar("TOPOLOGY_CONFIG", silent=False)
 _verify_config(app.config)
 
+if app.config.get("JSON_BACKEND"):
+    set_json_backend(app.config["JSON_BACKEND"])
+if app.config.get("YAML_CACHE_DIR"):
+    set_yaml_cache_dir(app.config["YAML_CACHE_DIR"])
+
 if "AUTH" in app.config:
     if app.debug:
         default_authorized = app.config["AUTH"]
@@ -119,32 +125,11 @@ csrf = CSRFProtect()
 csrf.init_app(app)
 
 #############################################################################
-# Background update thread
-# Run when the topology cache is 2/3 to expiration
-bg_update_freq = max(global_data.topology.cache_lifetime*2/3, 60) # seconds
-bg_update_thread = threading.Thread()
-
-def bg_update_run():
-    '''Background update task'''
-    app.logger.debug('Background update started')
-    global_data.update_topology()
-
-    # Add +/- 10% random offset to avoid thundering herds
-    delay = bg_update_freq
-    delay *= random.uniform(0.9, 1.1)
-
-    # Set next run
-    global bg_update_thread
-    bg_update_thread = threading.Timer(delay, bg_update_run, ())
-    bg_update_thread.daemon = True
-    bg_update_thread.start()
-    app.logger.info('Background update complete')
-
-# Start background update thread
-bg_update_thread = threading.Timer(bg_update_freq, bg_update_run, ())
-# Make it a daemon thread, so interpreter won't wait on it when exiting
-bg_update_thread.daemon = True
-bg_update_thread.start()
+# Background refresh
+# Refresh all the data in a background thread -- the LDAP data (comanage contacts, CILogon SSH keys,
+# LIGO DNs) and everything loaded from the topology and contact repos -- so no request has to wait
+# on an LDAP query, a git pull, or parsing the data
+global_data.start_background_refresh()
 #############################################################################
 
 
@@ -154,7 +139,7 @@ def _fix_unicode(text):
 
 @app.after_request
 def set_cache_control(response):
-    if response.status_code == 200:
+    if response.status_code in (200, 304):
         # Cache results for 300s
         response.cache_control.max_age = 300
         # Serve an expired entry for up to 100s while refreshing in the background
@@ -322,7 +307,8 @@ def institutions():
 
 @app.route('/miscproject/xml')
 def miscproject_xml():
-    return Response(to_xml_bytes(global_data.get_projects()), mimetype='text/xml')
+    projects = global_data.get_projects()
+    return _get_cached_response((request.path,), lambda: iter_xml_bytes(projects), mimetype='text/xml')
 
 
 @app.route('/miscproject/json')
@@ -335,8 +321,13 @@ def miscproject_json():
 @app.route('/miscsite/json')
 @support_cors
 def miscsite_json():
-    sites = {name: site.get_tree() for name, site in global_data.get_topology().sites.items()}
-    return Response(to_json_bytes(sites), mimetype='application/json')
+    topology = global_data.get_topology()
+
+    def get_json():
+        sites = {name: site.get_tree() for name, site in topology.sites.items()}
+        return to_json_bytes(sites)
+
+    return _get_cached_response((request.path,), get_json, mimetype='application/json')
 
 
 @app.route('/miscfacility/json')
@@ -348,19 +339,22 @@ def miscfacility_json():
 @app.route('/miscresource/json')
 @support_cors
 def miscresource_json():
-    resources = {}
     topology = global_data.get_topology()
-    for rg in topology.rgs.values():
-        for resource in rg.resources_by_name.values():
-            resources[resource.name] = {
-                "Name": resource.name,
-                "Site": rg.site.name,
-                "Facility": rg.site.facility.name,
-                "ResourceGroup": rg.name,
-                **resource.get_tree()
-            }
 
-    return Response(to_json_bytes(resources), mimetype='application/json')
+    def get_json():
+        resources = {}
+        for rg in topology.rgs.values():
+            for resource in rg.resources_by_name.values():
+                resources[resource.name] = {
+                    "Name": resource.name,
+                    "Site": rg.site.name,
+                    "Facility": rg.site.facility.name,
+                    "ResourceGroup": rg.name,
+                    **resource.get_tree()
+                }
+        return to_json_bytes(resources)
+
+    return _get_cached_response((request.path,), get_json, mimetype='application/json')
 
 @app.route('/vosummary/xml')
 def vosummary_xml():
@@ -380,7 +374,8 @@ def rgsummary_xml():
 
 @app.route('/rgdowntime/xml')
 def rgdowntime_xml():
-    return _get_xml_or_fail(global_data.get_topology().get_downtimes, request.args)
+    topology = global_data.get_topology()
+    return _get_xml_or_fail(topology.get_downtimes, request.args, extra_key=(topology.downtime_epoch(),))
 
 
 @app.route('/rgdowntime/ical')
@@ -389,7 +384,7 @@ def rgdowntime_ical():
         filters = get_filters_from_args(request.args)
     except InvalidArgumentsError as e:
         return Response("Invalid arguments: " + str(e), status=400)
-    response = make_response(global_data.get_topology().get_downtimes_ical(False, filters).to_ical())
+    response = make_response(global_data.get_topology().get_downtimes_ical_bytes(False, filters))
     response.headers.set("Content-Type", "text/calendar")
     response.headers.set("Content-Disposition", "attachment", filename="downtime.ics")
     return response
@@ -448,8 +443,10 @@ def cache_grid_mapfile():
     if not fqdn:
         return Response("FQDN of cache server required in the 'fqdn' argument", status=400)
     try:
-        return Response(stashcache.generate_cache_grid_mapfile(global_data, fqdn, suppress_errors=False),
-                        mimetype="text/plain")
+        grid_mapfile = global_data.get_stashcache_artifact(
+            ("cache_grid_mapfile", fqdn),
+            lambda: stashcache.generate_cache_grid_mapfile(global_data, fqdn, suppress_errors=False))
+        return Response(grid_mapfile, mimetype="text/plain")
     except ResourceNotRegistered as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -487,8 +484,10 @@ def origin_grid_mapfile():
     if not fqdn:
         return Response("FQDN of origin server required in the 'fqdn' argument", status=400)
     try:
-        return Response(stashcache.generate_origin_grid_mapfile(global_data, fqdn, suppress_errors=False),
-                        mimetype="text/plain")
+        grid_mapfile = global_data.get_stashcache_artifact(
+            ("origin_grid_mapfile", fqdn),
+            lambda: stashcache.generate_origin_grid_mapfile(global_data, fqdn, suppress_errors=False))
+        return Response(grid_mapfile, mimetype="text/plain")
     except ResourceNotRegistered as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -517,10 +516,14 @@ def scitokens():
 
     try:
         if cache_fqdn:
-            cache_scitokens = stashcache.generate_cache_scitokens(global_data, cache_fqdn, suppress_errors=False)
+            cache_scitokens = global_data.get_stashcache_artifact(
+                ("cache_scitokens", cache_fqdn),
+                lambda: stashcache.generate_cache_scitokens(global_data, cache_fqdn, suppress_errors=False))
             return Response(cache_scitokens, mimetype="text/plain")
         elif origin_fqdn:
-            origin_scitokens = stashcache.generate_origin_scitokens(global_data, origin_fqdn, suppress_errors=False)
+            origin_scitokens = global_data.get_stashcache_artifact(
+                ("origin_scitokens", origin_fqdn),
+                lambda: stashcache.generate_origin_scitokens(global_data, origin_fqdn, suppress_errors=False))
             return Response(origin_scitokens, mimetype="text/plain")
     except ResourceNotRegistered as e:
         return Response("# {}\n"
@@ -557,8 +560,11 @@ def stashcache_namespaces_json():
         filters.itb = is_true(request.args.get("itb", False))
 
     try:
-        return Response(to_json_bytes(stashcache.get_namespaces_info(global_data, filters=filters)),
-                        mimetype='application/json')
+        # Which caches and origins are down depends on the current time, not just the data
+        namespaces_json = global_data.get_stashcache_artifact(
+            ("namespaces_json", filters.get_canonical(), global_data.get_topology().downtime_epoch()),
+            lambda: to_json_bytes(stashcache.get_namespaces_info(global_data, filters=filters)))
+        return Response(namespaces_json, mimetype='application/json')
     except ResourceNotRegistered as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -586,7 +592,7 @@ def oasis_managers():
     if not cilogon_pass:
         return Response("CILOGON_LDAP_PASSFILE not configured; "
                         "OASIS Managers info unavailable", status=503)
-    mgrs = get_oasis_manager_endpoint_info(global_data, vo, cilogon_pass)
+    mgrs = get_oasis_manager_endpoint_info(global_data, vo)
     return Response(to_json_bytes(mgrs), mimetype='application/json')
 
 
@@ -594,15 +600,18 @@ def _get_cache_authfile(public_only):
     if not stashcache:
         return Response("Can't get authfile: stashcache module unavailable", status=503)
     cache_fqdn = request.args.get("fqdn") if request.args.get("fqdn") else request.args.get("cache_fqdn")
+    legacy = app.config["STASHCACHE_LEGACY_AUTH"]
     try:
         if public_only:
             generate_function = stashcache.generate_public_cache_authfile
         else:
             generate_function = stashcache.generate_cache_authfile
-        auth = generate_function(global_data,
-                                 fqdn=cache_fqdn,
-                                 legacy=app.config["STASHCACHE_LEGACY_AUTH"],
-                                 suppress_errors=False)
+        auth = global_data.get_stashcache_artifact(
+            ("cache_authfile", cache_fqdn, public_only, legacy),
+            lambda: generate_function(global_data,
+                                      fqdn=cache_fqdn,
+                                      legacy=legacy,
+                                      suppress_errors=False))
     except (ResourceNotRegistered, ResourceMissingServices) as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -624,9 +633,12 @@ def _get_origin_authfile(public_only):
         return Response("Can't get authfile: stashcache module unavailable", status=503)
     if 'fqdn' not in request.args:
         return Response("FQDN of origin server required in the 'fqdn' argument", status=400)
+    fqdn = request.args['fqdn']
     try:
-        auth = stashcache.generate_origin_authfile(global_data=global_data, fqdn=request.args['fqdn'],
-                                                   suppress_errors=False, public_origin=public_only)
+        auth = global_data.get_stashcache_artifact(
+            ("origin_authfile", fqdn, public_only),
+            lambda: stashcache.generate_origin_authfile(global_data=global_data, fqdn=fqdn,
+                                                        suppress_errors=False, public_origin=public_only))
     except (ResourceNotRegistered, ResourceMissingServices) as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -674,7 +686,9 @@ def _get_cache_scitoken_file():
     fqdn_arg = request.args.get("fqdn")
 
     def get_scitoken_function(fqdn):
-        return stashcache.generate_cache_scitokens(global_data=global_data, fqdn=fqdn, suppress_errors=False)
+        return global_data.get_stashcache_artifact(
+            ("cache_scitokens", fqdn),
+            lambda: stashcache.generate_cache_scitokens(global_data=global_data, fqdn=fqdn, suppress_errors=False))
 
     return _get_scitoken_file(fqdn_arg, get_scitoken_function)
 
@@ -683,7 +697,9 @@ def _get_origin_scitoken_file():
     fqdn_arg = request.args.get("fqdn")
 
     def get_scitoken_function(fqdn):
-        return stashcache.generate_origin_scitokens(global_data=global_data, fqdn=fqdn, suppress_errors=False)
+        return global_data.get_stashcache_artifact(
+            ("origin_scitokens", fqdn),
+            lambda: stashcache.generate_origin_scitokens(global_data=global_data, fqdn=fqdn, suppress_errors=False))
 
     return _get_scitoken_file(fqdn_arg, get_scitoken_function)
 
@@ -1072,14 +1088,14 @@ def get_filters_from_args(args) -> Filters:
         if filter_key in args:
             pat = re.compile(r"{0}_(\d+)".format(filter_key))
             arg_sel = "{0}_sel[]".format(filter_key)
-            for k, v in args.items():
-                if k == arg_sel:
-                    try:
-                        filter_list.append(int(v))
-                    except ValueError:
-                        raise InvalidArgumentsError("{0}={1}: must be int".format(k,v))
-                elif pat.match(k):
-                    m = pat.match(k)
+            for v in args.getlist(arg_sel):
+                try:
+                    filter_list.append(int(v))
+                except ValueError:
+                    raise InvalidArgumentsError("{0}={1}: must be int".format(arg_sel, v))
+            for k in args.keys():
+                m = pat.match(k)
+                if m:
                     filter_list.append(int(m.group(1)))
             if not filter_list:
                 raise InvalidArgumentsError("at least one {0} must be specified"
@@ -1094,13 +1110,47 @@ def get_filters_from_args(args) -> Filters:
     return filters
 
 
-def _get_xml_or_fail(getter_function, args):
+def _get_cached_response(key, get_body, mimetype):
+    """Return a response with the body returned by `get_body()`, which is only called if the
+    response for `key` hasn't been generated since the data was last updated.  The response has
+    a strong ETag; if the request's If-None-Match matches it, a 304 is returned instead.
+
+    `get_body()` returns either bytes or an iterator of chunks of bytes.  In the latter case,
+    if the response cache has no room for the response, the chunks are streamed to the client
+    as they are generated, without an ETag.
+    """
+    def compute():
+        body = get_body()
+        if not isinstance(body, bytes):
+            body = b"".join(body)
+        return body, hashlib.sha1(body).hexdigest()
+
+    if global_data.can_cache_response(key):
+        body, etag = global_data.get_response_artifact(key, compute)
+    else:
+        body = get_body()
+        if not isinstance(body, bytes):
+            return Response(body, mimetype=mimetype)
+        etag = hashlib.sha1(body).hexdigest()
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def _get_xml_or_fail(getter_function, args, extra_key=()):
     try:
         filters = get_filters_from_args(args)
     except InvalidArgumentsError as e:
         return Response("Invalid arguments: " + str(e), status=400)
-    return Response(
-        to_xml_bytes(getter_function(_get_authorized(), filters)),
+    authorized = _get_authorized()
+    key = (request.path, filters.get_canonical(), authorized) + tuple(extra_key)
+    if filters.past_days > 0:
+        # Which past downtimes are shown depends on the current time; don't reuse the
+        # response for more than a minute
+        key += (int(time.time() // 60),)
+    return _get_cached_response(
+        key,
+        lambda: iter_xml_bytes(getter_function(authorized, filters)),
         mimetype="text/xml"
     )
 
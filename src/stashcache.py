@@ -1,20 +1,20 @@
 from collections import defaultdict
-from typing import Dict, List, Optional, Sequence
+import itertools
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from webapp.common import is_null, PreJSON, XROOTD_CACHE_SERVER, XROOTD_ORIGIN_SERVER, PELICAN_CACHE, PELICAN_ORIGIN, \
     NamespacesFilters
 from webapp.exceptions import DataError, ResourceNotRegistered, ResourceMissingServices
 from webapp.models import GlobalData
-from webapp.topology import Resource, ResourceGroup, Topology
+from webapp.topology import Downtime, Resource, ResourceGroup, Topology
 from webapp.vos_data import VOsData
-from webapp.data_federation import AuthMethod, DNAuth, SciTokenAuth, Namespace, parse_authz
+from webapp.data_federation import AuthzIndex, DNAuth, SciTokenAuth, Namespace, \
+    ANY, ANY_PUBLIC, resource_allows_namespace, namespace_allows_origin_resource, namespace_allows_cache_resource
 
 import logging
 
 log = logging.getLogger(__name__)
 
-ANY = "ANY"
-ANY_PUBLIC = "ANY_PUBLIC"
 
 def _log_or_raise(suppress_errors: bool, an_exception: BaseException, logmethod=log.debug):
     if suppress_errors:
@@ -71,53 +71,6 @@ def _get_origin_resource(fqdn: Optional[str], topology: Topology, suppress_error
     return _get_resource_with_services(fqdn, [XROOTD_ORIGIN_SERVER, PELICAN_ORIGIN], topology, suppress_errors)
 
 
-def resource_allows_namespace(resource: Resource, namespace: Optional[Namespace]) -> bool:
-    """Return True if the given resource's (cache or origin) AllowedVOs allows a namespace, which happens if:
-
-    - The namespace's VO is in the AllowedVOs list, or
-    - The namespace is public and ANY_PUBLIC is in the AllowedVOs list, or
-    - ANY is in the AllowedVOs list; in this case, namespace may be `None`
-
-    This says nothing about whether the namespace allows the cache/origin.
-    namespace may be None, in which case thie returns true only if ANY is in the AllowedVOs list.
-    No type/service checking is done in this function.
-    """
-    allowed_vos = resource.data.get("AllowedVOs", [])
-    if ANY in allowed_vos:
-        return True
-    if namespace:
-        if ANY_PUBLIC in allowed_vos and namespace.is_public():
-            return True
-        elif namespace.vo_name in allowed_vos:
-            return True
-    return False
-
-
-def namespace_allows_origin_resource(namespace: Namespace, origin: Optional[Resource]) -> bool:
-    """Return True if the given namespace allows a given origin resouce, which happens if
-    the origin resource's name is in the namespace's AllowedOrigins list.
-    Return False if origin is None.
-
-    This says nothing about whether the origin allows the namespace.
-    No type/service checking is done in this function.
-    """
-    return origin and origin.name in namespace.allowed_origins
-
-
-def namespace_allows_cache_resource(namespace: Namespace, cache: Optional[Resource]) -> bool:
-    """Return True if the given namespace allows a given cache resource, which happens if:
-
-    - The cache resource's name is in the namespace's AllowedCaches list, or
-    - The namespace's AllowedCaches list contains ANY; in this cache, cache may be None.
-
-    This says nothing about whether the cache allows the namespace.
-    No type/service checking is done in this function.
-    """
-    if ANY in namespace.allowed_caches:
-        return True
-    return cache and cache.name in namespace.allowed_caches
-
-
 def get_supported_caches_for_namespace(namespace: Namespace, topology: Topology) -> List[Resource]:
     """Return a list of Resource objects of all caches that support a namespace.  This means the cache allows
     the namespace, AND the namespace allows the cache.
@@ -145,95 +98,213 @@ class _IdNamespaceData:
 
     @classmethod
     def for_cache(cls, global_data: GlobalData, vos_data: VOsData, legacy: bool,
-                  cache_resource: Optional[Resource]) -> "_IdNamespaceData":
+                  cache_resource: Optional[Resource],
+                  index: Optional[AuthzIndex] = None) -> "_IdNamespaceData":
         self = cls()
 
-        ligo_authz_list: List[AuthMethod] = []
+        if index and cache_resource:
+            vo_namespaces = index.namespaces_for_cache(cache_resource)
+        else:
+            vo_namespaces = vos_data.get_vo_namespaces()
 
-        # This is needed so we can fetch the LIGO DNs only for caches that
-        # actually support LIGO data, instead of hitting their LDAP server for
-        # every cache.
-        def fetch_ligo_authz_list_if_needed():
-            if not ligo_authz_list:
-                for dn in global_data.get_ligo_dn_list():
-                    ligo_authz_list.append(parse_authz(f"DN:{dn}")[0])
-            return ligo_authz_list
+        for vo_name, namespace in vo_namespaces:
+            path = namespace.path
+            if not namespace_allows_cache_resource(namespace, cache_resource):
+                continue
+            if cache_resource and not resource_allows_namespace(cache_resource, namespace):
+                continue
+            if namespace.is_public():
+                self.public_paths.add(path)
+                continue
 
-        for vo_name, stashcache_obj in vos_data.stashcache_by_vo_name.items():
-            for path, namespace in stashcache_obj.namespaces.items():
-                if not namespace_allows_cache_resource(namespace, cache_resource):
-                    continue
-                if cache_resource and not resource_allows_namespace(cache_resource, namespace):
-                    continue
-                if namespace.is_public():
-                    self.public_paths.add(path)
-                    continue
+            # Extend authz list with LIGO DNs if applicable.  They are only fetched for caches
+            # that actually support LIGO data, instead of hitting their LDAP server for every cache.
+            extended_authz_list = namespace.authz_list
+            if vo_name.lower() == "ligo":
+                if legacy:
+                    extended_authz_list = itertools.chain(namespace.authz_list, global_data.get_ligo_authz_list())
+                else:
+                    self.warnings_auth.append("# LIGO DNs unavailable\n")
 
-                # Extend authz list with LIGO DNs if applicable
-                extended_authz_list = namespace.authz_list
-                if vo_name.lower() == "ligo":
-                    if legacy:
-                        extended_authz_list += fetch_ligo_authz_list_if_needed()
-                    else:
-                        self.warnings_auth.append("# LIGO DNs unavailable\n")
-
-                for authz in extended_authz_list:
-                    if authz.used_in_authfile:
-                        self.id_to_paths[authz.authfile_id].add(path)
-                        self.id_to_str[authz.authfile_id] = str(authz)
-                    if authz.used_in_grid_mapfile:
-                        self.grid_mapfile_lines.add(authz.grid_mapfile_line)
+            for authz in extended_authz_list:
+                if authz.used_in_authfile:
+                    self.id_to_paths[authz.authfile_id].add(path)
+                    self.id_to_str[authz.authfile_id] = str(authz)
+                if authz.used_in_grid_mapfile:
+                    self.grid_mapfile_lines.add(authz.grid_mapfile_line)
 
         return self
 
     @classmethod
     def for_origin(cls, topology: Topology, vos_data: VOsData,
-                   origin_resource: Optional[Resource]) -> "_IdNamespaceData":
+                   origin_resource: Optional[Resource],
+                   index: Optional[AuthzIndex] = None) -> "_IdNamespaceData":
         self = cls()
-        for vo_name, stashcache_obj in vos_data.stashcache_by_vo_name.items():
-            for path, namespace in stashcache_obj.namespaces.items():
-                if not namespace_allows_origin_resource(namespace, origin_resource):
-                    continue
-                if not resource_allows_namespace(origin_resource, namespace):
-                    continue
-                if namespace.is_public():
-                    self.public_paths.add(path)
-                    continue
 
-                # The Authfile for origins should contain only caches and the origin itself, via SSL (i.e. DNs).
-                # Ignore FQANs and DNs listed in the namespace's authz list.
-                authz_list = []
+        if index and origin_resource:
+            vo_namespaces = index.namespaces_for_origin(origin_resource)
+        else:
+            vo_namespaces = vos_data.get_vo_namespaces()
+
+        for vo_name, namespace in vo_namespaces:
+            path = namespace.path
+            if not namespace_allows_origin_resource(namespace, origin_resource):
+                continue
+            if not resource_allows_namespace(origin_resource, namespace):
+                continue
+            if namespace.is_public():
+                self.public_paths.add(path)
+                continue
+
+            # The Authfile for origins should contain only caches and the origin itself, via SSL (i.e. DNs).
+            # Ignore FQANs and DNs listed in the namespace's authz list.
+            authz_list = []
 
-                allowed_resources = [origin_resource]
-                # Add caches
+            allowed_resources = [origin_resource]
+            # Add caches
+            if index:
+                allowed_caches = index.caches_for_namespace(namespace)
+            else:
                 allowed_caches = get_supported_caches_for_namespace(namespace, topology)
-                if allowed_caches:
-                    allowed_resources.extend(allowed_caches)
+            if allowed_caches:
+                allowed_resources.extend(allowed_caches)
+            else:
+                # TODO This situation should be caught by the CI
+                self.warnings_auth.append(f"# WARNING: No working cache / namespace combinations found for {path};"
+                                          " this path may not be cached")
+
+            for resource in allowed_resources:
+                dn = resource.data.get("DN")
+                if dn:
+                    authz_list.append(DNAuth(dn))
                 else:
-                    # TODO This situation should be caught by the CI
-                    self.warnings_auth.append(f"# WARNING: No working cache / namespace combinations found for {path};"
-                                              " this path may not be cached")
-
-                for resource in allowed_resources:
-                    dn = resource.data.get("DN")
-                    if dn:
-                        authz_list.append(DNAuth(dn))
-                    else:
-                        self.warnings_auth.append(
-                            f"# WARNING: Resource {resource.name} was skipped for VO {vo_name}, namespace {path}"
-                            f" because the resource does not provide a DN."
-                        )
-                        continue
-
-                for authz in authz_list:
-                    if authz.used_in_authfile:
-                        self.id_to_paths[authz.authfile_id].add(path)
-                        self.id_to_str[authz.authfile_id] = str(authz)
-                    if authz.used_in_grid_mapfile:
-                        self.grid_mapfile_lines.add(authz.grid_mapfile_line)
+                    self.warnings_auth.append(
+                        f"# WARNING: Resource {resource.name} was skipped for VO {vo_name}, namespace {path}"
+                        f" because the resource does not provide a DN."
+                    )
+                    continue
+
+            for authz in authz_list:
+                if authz.used_in_authfile:
+                    self.id_to_paths[authz.authfile_id].add(path)
+                    self.id_to_str[authz.authfile_id] = str(authz)
+                if authz.used_in_grid_mapfile:
+                    self.grid_mapfile_lines.add(authz.grid_mapfile_line)
         return self
 
 
+def _render_cache_authfile(idns: _IdNamespaceData) -> str:
+    if not idns.id_to_paths:
+        if not idns.public_paths:
+            raise DataError("Cache does not support any namespaces")  # TODO Catch this in the CI
+        else:
+            return ("# This cache does not support any protected/authenticated namespaces, only public namespaces.\n"
+                    "# You must use the 'stash-cache' xrootd instance instead.\n")
+
+    authfile_lines = []
+    authfile_lines.extend(idns.warnings_auth)
+    for authfile_id in idns.id_to_paths:
+        paths_acl = " ".join(f"{p} rl" for p in sorted(idns.id_to_paths[authfile_id]))
+        authfile_lines.append(f"# {idns.id_to_str[authfile_id]}")
+        authfile_lines.append(f"{authfile_id} {paths_acl}")
+
+    return "\n".join(authfile_lines) + "\n"
+
+
+def _render_public_cache_authfile(idns: _IdNamespaceData) -> str:
+    if not idns.public_paths:
+        if not idns.id_to_paths:
+            raise DataError("Cache does not support any namespaces")  # TODO Catch this in the CI
+        else:
+            return ("# This cache does not support any public namespaces, only protected/authenticated namespaces.\n"
+                    "# You must use the 'stash-cache-auth' xrootd instance instead.\n")
+
+    authfile_lines = []
+    authfile_lines.extend(idns.warnings_public)
+    authfile_lines.append("u * /user/ligo -rl \\")
+
+    for dirname in sorted(idns.public_paths):
+        authfile_lines.append(f"    {dirname} rl \\")
+
+    # Delete trailing ' \' from the last line
+    if authfile_lines[-1].endswith(" \\"):
+        authfile_lines[-1] = authfile_lines[-1][:-2]
+
+    return "\n".join(authfile_lines) + "\n"
+
+
+def _render_grid_mapfile(idns: _IdNamespaceData) -> str:
+    grid_mapfile_lines = []
+    grid_mapfile_lines.extend(idns.warnings_auth)
+    grid_mapfile_lines.extend(sorted(idns.grid_mapfile_lines))
+
+    return "\n".join(grid_mapfile_lines) + "\n"
+
+
+def _render_scitokens(vo_namespaces: Iterable[Tuple[str, Namespace]], service_name: str) -> str:
+    """Render a scitokens.conf from the (VO name, Namespace) pairs a cache or origin serves;
+    `service_name` is the xrootd cache or origin service the file is for.
+    """
+    template = """\
+[Global]
+audience = {allowed_vos_str}
+
+{issuer_blocks_str}
+"""
+
+    allowed_vos = set()
+    authz_list = []
+
+    for vo_name, namespace in vo_namespaces:
+        for authz in namespace.authz_list:
+            if authz.used_in_scitokens_conf:
+                authz_list.append(authz)
+                allowed_vos.add(vo_name)
+
+    # Older plugin versions require at least one issuer block (SOFTWARE-4389)
+    if not authz_list:
+        dummy_auth = SciTokenAuth(issuer="https://scitokens.org/nonexistent", base_path="/no-issuers-found",
+                                  restricted_path=None, map_subject=False)
+        authz_list.append(dummy_auth)
+
+    issuer_blocks = set(a.get_scitokens_conf_block(service_name) for a in authz_list)
+    issuer_blocks_str = "\n".join(sorted(issuer_blocks))
+    allowed_vos_str = ", ".join(sorted(allowed_vos))
+
+    return template.format(**locals()).rstrip() + "\n"
+
+
+def _render_origin_authfile(idns: _IdNamespaceData, public_origin: bool) -> str:
+    if not idns.id_to_paths and not idns.public_paths:
+        raise DataError("Origin does not support any namespaces")  # TODO Catch this in the CI
+    elif public_origin and not idns.public_paths:
+        return ("# This origin does not support any public namespaces, only protected/authenticated namespaces.\n"
+                "# You must use the 'stash-origin-auth' xrootd instance instead.\n")
+    elif not public_origin and not idns.id_to_paths:
+        return ("# This origin does not support any protected/authenticated namespaces, only public namespaces.\n"
+                "# You must use the 'stash-origin' xrootd instance instead.\n")
+
+    authfile_lines = []
+
+    # Only auth origins should serve paths requiring authentication
+    if not public_origin:
+        authfile_lines.extend(idns.warnings_auth)
+        for authfile_id in idns.id_to_paths:
+            paths_acl = " ".join(f"{p} lr" for p in sorted(idns.id_to_paths[authfile_id]))
+            authfile_lines.append(f"# {idns.id_to_str[authfile_id]}")
+            authfile_lines.append(f"{authfile_id} {paths_acl}")
+
+    # Public paths must be at the end
+    # XXX Should auth origins _also_ serve public paths?
+    if public_origin and idns.public_paths:
+        authfile_lines.append("")
+        authfile_lines.extend(idns.warnings_public)
+        paths_acl = " ".join(f"{p} lr" for p in sorted(idns.public_paths))
+        authfile_lines.append(f"u * {paths_acl}")
+
+    return "\n".join(authfile_lines) + "\n"
+
+
 def generate_cache_authfile(global_data: GlobalData,
                             fqdn=None,
                             legacy=True,
@@ -255,23 +326,10 @@ def generate_cache_authfile(global_data: GlobalData,
         vos_data=vos_data,
         legacy=legacy,
         cache_resource=resource,
+        index=vos_data.get_authz_index(topology),
     )
 
-    if not idns.id_to_paths:
-        if not idns.public_paths:
-            raise DataError("Cache does not support any namespaces")  # TODO Catch this in the CI
-        else:
-            return ("# This cache does not support any protected/authenticated namespaces, only public namespaces.\n"
-                    "# You must use the 'stash-cache' xrootd instance instead.\n")
-
-    authfile_lines = []
-    authfile_lines.extend(idns.warnings_auth)
-    for authfile_id in idns.id_to_paths:
-        paths_acl = " ".join(f"{p} rl" for p in sorted(idns.id_to_paths[authfile_id]))
-        authfile_lines.append(f"# {idns.id_to_str[authfile_id]}")
-        authfile_lines.append(f"{authfile_id} {paths_acl}")
-
-    return "\n".join(authfile_lines) + "\n"
+    return _render_cache_authfile(idns)
 
 
 def generate_public_cache_authfile(global_data: GlobalData, fqdn=None, legacy=True, suppress_errors=True) -> str:
@@ -292,27 +350,10 @@ def generate_public_cache_authfile(global_data: GlobalData, fqdn=None, legacy=Tr
         vos_data=vos_data,
         legacy=legacy,
         cache_resource=resource,
+        index=vos_data.get_authz_index(topology),
     )
 
-    if not idns.public_paths:
-        if not idns.id_to_paths:
-            raise DataError("Cache does not support any namespaces")  # TODO Catch this in the CI
-        else:
-            return ("# This cache does not support any public namespaces, only protected/authenticated namespaces.\n"
-                    "# You must use the 'stash-cache-auth' xrootd instance instead.\n")
-
-    authfile_lines = []
-    authfile_lines.extend(idns.warnings_public)
-    authfile_lines.append("u * /user/ligo -rl \\")
-
-    for dirname in sorted(idns.public_paths):
-        authfile_lines.append(f"    {dirname} rl \\")
-
-    # Delete trailing ' \' from the last line
-    if authfile_lines[-1].endswith(" \\"):
-        authfile_lines[-1] = authfile_lines[-1][:-2]
-
-    return "\n".join(authfile_lines) + "\n"
+    return _render_public_cache_authfile(idns)
 
 def generate_cache_grid_mapfile(global_data: GlobalData,
                                 fqdn=None,
@@ -335,13 +376,10 @@ def generate_cache_grid_mapfile(global_data: GlobalData,
         vos_data=vos_data,
         legacy=legacy,
         cache_resource=resource,
+        index=vos_data.get_authz_index(topology),
     )
 
-    grid_mapfile_lines = []
-    grid_mapfile_lines.extend(idns.warnings_auth)
-    grid_mapfile_lines.extend(sorted(idns.grid_mapfile_lines))
-
-    return "\n".join(grid_mapfile_lines) + "\n"
+    return _render_grid_mapfile(idns)
 
 
 def generate_cache_scitokens(global_data: GlobalData, fqdn: str, suppress_errors=True) -> str:
@@ -363,39 +401,8 @@ def generate_cache_scitokens(global_data: GlobalData, fqdn: str, suppress_errors
     if not cache_resource:
         return ""
 
-    template = """\
-[Global]
-audience = {allowed_vos_str}
-
-{issuer_blocks_str}
-"""
-
-    allowed_vos = set()
-    cache_authz_list = []
-
-    for vo_name, stashcache_obj in vos_data.stashcache_by_vo_name.items():
-        for namespace in stashcache_obj.namespaces.values():  # type: Namespace
-            if not namespace_allows_cache_resource(namespace, cache_resource):
-                continue
-            if not resource_allows_namespace(cache_resource, namespace):
-                continue
-
-            for authz in namespace.authz_list:
-                if authz.used_in_scitokens_conf:
-                    cache_authz_list.append(authz)
-                    allowed_vos.add(vo_name)
-
-    # Older plugin versions require at least one issuer block (SOFTWARE-4389)
-    if not cache_authz_list:
-        dummy_auth = SciTokenAuth(issuer="https://scitokens.org/nonexistent", base_path="/no-issuers-found",
-                                  restricted_path=None, map_subject=False)
-        cache_authz_list.append(dummy_auth)
-
-    issuer_blocks = set(a.get_scitokens_conf_block(XROOTD_CACHE_SERVER) for a in cache_authz_list)
-    issuer_blocks_str = "\n".join(sorted(issuer_blocks))
-    allowed_vos_str = ", ".join(sorted(allowed_vos))
-
-    return template.format(**locals()).rstrip() + "\n"
+    index = vos_data.get_authz_index(topology)
+    return _render_scitokens(index.namespaces_for_cache(cache_resource), XROOTD_CACHE_SERVER)
 
 
 def generate_origin_authfile(global_data: GlobalData, fqdn: str, suppress_errors=True, public_origin=False) -> str:
@@ -415,36 +422,10 @@ def generate_origin_authfile(global_data: GlobalData, fqdn: str, suppress_errors
         if not origin_resource:
             return ""
 
-    idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource)
-
-    if not idns.id_to_paths and not idns.public_paths:
-        raise DataError("Origin does not support any namespaces")  # TODO Catch this in the CI
-    elif public_origin and not idns.public_paths:
-        return ("# This origin does not support any public namespaces, only protected/authenticated namespaces.\n"
-                "# You must use the 'stash-origin-auth' xrootd instance instead.\n")
-    elif not public_origin and not idns.id_to_paths:
-        return ("# This origin does not support any protected/authenticated namespaces, only public namespaces.\n"
-                "# You must use the 'stash-origin' xrootd instance instead.\n")
+    idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource,
+                                       vos_data.get_authz_index(topology))
 
-    authfile_lines = []
-
-    # Only auth origins should serve paths requiring authentication
-    if not public_origin:
-        authfile_lines.extend(idns.warnings_auth)
-        for authfile_id in idns.id_to_paths:
-            paths_acl = " ".join(f"{p} lr" for p in sorted(idns.id_to_paths[authfile_id]))
-            authfile_lines.append(f"# {idns.id_to_str[authfile_id]}")
-            authfile_lines.append(f"{authfile_id} {paths_acl}")
-
-    # Public paths must be at the end
-    # XXX Should auth origins _also_ serve public paths?
-    if public_origin and idns.public_paths:
-        authfile_lines.append("")
-        authfile_lines.extend(idns.warnings_public)
-        paths_acl = " ".join(f"{p} lr" for p in sorted(idns.public_paths))
-        authfile_lines.append(f"u * {paths_acl}")
-
-    return "\n".join(authfile_lines) + "\n"
+    return _render_origin_authfile(idns, public_origin)
 
 
 def generate_origin_grid_mapfile(global_data: GlobalData, fqdn: str, suppress_errors=True) -> str:
@@ -460,13 +441,10 @@ def generate_origin_grid_mapfile(global_data: GlobalData, fqdn: str, suppress_er
         if not origin_resource:
             return ""
 
-    idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource)
-
-    grid_mapfile_lines = []
-    grid_mapfile_lines.extend(idns.warnings_auth)
-    grid_mapfile_lines.extend(sorted(idns.grid_mapfile_lines))
+    idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource,
+                                       vos_data.get_authz_index(topology))
 
-    return "\n".join(grid_mapfile_lines) + "\n"
+    return _render_grid_mapfile(idns)
 
 
 def generate_origin_scitokens(global_data: GlobalData, fqdn: str, suppress_errors=True) -> str:
@@ -488,39 +466,67 @@ def generate_origin_scitokens(global_data: GlobalData, fqdn: str, suppress_error
     if not origin_resource:
         return ""
 
-    template = """\
-[Global]
-audience = {allowed_vos_str}
-
-{issuer_blocks_str}
-"""
+    index = vos_data.get_authz_index(topology)
+    return _render_scitokens(index.namespaces_for_origin(origin_resource), XROOTD_ORIGIN_SERVER)
 
-    allowed_vos = set()
-    origin_authz_list = []
-
-    for vo_name, stashcache_obj in vos_data.stashcache_by_vo_name.items():
-        for namespace in stashcache_obj.namespaces.values():
-            if not namespace_allows_origin_resource(namespace, origin_resource):
-                continue
-            if not resource_allows_namespace(origin_resource, namespace):
-                continue
 
-            for authz in namespace.authz_list:
-                if authz.used_in_scitokens_conf:
-                    origin_authz_list.append(authz)
-                    allowed_vos.add(vo_name)
+def generate_resource_stashcache_files(global_data: GlobalData, legacy=True) -> Dict[str, Dict[str, str]]:
+    """
+    Generate the cache and origin config files of every XRootD cache and origin resource, for the
+    /resources/stashcache-files endpoint.  Returns a dict of file name to file contents for each
+    resource name; files that cannot be generated, and resources with no files, are left out.
 
-    # Older plugin versions require at least one issuer block (SOFTWARE-4389)
-    if not origin_authz_list:
-        dummy_auth = SciTokenAuth(issuer="https://scitokens.org/nonexistent", base_path="/no-issuers-found",
-                                  restricted_path=None, map_subject=False)
-        origin_authz_list.append(dummy_auth)
+    The files are the same as those generated one by one by the generate_* functions above
+    (looking up each resource by its FQDN), but the namespace/resource matching is done once
+    for the whole topology instead of once per file.
+    """
+    topology = global_data.get_topology()
+    vos_data = global_data.get_vos_data()
+    index = vos_data.get_authz_index(topology)
+
+    def cache_files(cache_resource: Resource):
+        idns = _IdNamespaceData.for_cache(global_data, vos_data, legacy, cache_resource, index)
+        return [
+            ("CacheAuthfilePublic", lambda: _render_public_cache_authfile(idns)),
+            ("CacheAuthfile", lambda: _render_cache_authfile(idns)),
+            ("CacheScitokens", lambda: _render_scitokens(index.namespaces_for_cache(cache_resource),
+                                                         XROOTD_CACHE_SERVER)),
+        ]
+
+    def origin_files(origin_resource: Resource):
+        idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource, index)
+        return [
+            ("OriginAuthfilePublic", lambda: _render_origin_authfile(idns, public_origin=True)),
+            ("OriginAuthfile", lambda: _render_origin_authfile(idns, public_origin=False)),
+            ("OriginScitokens", lambda: _render_scitokens(index.namespaces_for_origin(origin_resource),
+                                                          XROOTD_ORIGIN_SERVER)),
+        ]
+
+    resource_files = {}
+    for rg in topology.rgs.values():
+        for resource in rg.resources_by_name.values():
+            renderers = []
+            if XROOTD_CACHE_SERVER in resource.service_names:
+                cache_resource = _get_cache_resource(resource.fqdn, topology, suppress_errors=True)
+                if cache_resource:
+                    renderers.extend(cache_files(cache_resource))
+            if XROOTD_ORIGIN_SERVER in resource.service_names:
+                origin_resource = _get_origin_resource(resource.fqdn, topology, suppress_errors=True)
+                if origin_resource:
+                    renderers.extend(origin_files(origin_resource))
+
+            stashcache_files = {}
+            for file_name, render in renderers:
+                try:
+                    stashcache_files[file_name] = render()
+                except (ValueError, DataError):
+                    continue
+            stashcache_files = {k: v for k, v in stashcache_files.items() if v}  # Remove empty files
 
-    issuer_blocks = set(a.get_scitokens_conf_block(XROOTD_ORIGIN_SERVER) for a in origin_authz_list)
-    issuer_blocks_str = "\n".join(sorted(issuer_blocks))
-    allowed_vos_str = ", ".join(sorted(allowed_vos))
+            if stashcache_files:
+                resource_files[resource.name] = stashcache_files
 
-    return template.format(**locals()).rstrip() + "\n"
+    return resource_files
 
 
 def get_credential_generation_dict_for_namespace(ns: Namespace) -> Optional[Dict]:
@@ -607,17 +613,15 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
             "scitokens": get_scitokens_list_for_namespace(ns),
         }
 
-        for cache_name, cache_resource_obj in cache_resource_objs.items():
-            if (resource_allows_namespace(cache_resource_obj, ns) and
-                    namespace_allows_cache_resource(ns, cache_resource_obj)):
-                nsdict["caches"].append(cache_resource_dicts[cache_name])
+        for cache_resource_obj in authz_index.caches_for_namespace(ns):
+            if cache_resource_obj.name in cache_resource_dicts:
+                nsdict["caches"].append(cache_resource_dicts[cache_resource_obj.name])
 
         nsdict["caches"].sort(key=lambda d: d["resource"])
 
-        for origin_name, origin_resource_obj in origin_resource_objs.items():
-            if (resource_allows_namespace(origin_resource_obj, ns) and
-                    namespace_allows_origin_resource(ns, origin_resource_obj)):
-                nsdict["origins"].append(origin_resource_dicts[origin_name])
+        for origin_resource_obj in authz_index.origins_for_namespace(ns):
+            if origin_resource_obj.name in origin_resource_dicts:
+                nsdict["origins"].append(origin_resource_dicts[origin_resource_obj.name])
 
         nsdict["origins"].sort(key=lambda d: d["resource"])
 
@@ -625,12 +629,12 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
 
     def _resource_has_downed_service(
             r: Resource,
-            t: Topology,
+            present_downtimes_by_resource: Dict[str, List[Downtime]],
             service_name
     ):
-        if r.name not in t.present_downtimes_by_resource:
+        if r.name not in present_downtimes_by_resource:
             return False
-        downtimes = t.present_downtimes_by_resource[r.name]
+        downtimes = present_downtimes_by_resource[r.name]
         for dt in downtimes:
             try:
                 if service_name in dt.service_names:
@@ -639,21 +643,22 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
                 continue
         return False
 
-    def _resource_has_downed_cache(r: Resource, t: Topology):
-        return _resource_has_downed_service(r, t, XROOTD_CACHE_SERVER)
+    def _resource_has_downed_cache(r: Resource, present_downtimes_by_resource: Dict[str, List[Downtime]]):
+        return _resource_has_downed_service(r, present_downtimes_by_resource, XROOTD_CACHE_SERVER)
 
-    def _resource_has_downed_origin(r: Resource, t: Topology):
-        return _resource_has_downed_service(r, t, XROOTD_ORIGIN_SERVER)
+    def _resource_has_downed_origin(r: Resource, present_downtimes_by_resource: Dict[str, List[Downtime]]):
+        return _resource_has_downed_service(r, present_downtimes_by_resource, XROOTD_ORIGIN_SERVER)
 
     # End helper functions
 
     topology = global_data.get_topology()
     resource_groups: List[ResourceGroup] = topology.get_resource_group_list()
     vos_data = global_data.get_vos_data()
+    authz_index = vos_data.get_authz_index(topology)
+    present_downtimes_by_resource = topology.get_present_downtimes_by_resource()
 
     # Build a dict of cache resources
 
-    cache_resource_objs = {}  # type: Dict[str, Resource]
     cache_resource_dicts = {}  # type: Dict[str, Dict]
 
     for group in resource_groups:
@@ -664,14 +669,12 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
         for resource in group.resources:
             if (resource.has_xrootd_cache
                     and (filters.include_inactive or resource.is_active)
-                    and (filters.include_downed or not _resource_has_downed_cache(resource, topology))
+                    and (filters.include_downed or not _resource_has_downed_cache(resource, present_downtimes_by_resource))
             ):
-                cache_resource_objs[resource.name] = resource
                 cache_resource_dicts[resource.name] = _xrootd_cache_resource_dict(resource)
 
     # Build a dict of origin resources
 
-    origin_resource_objs = {}  # type: Dict[str, Resource]
     origin_resource_dicts = {}  # type: Dict[str, Dict]
 
     for group in resource_groups:
@@ -682,9 +685,8 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
         for resource in group.resources:
             if (resource.has_xrootd_origin
                     and (filters.include_inactive or resource.is_active)
-                    and (filters.include_downed or not _resource_has_downed_origin(resource, topology))
+                    and (filters.include_downed or not _resource_has_downed_origin(resource, present_downtimes_by_resource))
             ):
-                origin_resource_objs[resource.name] = resource
                 origin_resource_dicts[resource.name] = _xrootd_origin_resource_dict(resource)
 
     result_namespaces = []
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Time repeated generation of a legacy-mode cache authfile (the mode that includes the LIGO DNs)
+on the real data, with a fake LIGO DN list.  The time per call should stay flat; if it grows,
+something is accumulating state between calls.
+"""
+
+import os
+import sys
+import time
+
+_topdir = os.path.abspath(os.path.dirname(__file__) + "/../..")
+sys.path.append(_topdir + "/src")
+
+from webapp.models import GlobalData
+import stashcache
+
+# One of the Internet2 caches; these serve both public and LIGO data
+CACHE_FQDN = "osg-sunnyvale-stashcache.nrp.internet2.edu"
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    num_dns = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    global_data = GlobalData(config={"TOPOLOGY_DATA_DIR": _topdir, "NO_GIT": True})
+    fake_dn_list = [f"/DC=org/DC=example/OU=People/CN=LIGO User {i}" for i in range(num_dns)]
+    global_data.get_ligo_dn_list = lambda: fake_dn_list
+    # Load the data outside the timed calls
+    global_data.get_topology()
+    global_data.get_vos_data()
+
+    times = []
+    length = None
+    for _ in range(calls):
+        start = time.perf_counter()
+        text = stashcache.generate_cache_authfile(global_data, CACHE_FQDN, legacy=True, suppress_errors=False)
+        times.append(time.perf_counter() - start)
+        if length is None:
+            length = len(text)
+        elif len(text) != length:
+            print("authfile changed between calls: %d -> %d bytes" % (length, len(text)))
+            return 1
+
+    tenth = max(calls // 10, 1)
+    first, last = times[:tenth], times[-tenth:]
+    print("%d calls, %d LIGO DNs, %d byte authfile" % (calls, num_dns, length))
+    print("first call:          %8.2f ms" % (times[0] * 1000))
+    print("mean of first 10%%:   %8.2f ms" % (sum(first) / len(first) * 1000))
+    print("mean of last 10%%:    %8.2f ms" % (sum(last) / len(last) * 1000))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
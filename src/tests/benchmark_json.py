@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare the ways of encoding the webapp's JSON responses on the real data:
+the old bytes2str() copy followed by json.dumps(), to_json_bytes() with the
+json module, and to_json_bytes() with orjson (if installed).
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+_topdir = os.path.abspath(os.path.dirname(__file__) + "/../..")
+sys.path.append(_topdir + "/src")
+
+from webapp import common
+from webapp.common import bytes2str, to_json_bytes
+from webapp.models import GlobalData
+import stashcache
+
+
+def measure(func, data, repeat):
+    """Return the best time in seconds and the peak memory allocated in bytes of func(data)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    global_data = GlobalData(config={"TOPOLOGY_DATA_DIR": _topdir, "NO_GIT": True})
+    payloads = {
+        "rgsummary": global_data.get_topology().get_resource_summary(),
+        "vosummary": global_data.get_vos_data().get_tree(),
+        "namespaces": stashcache.get_namespaces_info(global_data),
+    }
+
+    def old(data):
+        return json.dumps(bytes2str(data), sort_keys=True).encode("utf-8", errors="replace")
+
+    def new_json(data):
+        common.set_json_backend("json")
+        return to_json_bytes(data)
+
+    def new_orjson(data):
+        common.set_json_backend("orjson")
+        return to_json_bytes(data)
+
+    methods = [("bytes2str+json", old), ("json default hook", new_json)]
+    if common.orjson:
+        methods.append(("orjson", new_orjson))
+    else:
+        print("orjson not installed; skipping it")
+
+    print("%-12s %-20s %10s %12s" % ("payload", "method", "best ms", "peak MiB"))
+    for name, data in payloads.items():
+        for method_name, func in methods:
+            best, peak = measure(func, data, repeat)
+            print("%-12s %-20s %10.1f %12.1f" % (name, method_name, best * 1000, peak / 2**20))
+    common.set_json_backend("json")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Measure the memory a worker process uses to hold the topology (including downtimes) loaded
+from the real data: the RSS before and after loading, and the size of the entity objects.
+Run it on two revisions to compare them.
+"""
+
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+
+_topdir = os.path.abspath(os.path.dirname(__file__) + "/../..")
+sys.path.append(_topdir + "/src")
+
+from webapp.models import GlobalData
+from webapp.topology import Facility, Site, ResourceGroup, Resource, Downtime
+
+
+def rss_mib() -> float:
+    """Return the resident set size of this process in MiB"""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def entity_sizes() -> dict:
+    """Return the number of instances and the bytes taken by the instances (and their __dict__s,
+    if any) of each entity class, not counting the data they refer to"""
+    classes = (Facility, Site, ResourceGroup, Resource, Downtime)
+    sizes = {cls.__name__: [0, 0] for cls in classes}
+    for obj in gc.get_objects():
+        if isinstance(obj, classes):
+            entry = sizes[type(obj).__name__]
+            entry[0] += 1
+            entry[1] += sys.getsizeof(obj)
+            if hasattr(obj, "__dict__"):
+                entry[1] += sys.getsizeof(obj.__dict__)
+    return sizes
+
+
+def main():
+    gc.collect()
+    rss_before = rss_mib()
+    tracemalloc.start()
+    global_data = GlobalData(config={"TOPOLOGY_DATA_DIR": _topdir, "NO_GIT": True})
+    topology = global_data.get_topology()
+    gc.collect()
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_mib()
+
+    print("%-14s %10s %12s" % ("class", "instances", "KiB"))
+    for name, (count, size) in entity_sizes().items():
+        print("%-14s %10d %12.1f" % (name, count, size / 2**10))
+    print()
+    print("resource groups: %d, downtimes: %d" % (len(topology.rgs), len(topology.downtimes)))
+    print("RSS before load:  %8.1f MiB" % rss_before)
+    print("RSS after load:   %8.1f MiB" % rss_after)
+    print("traced by load:   %8.1f MiB" % (traced / 2**20))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+os.environ['TESTING'] = "True"
+
+from app import global_data
+from webapp.models import GlobalData
+
+
+class GitRepo:
+    """A git repo in a temp dir, for testing loading data from git"""
+    def __init__(self, path):
+        self.path = path
+
+    def git(self, *args, cwd=None) -> str:
+        """Run a git command in the repo (or in `cwd`) and return its output"""
+        cmd = ["git", "-C", str(cwd or self.path), "-c", "user.name=test", "-c", "user.email=test@example.net"]
+        return subprocess.run(cmd + list(args), check=True, stdout=subprocess.PIPE, encoding="utf-8").stdout.strip()
+
+    def commit(self, message: str) -> str:
+        """Commit all the changes to tracked files and return the new sha"""
+        self.git("commit", "-q", "-a", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+    def add_data(self, *subdirs: str) -> str:
+        """Copy the given directories of the test data (e.g. "topology") into the repo and commit them"""
+        for subdir in subdirs:
+            shutil.copytree(os.path.join(global_data.topology_data_dir, subdir), self.path / subdir)
+        self.git("add", "-A")
+        return self.commit("add " + ", ".join(subdirs))
+
+    def global_data(self, config=None, strict=False) -> GlobalData:
+        """A GlobalData loading its data from the repo, without updating it from anywhere"""
+        return GlobalData(dict({"TOPOLOGY_DATA_DIR": str(self.path), "NO_GIT": True}, **(config or {})),
+                          strict=strict)
+
+
+@pytest.fixture
+def tmp_git_repo(tmp_path) -> GitRepo:
+    """An empty git repo in a temp dir"""
+    repo = GitRepo(tmp_path / "repo")
+    repo.path.mkdir()
+    repo.git("init", "-q")
+    return repo
@@ -247,6 +247,68 @@ class TestAPI:
         assert response.status_code == 200
         assert "namespaces" in response.json
 
+    def test_stashcache_artifact_cache(self, client: flask.Flask, mocker: MockerFixture):
+        import stashcache
+        spy = mocker.spy(stashcache, "generate_origin_authfile")
+        url = "/origin/Authfile-public?fqdn=sci-xrootd.jlab.org"
+
+        # Updating the data should drop any previously cached file
+        global_data.topology.update(global_data.topology.data)
+        first = client.get(url)
+        second = client.get(url)
+        assert first.status_code == second.status_code == 200
+        assert first.data == second.data
+        assert spy.call_count == 1
+
+        global_data.vos_data.update(global_data.vos_data.data)
+        third = client.get(url)
+        assert third.data == first.data
+        assert spy.call_count == 2
+
+    def test_response_cache(self, client: flask.Flask, mocker: MockerFixture):
+        import app as app_module
+        spy = mocker.spy(app_module, "iter_xml_bytes")
+
+        global_data.topology.update(global_data.topology.data)
+        first = client.get("/rgsummary/xml?facility=on&facility_10009=on&facility_10010=on")
+        assert first.status_code == 200
+        etag = first.headers.get("ETag")
+        assert etag, "Missing ETag"
+
+        # Same filters in a different form
+        second = client.get("/rgsummary/xml?facility=on&facility_sel[]=10010&facility_sel[]=10009")
+        assert second.data == first.data
+        assert second.headers.get("ETag") == etag
+        assert spy.call_count == 1
+
+        not_modified = client.get("/rgsummary/xml?facility=on&facility_10009=on&facility_10010=on",
+                                  headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not not_modified.data
+        assert "max-age" in not_modified.headers.get("Cache-Control", "")
+
+        global_data.topology.update(global_data.topology.data)
+        third = client.get("/rgsummary/xml?facility=on&facility_10009=on&facility_10010=on")
+        assert third.data == first.data
+        assert spy.call_count == 2
+
+    def test_streamed_xml_response(self, client: flask.Flask, mocker: MockerFixture):
+        import app as app_module
+
+        cached = client.get("/rgsummary/xml")
+        assert cached.headers.get("ETag")
+        with app.test_request_context("/rgsummary/xml"):
+            assert not app_module.rgsummary_xml().is_streamed
+
+        # No room in the response cache: the response is streamed as it is serialized
+        mocker.patch.object(global_data.response_artifacts, "max_entries", 0)
+        mocker.patch.object(global_data.response_artifacts, "artifacts", {})
+        with app.test_request_context("/rgsummary/xml"):
+            assert app_module.rgsummary_xml().is_streamed
+        streamed = client.get("/rgsummary/xml")
+        assert "ETag" not in streamed.headers
+        assert streamed.data == cached.data
+
 
 class TestEndpointContent:
     # Pre-build some test cases based on AMNH resources
@@ -0,0 +1,189 @@
+import pytest
+from pytest_mock import MockerFixture
+
+# Rewrites the path so the app can be imported like it normally is
+import os
+import sys
+
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+os.environ['TESTING'] = "True"
+
+from app import global_data
+
+
+class TestCommon:
+
+    def test_filters_canonical(self):
+        from app import get_filters_from_args
+        from werkzeug.datastructures import MultiDict
+        on = get_filters_from_args(MultiDict([("facility", "on"), ("facility_1", "on"), ("facility_2", "on")]))
+        sel = get_filters_from_args(MultiDict([("facility", "on"), ("facility_sel[]", "2"), ("facility_sel[]", "1")]))
+        assert sel.facility_id == [2, 1]
+        assert on.get_canonical() == sel.get_canonical()
+        assert hash(on.get_canonical()) == hash(sel.get_canonical())
+        assert on.get_digest() == sel.get_digest()
+
+        other = get_filters_from_args(MultiDict([("facility", "on"), ("facility_1", "on")]))
+        assert other.get_digest() != on.get_digest()
+
+    def test_parallel_yaml_parsing(self, tmp_path):
+        import yaml
+        from webapp import common, rg_reader
+        from webapp.common import to_xml_bytes
+
+        good = tmp_path / "good.yaml"
+        good.write_text("a: [1, 2]\n")
+        bad = tmp_path / "bad.yaml"
+        bad.write_text("a: [1, 2\n")
+        load = common.preload_yaml_files([good, bad], workers=2)
+        assert load(good) == {"a": [1, 2]}
+        with pytest.raises(yaml.YAMLError):
+            load(bad)
+
+        topology_dir = os.path.join(global_data.topology_data_dir, "topology")
+        serial = rg_reader.get_topology(topology_dir, global_data.get_contacts_data(), strict=True)
+        parallel = rg_reader.get_topology(topology_dir, global_data.get_contacts_data(), strict=True, workers=2)
+        assert to_xml_bytes(parallel.get_resource_summary(True)) == to_xml_bytes(serial.get_resource_summary(True))
+
+    def test_yaml_disk_cache(self, tmp_path, mocker: MockerFixture):
+        import yaml
+        from webapp import common
+
+        spy = mocker.spy(common, "_parse_yaml_file")
+        yaml_file = tmp_path / "file.yaml"
+        yaml_file.write_text("a: [1, 2]\n")
+        common.set_yaml_cache_dir(str(tmp_path / "cache"))
+        try:
+            assert common.load_yaml_file(yaml_file) == {"a": [1, 2]}
+            assert common.load_yaml_file(yaml_file) == {"a": [1, 2]}
+            assert spy.call_count == 1
+
+            yaml_file.write_text("a: [1, 2, 3]\n")
+            assert common.load_yaml_file(yaml_file) == {"a": [1, 2, 3]}
+            assert spy.call_count == 2
+
+            yaml_file.write_text("a: [1, 2\n")
+            for _ in range(2):
+                with pytest.raises(yaml.YAMLError):
+                    common.load_yaml_file(yaml_file)
+            assert spy.call_count == 4
+
+            # Entries not used lately are pruned; using one keeps it
+            entries = list((tmp_path / "cache").glob("*/*.pickle"))
+            assert len(entries) == 2
+            for entry in entries:
+                os.utime(entry, (0, 0))
+            yaml_file.write_text("a: [1, 2, 3]\n")
+            assert common.load_yaml_file(yaml_file) == {"a": [1, 2, 3]}
+            assert common.prune_yaml_cache(60 * 60) == 1
+            assert common.load_yaml_file(yaml_file) == {"a": [1, 2, 3]}
+            assert spy.call_count == 4
+        finally:
+            common.set_yaml_cache_dir(None)
+
+    def test_xml_serializer(self):
+        import xmltodict
+        from collections import OrderedDict
+        from webapp.common import iter_xml_bytes, to_xml
+
+        data = {"Root": OrderedDict([
+            ("@xmlns:xsi", "http://www.w3.org/2001/XMLSchema-instance"),
+            ("@xmlns", {"": "urn:default", "x": "urn:x"}),
+            ("Empty", None), ("EmptyList", []), ("EmptyDict", {}), ("Zero", 0), ("Flag", True), ("Off", False),
+            ("Text", "a < b & \"c\" > 'd'\n\t"), ("Surrogate", "\udcff"),
+            ("Items", {"Item": [{"@id": 1, "@note": "it's \"quoted\"", "#text": "one"}, "two", 3, None]}),
+            ("Nested", {"A": {"B": {"C": ["x", {"D": "y"}]}}}),
+            ("Tuple", ("p", "q")),
+        ])}
+        assert to_xml(data) == xmltodict.unparse(data, pretty=True, encoding="utf-8")
+        assert b"".join(iter_xml_bytes(data)) == \
+            xmltodict.unparse(data, pretty=True, encoding="utf-8").encode("utf-8", errors="replace")
+
+        for tree in [global_data.get_topology().get_resource_summary(),
+                     global_data.get_topology().get_downtimes(),
+                     global_data.get_vos_data().get_tree(),
+                     global_data.get_projects()]:
+            assert b"".join(iter_xml_bytes(tree)) == \
+                xmltodict.unparse(tree, pretty=True, encoding="utf-8").encode("utf-8")
+        assert len(list(iter_xml_bytes(global_data.get_topology().get_resource_summary()))) > 1
+
+        with pytest.raises(ValueError):
+            to_xml({"A": 1, "B": 2})
+        with pytest.raises(ValueError):
+            to_xml({"A": [1, 2]})
+
+    def test_json_encoding(self):
+        import json
+        from webapp import common
+        from webapp.common import bytes2str, to_json, to_json_bytes
+
+        payloads = [global_data.get_vos_data().get_tree(),
+                    {"b": b"bytes", "a": [b"x", (1, b"\xff")], "c": {"d": None}},
+                    {b"key": b"value"}]
+        for data in payloads:
+            expected = json.dumps(bytes2str(data), sort_keys=True)
+            assert to_json(data) == expected
+            assert to_json_bytes(data) == expected.encode("utf-8")
+
+        if not common.orjson:
+            return
+        try:
+            common.set_json_backend("orjson")
+            for data in payloads + [{"s": "\udcff"}]:
+                assert json.loads(to_json_bytes(data)) == json.loads(json.dumps(bytes2str(data), sort_keys=True)
+                                                                     .encode("utf-8", errors="replace"))
+        finally:
+            common.set_json_backend("json")
+
+    def test_id_maps(self):
+        from webapp.common import gen_id
+
+        vos_data = global_data.get_vos_data()
+        assert vos_data.get_vo_id_to_name() == {vo["ID"]: name for name, vo in vos_data.vos.items()}
+
+        hits = gen_id.cache_info().hits
+        assert gen_id("test_id_maps") == gen_id("test_id_maps")
+        assert gen_id.cache_info().hits == hits + 1
+
+    def test_git_clone_or_pull(self, tmp_path, tmp_git_repo, mocker: MockerFixture):
+        from webapp import common
+
+        origin = tmp_path / "origin.git"
+        clone = tmp_path / "clone"
+
+        def commit(text):
+            (tmp_git_repo.path / "file.txt").write_text(text)
+            sha = tmp_git_repo.commit(text)
+            tmp_git_repo.git("push", "-q", "origin", "HEAD:main")
+            return sha
+
+        (tmp_git_repo.path / "file.txt").write_text("")
+        tmp_git_repo.git("add", "file.txt")
+        tmp_git_repo.git("init", "-q", "--bare", str(origin))
+        tmp_git_repo.git("remote", "add", "origin", str(origin))
+        commit("one")
+        second = commit("two")
+
+        # A new clone is shallow
+        assert common.git_clone_or_pull("file://%s" % origin, str(clone), "main") == second
+        assert (clone / "file.txt").read_text() == "two"
+        assert tmp_git_repo.git("rev-parse", "--is-shallow-repository", cwd=clone) == "true"
+
+        # If the remote branch didn't move, nothing is fetched and the same sha is returned
+        spy = mocker.spy(common, "run_git_cmd")
+        assert common.git_clone_or_pull("file://%s" % origin, str(clone), "main") == second
+        assert spy.call_count == 0
+
+        # If it did, only the new tip is fetched, and it can be diffed against the old one
+        third = commit("three")
+        assert common.git_clone_or_pull("file://%s" % origin, str(clone), "main") == third
+        assert (clone / "file.txt").read_text() == "three"
+        assert tmp_git_repo.git("rev-list", "--count", "HEAD", cwd=clone) == "1"
+        assert common.git_changed_files(str(clone), second, third) == ["file.txt"]
+
+        # A remote that can't be reached is a failure
+        assert common.git_clone_or_pull("file://%s" % origin, str(tmp_path / "nothing"), "nobranch") is None
+        tmp_git_repo.git("remote", "set-url", "origin", str(tmp_path / "gone.git"), cwd=clone)
+        assert common.git_clone_or_pull("file://%s" % origin, str(clone), "main") is None
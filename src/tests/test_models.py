@@ -0,0 +1,339 @@
+from pytest_mock import MockerFixture
+
+# Rewrites the path so the app can be imported like it normally is
+import os
+import sys
+
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+os.environ['TESTING'] = "True"
+
+from app import global_data
+
+
+class TestGlobalData:
+
+    def test_incremental_topology_reload(self, tmp_git_repo, mocker: MockerFixture):
+        from webapp import rg_reader
+
+        tmp_git_repo.add_data("topology")
+        (tmp_git_repo.path / "projects").mkdir()
+        (tmp_git_repo.path / "virtual-organizations").mkdir()
+        gd = tmp_git_repo.global_data({"TOPOLOGY_INCREMENTAL_RELOAD": True}, strict=True)
+        topology = gd.get_topology()
+        generation = gd.topology.generation
+        assert topology.rgs
+
+        spy = mocker.spy(rg_reader, "load_yaml_file")
+
+        # Nothing changed: nothing is parsed and the data is kept
+        gd.topology.force_update = True
+        assert gd.get_topology() is topology
+        assert gd.topology.generation == generation
+        assert spy.call_count == 0
+
+        # One file changed: only that file is parsed
+        site_path = next((tmp_git_repo.path / "topology").glob("*/*/SITE.yaml"))
+        with open(site_path, "a") as fh:
+            fh.write("\n# a comment\n")
+        tmp_git_repo.commit("change a site")
+        gd.topology.force_update = True
+        new_topology = gd.get_topology()
+        assert gd.topology.generation == generation + 1
+        assert spy.call_count == 1
+        assert spy.call_args[0][0] == site_path
+        assert new_topology.get_resource_summary() == topology.get_resource_summary()
+
+    def test_shared_snapshots(self, tmp_path, mocker: MockerFixture):
+        from webapp import vo_reader
+        from webapp.common import to_xml_bytes
+        from webapp.models import GlobalData, SharedSnapshot
+
+        def new_global_data():
+            return GlobalData({"TOPOLOGY_DATA_DIR": global_data.topology_data_dir, "NO_GIT": True,
+                               "SNAPSHOT_DIR": str(tmp_path)}, strict=True)
+
+        spy = mocker.spy(vo_reader, "get_vos_data")
+        worker1, worker2 = new_global_data(), new_global_data()
+        vos_data1 = worker1.get_vos_data()
+        assert spy.call_count == 1
+
+        # The second "process" loads the first's data instead of reading the VO files
+        vos_data2 = worker2.get_vos_data()
+        assert spy.call_count == 1
+        assert vos_data2 is not vos_data1
+        assert to_xml_bytes(vos_data2.get_tree()) == to_xml_bytes(vos_data1.get_tree())
+
+        # And when it's its turn to update, the first loads the second's data
+        worker2.vos_data.force_update = True
+        worker2.get_vos_data()
+        assert spy.call_count == 2
+        worker1.vos_data.force_update = True
+        assert worker1.get_vos_data() is not vos_data1
+        assert spy.call_count == 2
+
+        # While another process updates, the others don't wait for it; they keep their data
+        vos_data1 = worker1.vos_data.data
+        worker1.vos_data.force_update = True
+        with SharedSnapshot(worker1.snapshots["vos_data"].path).lock() as locked:
+            assert locked
+            assert worker1.get_vos_data() is vos_data1
+        assert spy.call_count == 2
+
+    def test_single_flight_refresh(self, mocker: MockerFixture):
+        import threading
+        from webapp import vo_reader
+        from webapp.models import GlobalData
+
+        gd = GlobalData({"TOPOLOGY_DATA_DIR": global_data.topology_data_dir, "NO_GIT": True}, strict=True)
+        stale = gd.get_vos_data()
+
+        started, finish = threading.Event(), threading.Event()
+        real_get_vos_data = vo_reader.get_vos_data
+
+        def slow_get_vos_data(*args, **kwargs):
+            started.set()
+            finish.wait(10)
+            return real_get_vos_data(*args, **kwargs)
+
+        mock = mocker.patch.object(vo_reader, "get_vos_data", side_effect=slow_get_vos_data)
+        gd.vos_data.force_update = True
+        refresher = threading.Thread(target=gd.get_vos_data)
+        refresher.start()
+        try:
+            assert started.wait(10)
+            # Other threads don't wait for the refresh in progress, they get the stale data
+            results = []
+            readers = [threading.Thread(target=lambda: results.append(gd.get_vos_data())) for _ in range(5)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(10)
+            assert len(results) == 5
+            assert all(result is stale for result in results)
+        finally:
+            finish.set()
+            refresher.join(10)
+        assert mock.call_count == 1
+        assert gd.get_vos_data() is not stale
+
+    def test_projects_use_loaded_vo_data(self, mocker: MockerFixture):
+        from webapp import project_reader
+        from webapp.models import GlobalData
+
+        gd = GlobalData({"TOPOLOGY_DATA_DIR": global_data.topology_data_dir, "NO_GIT": True}, strict=True)
+        assert gd.get_vos_data()
+        spy = mocker.spy(project_reader, "get_vos_data")
+        projects = gd.get_projects()
+        assert spy.call_count == 0
+        # standalone use still loads the VO data itself
+        assert project_reader.get_projects(gd.projects_dir) == projects
+        assert spy.call_count == 1
+
+    def test_ldap_background_refresh(self, tmp_path, mocker: MockerFixture):
+        import time
+        import ldap3
+        from webapp import ldap_data
+        from webapp.models import GlobalData
+
+        cilogon_user = "uid=readonly_user,ou=system,o=OSG,o=CO,dc=cilogon,dc=org"
+        ligo_user = "uid=osg-services,ou=system,dc=ligo,dc=org"
+        ligo_dn = "/DC=org/DC=example/CN=LIGO User"
+        cilogon_server, ligo_server = ldap3.Server("mock_cilogon"), ldap3.Server("mock_ligo")
+        conn = ldap3.Connection(cilogon_server, cilogon_user, "secret", client_strategy=ldap3.MOCK_SYNC)
+        conn.strategy.add_entry(cilogon_user, {"userPassword": "secret"})
+        conn.strategy.add_entry("uid=1,ou=people,o=OSG,o=CO,dc=cilogon,dc=org",
+                                {"voPersonID": "OSG1000001", "cn": "Test User", "mail": ["test@example.org"],
+                                 "sshPublicKey": ["ssh-ed25519 AAAA test"],
+                                 "isMemberOf": ["CO:members:active", "CO:COU:OASIS Managers:members:active"]})
+        conn = ldap3.Connection(ligo_server, ligo_user, "secret", client_strategy=ldap3.MOCK_SYNC)
+        conn.strategy.add_entry(ligo_user, {"userPassword": "secret"})
+        conn.strategy.add_entry("uid=ligo.user,ou=people,dc=ligo,dc=org",
+                                {"isMemberOf": ["Communities:LSCVirgoLIGOGroupMembers"], "gridX509subject": [ligo_dn]})
+        passfile = tmp_path / "ldappass"
+        passfile.write_text("secret")
+
+        def new_global_data():
+            return GlobalData({"TOPOLOGY_DATA_DIR": global_data.topology_data_dir, "NO_GIT": True,
+                               "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+                               "CILOGON_LDAP_URL": cilogon_server, "CILOGON_LDAP_USER": cilogon_user,
+                               "CILOGON_LDAP_PASSFILE": str(passfile), "LIGO_LDAP_URL": ligo_server,
+                               "LIGO_LDAP_USER": ligo_user, "LIGO_LDAP_PASSFILE": str(passfile),
+                               "LDAP_CLIENT_STRATEGY": ldap3.MOCK_SYNC})
+
+        def wait_for_refresh(gd):
+            deadline = time.monotonic() + 120
+            while time.monotonic() < deadline:
+                if all(job.last_success for job in gd.background_refresher.jobs.values()):
+                    break
+                time.sleep(0.1)
+
+        gd = new_global_data()
+        gd.start_background_refresh()
+        wait_for_refresh(gd)
+        assert gd.background_refresher.jobs.keys() >= {"comanage", "ligo_dn_list", "datasets"}
+
+        assert gd.get_cilogon_ssh_keys_map() == {"OSG1000001": ["ssh-ed25519 AAAA test"]}
+        assert gd.get_ligo_dn_list() == [ligo_dn]
+        assert "OSG1000001" in gd.get_contacts_data().users_by_id
+        for job in gd.background_refresher.jobs.values():
+            assert job.failures == 0 and job.last_success is not None
+
+        # A process that loads the datasets from the other's snapshot still loads the LDAP data itself
+        follower = new_global_data()
+        follower.start_background_refresh()
+        wait_for_refresh(follower)
+        assert follower.get_cilogon_ssh_keys_map() == {"OSG1000001": ["ssh-ed25519 AAAA test"]}
+        assert follower.get_ligo_dn_list() == [ligo_dn]
+
+        # Even once the data has expired, the getters only return the last data loaded
+        cilogon_query = mocker.patch.object(ldap_data, "get_cilogon_ldap_id_map", side_effect=AssertionError)
+        ligo_query = mocker.patch.object(ldap_data, "get_ligo_ldap_dn_list", side_effect=AssertionError)
+        for cached in [gd.comanage_data, gd.cilogon_ssh_keys, gd.ligo_dn_list]:
+            cached.force_update = True
+        assert gd.get_cilogon_ssh_keys_map() == {"OSG1000001": ["ssh-ed25519 AAAA test"]}
+        assert gd.get_ligo_dn_list() == [ligo_dn]
+        assert cilogon_query.call_count == ligo_query.call_count == 0
+
+    def test_background_refresher_backoff(self, mocker: MockerFixture):
+        from webapp.models import BackgroundRefresher
+
+        clock = mocker.patch("time.monotonic", return_value=1000.0)
+        results = [False, False, False, False, True]
+        refresher = BackgroundRefresher()
+        refresher.add("flaky", lambda: results.pop(0), interval=300, retry_delay=60)
+        job = refresher.jobs["flaky"]
+
+        delays = []
+        for _ in range(4):
+            delays.append(refresher.run_pending())
+            clock.return_value = job.next_run
+        assert delays == [60, 120, 240, 300]
+        refresher.run_pending()
+        assert job.failures == 0
+        assert 270 <= job.next_run - clock.return_value <= 330
+
+    def test_refresh_datasets(self, mocker: MockerFixture):
+        from webapp import project_reader, rg_reader, vo_reader
+        from webapp.models import BackgroundRefresher, GlobalData
+
+        gd = GlobalData({"TOPOLOGY_DATA_DIR": global_data.topology_data_dir, "NO_GIT": True})
+        assert gd.refresh_datasets()
+        assert set(gd.refresh_timings) == {"topology_repo", "indexes", *GlobalData.DATASETS}
+        old = {name: getattr(gd, name).data for name in GlobalData.DATASETS}
+        assert all(data is not None for data in old.values())
+        assert gd.vos_data.data.get_authz_index(gd.topology.data) is gd.vos_data.data.get_authz_index(gd.topology.data)
+
+        # If one dataset fails to load, none of them are replaced
+        mocker.patch.object(vo_reader, "get_vos_data", side_effect=ValueError("bad VO data"))
+        assert not gd.refresh_datasets()
+        assert all(getattr(gd, name).data is data for name, data in old.items())
+
+        # With a background refresher, the getters never load the data themselves once it's loaded
+        gd.background_refresher = BackgroundRefresher()
+        topology_spy = mocker.spy(rg_reader, "get_topology")
+        projects_spy = mocker.spy(project_reader, "get_projects")
+        for name in GlobalData.DATASETS:
+            getattr(gd, name).force_update = True
+        assert gd.get_topology() is old["topology"]
+        assert gd.get_vos_data() is old["vos_data"]
+        assert gd.get_projects() is old["projects"]
+        assert gd.get_contacts_data() is old["merged_contacts_data"]
+        assert gd.get_mappings() is old["mappings"]
+        assert topology_spy.call_count == projects_spy.call_count == 0
+
+    def test_refresh_datasets_after_failure(self, tmp_git_repo, mocker: MockerFixture):
+        from webapp import vo_reader
+
+        tmp_git_repo.add_data("topology", "virtual-organizations", "projects", "mappings")
+        gd = tmp_git_repo.global_data({"TOPOLOGY_INCREMENTAL_RELOAD": True})
+        assert gd.refresh_datasets()
+        num_rgs = len(gd.topology.data.rgs)
+
+        rg_path = next(path for path in (tmp_git_repo.path / "topology").glob("*/*/*.yaml")
+                       if not path.name.endswith("_downtime.yaml") and path.name != "SITE.yaml")
+        tmp_git_repo.git("rm", "-q", str(rg_path))
+        tmp_git_repo.commit("remove an RG")
+
+        # The topology is loaded from the new commit, but a later step fails, so it's thrown away...
+        mocker.patch.object(vo_reader, "get_vos_data", side_effect=ValueError("bad VO data"))
+        assert not gd.refresh_datasets()
+        assert len(gd.topology.data.rgs) == num_rgs
+        mocker.stopall()
+
+        # ... and loaded again on the next refresh
+        assert gd.refresh_datasets()
+        assert len(gd.topology.data.rgs) == num_rgs - 1
+
+    def test_fetch_sources_concurrently(self, mocker: MockerFixture):
+        import threading
+        from webapp.models import GlobalData
+
+        gd = GlobalData({"TOPOLOGY_DATA_DIR": global_data.topology_data_dir, "NO_GIT": True,
+                         "FETCH_TIMEOUTS": {"topology_repo": 10, "contacts_data": 0.5}})
+        contacts_db = gd._load_contact_db_data()
+        # The topology repo fetch waits for the contact repo fetch to start, so it only finishes if they run together
+        contacts_started, hung = threading.Event(), threading.Event()
+
+        def update_topology_repo(**_):
+            return contacts_started.wait(10)
+
+        def load_contacts():
+            contacts_started.set()
+            hung.wait(10)
+            return contacts_db
+
+        mocker.patch.object(gd, "maybe_update_topology_repo", side_effect=update_topology_repo)
+        contacts_fetch = mocker.patch.object(gd, "_load_contact_db_data", side_effect=load_contacts)
+        try:
+            timings = {}
+            fetched = gd._fetch_sources(timings)
+            # The one that hangs is given up on at its timeout
+            assert fetched == {"topology_repo": True, "contacts_data": None}
+            assert "topology_repo" in timings
+
+            # While it's still running, it isn't started again, and the refresh keeps the old data
+            assert not gd._refresh_datasets()
+            assert contacts_fetch.call_count == 1
+        finally:
+            hung.set()
+        assert gd.pending_fetches["contacts_data"].result(timeout=10) is contacts_db
+
+        # Once it's done, the next refresh fetches it again
+        contacts_fetch.side_effect = None
+        contacts_fetch.return_value = contacts_db
+        assert gd._refresh_datasets()
+        assert contacts_fetch.call_count == 2
+        assert gd.topology.data is not None and gd.contacts_data.data is contacts_db
+
+    def test_refresh_datasets_unchanged_repo(self, tmp_path, tmp_git_repo, mocker: MockerFixture):
+        from webapp import rg_reader, vo_reader
+        from webapp.models import GlobalData
+
+        origin = tmp_path / "origin.git"
+        tmp_git_repo.add_data("topology", "virtual-organizations", "projects", "mappings")
+        tmp_git_repo.git("init", "-q", "--bare", str(origin))
+        tmp_git_repo.git("push", "-q", str(origin), "HEAD:master")
+
+        gd = GlobalData({"TOPOLOGY_DATA_DIR": str(tmp_path / "clone"), "TOPOLOGY_DATA_REPO": "file://%s" % origin,
+                         "TOPOLOGY_DATA_BRANCH": "master", "NO_GIT": False})
+        assert gd.refresh_datasets()
+        generations = [getattr(gd, name).generation for name in GlobalData.DATASETS]
+
+        # Nothing changed in the repo: nothing is reparsed, and the data is kept
+        topology_spy = mocker.spy(rg_reader, "get_topology")
+        vos_spy = mocker.spy(vo_reader, "get_vos_data")
+        assert gd.refresh_datasets()
+        assert topology_spy.call_count == vos_spy.call_count == 0
+        assert [getattr(gd, name).generation for name in GlobalData.DATASETS] == generations
+
+        # After a push, the data is reloaded
+        vo_file = next((tmp_git_repo.path / "virtual-organizations").glob("*.yaml"))
+        with open(vo_file, "a") as fh:
+            fh.write("\n# a comment\n")
+        tmp_git_repo.commit("change a VO")
+        tmp_git_repo.git("push", "-q", str(origin), "HEAD:master")
+        assert gd.refresh_datasets()
+        assert vos_spy.call_count == 1
+        assert gd.vos_data.generation == generations[GlobalData.DATASETS.index("vos_data")] + 1
@@ -1,5 +1,4 @@
 from configparser import ConfigParser
-import copy
 
 import flask
 import pytest
@@ -58,8 +57,8 @@ MOCK_DN_LIST = list(MOCK_DNS_AND_HASHES.keys())
 
 @pytest.fixture
 def test_global_data() -> models.GlobalData:
-    """Get a copy of the global data with some entries created for testing"""
-    new_global_data = copy.deepcopy(global_data)
+    """Get a new global data, loaded from the same config, with some entries created for testing"""
+    new_global_data = models.GlobalData(app.config, strict=global_data.strict)
 
     # Start with a fully populated set of topology data
     topo = new_global_data.get_topology()
@@ -234,6 +233,52 @@ class TestStashcache:
                 assert False, f'Unexpected text "{line}".\nFull text:\n{text}\n'
         assert num_mappings > 5, f"Too few mappings found.\nFull text:\n{text}\n"
 
+    def test_legacy_authfile_leaves_namespaces_alone(self, client: flask.Flask, mocker: MockerFixture):
+        mocker.patch.object(global_data, "get_ligo_dn_list", return_value=MOCK_DN_LIST, autospec=True)
+        namespaces = [ns for _, ns in global_data.get_vos_data().get_vo_namespaces()]
+        authz_lists_before = [list(ns.authz_list) for ns in namespaces]
+
+        first = stashcache.generate_cache_authfile(global_data, I2_TEST_CACHE, legacy=True, suppress_errors=False)
+        second = stashcache.generate_cache_authfile(global_data, I2_TEST_CACHE, legacy=True, suppress_errors=False)
+
+        assert first == second
+        for hsh in MOCK_DNS_AND_HASHES.values():
+            assert hsh in first, f"LIGO DN hash {hsh} missing.\nFull text:\n{first}\n"
+        assert [list(ns.authz_list) for ns in namespaces] == authz_lists_before
+        assert global_data.get_ligo_authz_list() is global_data.get_ligo_authz_list(), "LIGO authz list not reused"
+
+    def test_ligo_dns_never_loaded(self, client: flask.Flask, mocker: MockerFixture):
+        mocker.patch.object(global_data, "get_ligo_dn_list", return_value=None, autospec=True)
+
+        # The authfile isn't generated without the LIGO DNs, rather than silently leaving them out
+        with pytest.raises(ConnectionError):
+            stashcache.generate_cache_authfile(global_data, I2_TEST_CACHE, legacy=True, suppress_errors=False)
+
+    def test_authz_index_matches_predicates(self, test_global_data):
+        topo = test_global_data.get_topology()
+        vos = test_global_data.get_vos_data()
+        index = vos.get_authz_index(topo)
+        assert vos.get_authz_index(topo) is index, "Index not reused"
+
+        resources = [r for g in topo.get_resource_group_list() for r in g.resources]
+        for vo_name, ns in vos.get_vo_namespaces():
+            expected_caches = [r for r in resources
+                               if (r.has_xrootd_cache or r.has_pelican_cache)
+                               and stashcache.namespace_allows_cache_resource(ns, r)
+                               and stashcache.resource_allows_namespace(r, ns)]
+            expected_origins = [r for r in resources
+                                if (r.has_xrootd_origin or r.has_pelican_origin)
+                                and stashcache.namespace_allows_origin_resource(ns, r)
+                                and stashcache.resource_allows_namespace(r, ns)]
+            assert index.caches_for_namespace(ns) == expected_caches, f"Wrong caches for {ns.path}"
+            assert index.origins_for_namespace(ns) == expected_origins, f"Wrong origins for {ns.path}"
+            for r in expected_caches:
+                assert index.cache_supports(r, ns)
+                assert (vo_name, ns) in index.namespaces_for_cache(r)
+            for r in expected_origins:
+                assert index.origin_supports(r, ns)
+                assert (vo_name, ns) in index.namespaces_for_origin(r)
+
 
 class TestNamespaces:
     @pytest.fixture
@@ -0,0 +1,136 @@
+import pytest
+
+# Rewrites the path so the app can be imported like it normally is
+import os
+import sys
+
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+os.environ['TESTING'] = "True"
+
+from app import global_data
+
+
+class TestTopology:
+
+    def test_downtime_index(self):
+        from datetime import datetime, timedelta, timezone
+        from webapp.topology import DowntimeIndex
+
+        downtimes = list(global_data.get_topology().downtimes)
+        assert downtimes
+        index = DowntimeIndex()
+        for dt in downtimes:
+            index.add(dt)
+
+        moments = [datetime.now(timezone.utc)]
+        for dt in downtimes[::max(1, len(downtimes) // 20)]:
+            moments += [dt.start_time, dt.start_time - timedelta(seconds=1), dt.end_time,
+                        dt.end_time + timedelta(seconds=1)]
+        epochs = set()
+        for now in moments:
+            assert index.past(now) == [dt for dt in downtimes if dt.end_time < now]
+            assert index.present(now) == [dt for dt in downtimes if dt.start_time <= now <= dt.end_time]
+            assert index.future(now) == [dt for dt in downtimes if dt.end_time >= now and dt.start_time > now]
+            since = now - timedelta(days=30)
+            assert index.past(now, since) == [dt for dt in downtimes if since <= dt.end_time < now]
+            epochs.add((index.epoch(now), tuple(map(id, index.present(now))), len(index.past(now))))
+        # the epoch identifies which downtimes are past, present, and future
+        assert len({epoch for epoch, _, _ in epochs}) == len(epochs)
+
+    def test_downtimes_ical_bytes(self):
+        from webapp.common import Filters
+
+        topology = global_data.get_topology()
+        for past_days in [-1, 0, 45]:
+            filters = Filters()
+            filters.past_days = past_days
+            expected = topology.get_downtimes_ical(False, filters).to_ical()
+            assert topology.get_downtimes_ical_bytes(False, filters) == expected
+            # the second time around, the pre-rendered events are used
+            assert topology.get_downtimes_ical_bytes(False, filters) == expected
+
+    def test_downtime_parsetime(self):
+        from webapp.topology import Downtime
+
+        time_strs = ["Mar 7, 2017 03:00 -0500", "Mar 7, 2017 03:00 +0530", "mar 07, 2017 23:59 UTC",
+                     "Mar 7, 2017 03:00", "Mar 7, 2017 03:00 AM UTC", "Mar 7, 2017 15:00 PM UTC",
+                     "Mar  7,  2017  03:00  am  utc", "Mar 7, 2017 3:5 AM UTC", "Mar 7, 2017 03:00 +05:00",
+                     "Feb 29, 2016 00:00 UTC", "Feb 29, 2017 00:00 UTC", "Mar 7, 2017 24:00", "Mar 32, 2017 03:00",
+                     "Mar 7, 2017 03:00 +0575", "Mar 7, 2017 03:00 +2500", "Mar 7, 2017 03:00 UTC ",
+                     "March 7, 2017 03:00", "Foo 7, 2017 03:00", "2017-03-07 03:00"]
+        for dt in global_data.get_topology().downtimes:
+            time_strs += [dt.data["StartTime"], dt.data["EndTime"]]
+        for time_str in time_strs:
+            try:
+                expected = Downtime._parsetime_strptime(time_str)
+            except ValueError:
+                with pytest.raises(ValueError):
+                    Downtime.parsetime(time_str)
+                continue
+            parsed = Downtime.parsetime(time_str)
+            assert parsed == expected and parsed.tzinfo == expected.tzinfo, time_str
+
+    def test_resource_base_trees(self):
+        from webapp.common import Filters, to_xml
+
+        topology = global_data.get_topology()
+
+        def summary(authorized, **filter_attrs):
+            filters = Filters()
+            for key, value in filter_attrs.items():
+                setattr(filters, key, value)
+            return to_xml(topology.get_resource_summary(authorized, filters))
+
+        full = summary(False)
+        full_authorized = summary(True)
+        assert summary(False, service_id=[1]) != full
+        assert summary(True, active=True, has_wlcg=True) != full_authorized
+        # Filtered and authorized requests don't change the trees shared between requests
+        assert summary(False) == full
+        assert summary(True) == full_authorized
+
+        rg = next(iter(topology.rgs.values()))
+        tree = rg.get_tree()
+        tree["GroupName"] = "changed"
+        tree["Resources"]["Resource"][0]["Name"] = "changed"
+        assert rg.get_tree()["GroupName"] == rg.name
+        assert rg.get_tree()["Resources"]["Resource"][0]["Name"] != "changed"
+
+    def test_filter_index(self):
+        import random
+        from datetime import datetime, timedelta, timezone
+        from webapp.common import Filters
+
+        topology = global_data.get_topology()
+        rgs = [topology.rgs[key] for key in sorted(topology.rgs.keys(), key=lambda x: x[1].lower())]
+        downtimes = list(topology.downtimes)
+        ids = {
+            "facility_id": sorted({rg.site.facility.id for rg in rgs}),
+            "site_id": sorted({rg.site.id for rg in rgs}),
+            "support_center_id": sorted({rg.support_center["ID"] for rg in rgs}),
+            "rg_id": sorted({rg.id for rg in rgs}),
+            "service_id": sorted(set(topology.common_data.service_types.values())),
+        }
+
+        rand = random.Random(0)
+        for _ in range(30):
+            filters = Filters()
+            for attr in rand.sample(sorted(ids), rand.randint(1, 2)):
+                setattr(filters, attr, rand.sample(ids[attr], min(len(ids[attr]), rand.randint(1, 3))))
+            filters.past_days = rand.choice([-1, 0, 30])
+
+            expected_rgs = [tree for tree in (rg.get_tree(False, filters) for rg in rgs) if tree]
+            assert topology.get_resource_summary(False, filters)["ResourceSummary"]["ResourceGroup"] == expected_rgs
+
+            now = datetime.now(timezone.utc)
+            since = now - timedelta(days=filters.past_days) if filters.past_days >= 0 else None
+            assert topology.downtimes.select(range(len(downtimes)), now, since) == \
+                (topology.downtimes.past(now, since), topology.downtimes.present(now), topology.downtimes.future(now))
+            tree = topology.get_downtimes(False, filters)["Downtimes"]
+            for treekey, timeframe_downtimes in [("PastDowntimes", topology.downtimes.past(now, since)),
+                                                 ("CurrentDowntimes", topology.downtimes.present(now)),
+                                                 ("FutureDowntimes", topology.downtimes.future(now))]:
+                expected = [t for t in (dt.get_tree(filters) for dt in timeframe_downtimes) if t]
+                assert tree[treekey]["Downtime"] == expected
@@ -20,6 +20,7 @@ class Validation:
     resource_groups: List[ResourceGroup]
     resource_group_names: Set[str]
     vos_data: VOsData
+    vo_ids: Dict[str, str]
     campus_grid_ids: Dict[str, int]
     project_filenames: List[str]
 
@@ -33,6 +34,7 @@ class Validation:
         self.resource_groups = self.global_data.get_topology().get_resource_group_list()
         self.resource_group_names = {x.name for x in self.resource_groups}
         self.vos_data = self.global_data.get_vos_data()
+        self.vo_ids = self.vos_data.get_vo_name_to_id()
         projects_dir = self.global_data.projects_dir
         self.campus_grid_ids = project_reader.get_campus_grid_ids(projects_dir)
         self.project_filenames = glob.glob(os.path.join(projects_dir, "[!_]*.yaml"))
@@ -48,7 +50,7 @@ class Validation:
         project_filebn = os.path.basename(project_filename)
         try:
             project = project_reader.get_one_project(
-                project_filename, self.campus_grid_ids, self.vos_data
+                project_filename, self.campus_grid_ids, self.vo_ids
             )
         except Exception as err:
             return ["%s: exception while reading: %r" % (project_filebn, err)]
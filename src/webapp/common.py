@@ -1,20 +1,24 @@
 from collections import OrderedDict
+import concurrent.futures
 from logging import getLogger
 import hashlib
+import itertools
 import json
 import os
+import pickle
 import re
 import subprocess
 import sys
-from typing import Any, Dict, List, Union, AnyStr, NewType, TypeVar
-from functools import wraps
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union, AnyStr, NewType, TypeVar
+from functools import lru_cache, wraps
 
 log = getLogger(__name__)
 
-import xmltodict
 import yaml
 import csv
 from io import StringIO
+from xml.sax import saxutils
 
 try:
     from yaml import CSafeLoader as SafeLoader
@@ -22,6 +26,11 @@ except ImportError:
     log.warning("CSafeLoader not available - install libyaml-devel and reinstall PyYAML")
     from yaml import SafeLoader
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 MISCUSER_SCHEMA_URL = "https://topology.opensciencegrid.org/schema/miscuser.xsd"
 RGSUMMARY_SCHEMA_URL = "https://topology.opensciencegrid.org/schema/rgsummary.xsd"
 RGDOWNTIME_SCHEMA_URL = "https://topology.opensciencegrid.org/schema/rgdowntime.xsd"
@@ -34,6 +43,16 @@ PreJSON = NewType("PreJSON", Union[List, Dict[str, Any]])  # a complex data stru
 T = TypeVar("T")
 
 
+def _get_canonical_filters(filters) -> tuple:
+    """Return the attributes of a filters object as a sorted tuple of (name, value) pairs,
+    with lists turned into sorted tuples of unique items.
+    """
+    return tuple(
+        (name, tuple(sorted(set(value))) if isinstance(value, list) else value)
+        for name, value in sorted(vars(filters).items())
+    )
+
+
 class Filters(object):
     def __init__(self):
         self.facility_id = []
@@ -55,6 +74,17 @@ class Filters(object):
     def populate_voown_name(self, vo_id_to_name: Dict):
         self.voown_name = [vo_id_to_name.get(i, "") for i in self.voown_id]
 
+    def get_canonical(self) -> tuple:
+        """Return a hashable, normalized form of the filters, for use in cache keys.
+        The ID lists are only used for membership tests, so filters that differ only in the
+        order or duplication of IDs have the same canonical form.
+        """
+        return _get_canonical_filters(self)
+
+    def get_digest(self) -> str:
+        """Return a stable hex digest of the canonical form of the filters"""
+        return hashlib.sha1(repr(self.get_canonical()).encode()).hexdigest()
+
 
 class NamespacesFilters:
     """
@@ -66,6 +96,14 @@ class NamespacesFilters:
         self.production = True
         self.itb = True
 
+    def get_canonical(self) -> tuple:
+        """Return a hashable, normalized form of the filters, for use in cache keys"""
+        return _get_canonical_filters(self)
+
+    def get_digest(self) -> str:
+        """Return a stable hex digest of the canonical form of the filters"""
+        return hashlib.sha1(repr(self.get_canonical()).encode()).hexdigest()
+
 
 def to_csv(data: list) -> str:
     csv_string = StringIO()
@@ -198,12 +236,84 @@ def order_dict(value: Dict, ordering: List, ignore_missing=False) -> OrderedDict
     return new_value
 
 
+# Approximate size (in str pieces) of the chunks iter_xml() yields
+_XML_CHUNK_PIECES = 4096
+
+
+def _iter_xml_element(key: str, value, depth: int, pieces: List[str]) -> Iterator[str]:
+    """Append the XML for the element(s) `key` with `value` to `pieces`, yielding the joined pieces
+    whenever enough have accumulated.  Follows the conventions of xmltodict.unparse(): lists become
+    repeated elements, "@" keys become attributes, and "#text" keys become character data.
+    """
+    if not hasattr(value, "__iter__") or isinstance(value, (str, dict)):
+        value = [value]
+    for index, v in enumerate(value):
+        if depth == 0 and index > 0:
+            raise ValueError("document with multiple roots")
+        if v is None:
+            v = {}
+        elif isinstance(v, bool):
+            v = "true" if v else "false"
+        elif not isinstance(v, dict):
+            v = str(v)
+        if isinstance(v, str):
+            v = {"#text": v}
+        cdata = None
+        attrs = {}
+        children = []
+        for ik, iv in v.items():
+            if ik == "#text":
+                cdata = iv
+            elif ik.startswith("@"):
+                if ik == "@xmlns" and isinstance(iv, dict):
+                    for ns_key, ns_value in iv.items():
+                        attrs["xmlns:" + ns_key if ns_key else "xmlns"] = str(ns_value)
+                else:
+                    attrs[ik[1:]] = str(iv)
+            else:
+                children.append((ik, iv))
+        pieces.append("\t" * depth + "<" + key)
+        for attr_key, attr_value in attrs.items():
+            pieces.append(" %s=%s" % (attr_key, saxutils.quoteattr(attr_value)))
+        pieces.append(">\n" if children else ">")
+        for child_key, child_value in children:
+            yield from _iter_xml_element(child_key, child_value, depth + 1, pieces)
+        if cdata:
+            if not isinstance(cdata, str):
+                cdata = str(cdata, "utf-8")
+            pieces.append(saxutils.escape(cdata))
+        if children:
+            pieces.append("\t" * depth)
+        pieces.append("</%s>\n" % key if depth else "</%s>" % key)
+        if len(pieces) >= _XML_CHUNK_PIECES:
+            yield "".join(pieces)
+            pieces.clear()
+
+
+def iter_xml(data) -> Iterator[str]:
+    """Serialize `data`, a dict with a single root element, to a pretty-printed XML document,
+    yielding it in chunks as it goes.  The output is the same as xmltodict.unparse(data, pretty=True).
+    """
+    if len(data) != 1:
+        raise ValueError("Document must have exactly one root.")
+    pieces = ['<?xml version="1.0" encoding="utf-8"?>\n']
+    for key, value in data.items():
+        yield from _iter_xml_element(key, value, 0, pieces)
+    yield "".join(pieces)
+
+
+def iter_xml_bytes(data) -> Iterator[bytes]:
+    """Like iter_xml() but the chunks are encoded, for streaming in a response"""
+    for chunk in iter_xml(data):
+        yield chunk.encode("utf-8", errors="replace")
+
+
 def to_xml(data) -> str:
-    return xmltodict.unparse(data, pretty=True, encoding="utf-8")
+    return "".join(iter_xml(data))
 
 
 def to_xml_bytes(data) -> bytes:
-    return to_xml(data).encode("utf-8", errors="replace")
+    return b"".join(iter_xml_bytes(data))
 
 
 # bytes cannot be encoded to json in python3
@@ -218,12 +328,54 @@ def bytes2str(o):
         return o
 
 
+def _json_default(o):
+    # bytes cannot be encoded to json in python3; decode them as they're encountered
+    # instead of making a copy of the whole structure with bytes2str() first
+    if isinstance(o, bytes):
+        return o.decode(errors='ignore')
+    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+
+
+# The library to_json() and to_json_bytes() use; see set_json_backend()
+_json_backend = "json"
+
+
+def set_json_backend(backend: Optional[str]) -> None:
+    """Choose how to_json() and to_json_bytes() encode.  "json" (the default) uses the standard
+    library.  "orjson" uses orjson, if it is installed, which is several times faster but writes
+    compact JSON, with non-ASCII characters as UTF-8 instead of \\u escapes.  Either way, keys are sorted.
+    """
+    global _json_backend
+    backend = backend or "json"
+    if backend not in ("json", "orjson"):
+        raise ValueError(f"Unknown JSON backend {backend!r}")
+    if backend == "orjson" and not orjson:
+        log.warning("orjson not available - using the json module")
+        backend = "json"
+    _json_backend = backend
+
+
+def _to_json_std(data: PreJSON) -> str:
+    try:
+        return json.dumps(data, sort_keys=True, default=_json_default)
+    except TypeError:
+        # e.g. bytes keys, which the default hook never sees
+        return json.dumps(bytes2str(data), sort_keys=True)
+
+
 def to_json(data: PreJSON) -> str:
-    return json.dumps(bytes2str(data), sort_keys=True)
+    if _json_backend == "orjson":
+        return to_json_bytes(data).decode("utf-8")
+    return _to_json_std(data)
 
 
 def to_json_bytes(data: PreJSON) -> bytes:
-    return to_json(data).encode("utf-8", errors="replace")
+    if _json_backend == "orjson":
+        try:
+            return orjson.dumps(data, default=_json_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            pass  # e.g. lone surrogates; the json module copes with those
+    return _to_json_std(data).encode("utf-8", errors="replace")
 
 
 def trim_space(s: str) -> str:
@@ -240,6 +392,16 @@ def fix_newlines(in_str: str) -> str:
     return in_str.replace("\r\n", "\n").replace("\r", " ")
 
 
+def _git_env(ssh_key=None) -> Optional[Dict[str, str]]:
+    """Return the environment to run git in to use `ssh_key` (None for our own)"""
+    if not ssh_key:
+        return None
+    env = dict(os.environ)
+    env['GIT_SSH_KEY_FILE'] = ssh_key
+    env['GIT_SSH'] = SSH_WITH_KEY
+    return env
+
+
 def run_git_cmd(cmd: List, dir=None, git_dir=None, ssh_key=None) -> bool:
     """
     Run git command, optionally specifying ssh key and/or git dirs
@@ -266,13 +428,7 @@ def run_git_cmd(cmd: List, dir=None, git_dir=None, ssh_key=None) -> bool:
 
     full_cmd = base_cmd + cmd
 
-    env = None
-    if ssh_key:
-        env = dict(os.environ)
-        env['GIT_SSH_KEY_FILE'] = ssh_key
-        env['GIT_SSH'] = SSH_WITH_KEY
-
-    git_result = subprocess.run(full_cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+    git_result = subprocess.run(full_cmd, env=_git_env(ssh_key), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                                 encoding="utf-8")
     if git_result.returncode != 0:
         out = git_result.stdout
@@ -282,15 +438,76 @@ def run_git_cmd(cmd: List, dir=None, git_dir=None, ssh_key=None) -> bool:
     return True
 
 
-def git_clone_or_pull(repo, dir, branch, ssh_key=None) -> bool:
+def get_git_cmd_output(cmd: List, dir: str) -> Optional[str]:
+    """
+    Run a (read-only) git command in the work-tree `dir` and return its output,
+    or None if it failed.
+    """
+    git_result = subprocess.run(["git", "-C", dir] + cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                encoding="utf-8")
+    if git_result.returncode != 0:
+        log.debug("Git failed:\nCommand was {0}\nOutput was:\n{1}".format(cmd, git_result.stderr))
+        return None
+    return git_result.stdout
+
+
+def git_head(dir: str) -> Optional[str]:
+    """Return the sha of HEAD in the git work-tree `dir`, or None if it can't be determined"""
+    out = get_git_cmd_output(["rev-parse", "--verify", "HEAD"], dir)
+    return out.strip() if out else None
+
+
+def git_changed_files(dir: str, old_sha: str, new_sha: str) -> Optional[List[str]]:
+    """Return the paths (relative to `dir`) of the files under `dir` added, changed, or removed
+    between two commits, or None if git can't tell us.
+    """
+    out = get_git_cmd_output(["diff", "--name-only", "--no-renames", "--relative", "-z", old_sha, new_sha, "--"],
+                             dir)
+    if out is None:
+        return None
+    return [x for x in out.split("\0") if x]
+
+
+def git_remote_head(dir: str, branch: str, ssh_key=None) -> Optional[str]:
+    """Return the sha of the tip of `branch` in the origin remote of the git work-tree `dir`,
+    asking the remote (without fetching anything), or None if it can't be determined.
+    """
+    if ssh_key and not os.path.exists(ssh_key):
+        log.critical("ssh key not found at %s: unable to update secure repo", ssh_key)
+        return None
+    git_result = subprocess.run(["git", "-C", dir, "ls-remote", "origin", "refs/heads/" + branch],
+                                env=_git_env(ssh_key), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                encoding="utf-8")
+    if git_result.returncode != 0:
+        log.warning("Git ls-remote of %s in %s failed:\n%s", branch, dir, git_result.stderr)
+        return None
+    out = git_result.stdout.split()
+    return out[0] if out else None
+
+
+def git_clone_or_pull(repo, dir, branch, ssh_key=None) -> Optional[str]:
+    """Make the git work-tree `dir` a clone of `branch` of `repo`, and return the sha of the
+    commit checked out, or None on failure.  Callers can compare the sha to the one they last
+    loaded to tell whether anything changed.
+
+    If the tip of the branch in the remote is already checked out, nothing is fetched (or
+    cleaned up).  Otherwise only the new tip is fetched, without its history, so the clone is
+    shallow; the commits checked out before stay in the repo, so they can still be diffed against.
+    """
     if os.path.exists(os.path.join(dir, ".git")):
+        remote_head = git_remote_head(dir, branch, ssh_key)
+        if remote_head is None:
+            return None
+        if remote_head == git_head(dir):
+            log.debug("%s is up to date at %s", dir, remote_head)
+            return remote_head
         _ = run_git_cmd(["clean", "-df"], dir=dir)
-        ok = run_git_cmd(["fetch", "origin"], dir=dir, ssh_key=ssh_key)
+        ok = run_git_cmd(["fetch", "--depth=1", "origin",
+                          "+refs/heads/{0}:refs/remotes/origin/{0}".format(branch)], dir=dir, ssh_key=ssh_key)
         ok = ok and run_git_cmd(["reset", "--hard", "origin/{0}".format(branch)], dir=dir)
     else:
-        ok = run_git_cmd(["clone", repo, dir], ssh_key=ssh_key)
-        ok = ok and run_git_cmd(["checkout", branch], dir=dir)
-    return ok
+        ok = run_git_cmd(["clone", "--depth=1", "--branch", branch, repo, dir], ssh_key=ssh_key)
+    return git_head(dir) if ok else None
 
 
 def is_true(input_) -> bool:
@@ -323,28 +540,200 @@ def gen_id_from_yaml(data: dict, alternate_name: str, id_key = "ID", mod = 2 **
     """
     return data[id_key] if data.get(id_key) is not None else gen_id(alternate_name, mod, minimum, hashfn)
 
+@lru_cache(maxsize=65536)
 def gen_id(instr: AnyStr, mod = 2 ** 31 - 1, minimum=1, hashfn=hashlib.md5) -> int:
     """
     Convert a string to its integer md5sum, used to autogenerate unique IDs for entities where
-    not otherwise specified
+    not otherwise specified.  Results are memoized, since the same names are hashed on every reload.
     """
     instr_b = instr if isinstance(instr, bytes) else instr.encode("utf-8", "surrogateescape")
     return minimum + (int(hashfn(instr_b).hexdigest(), 16) % mod)
 
 
+# Directory for the on-disk cache of parsed yaml files; see set_yaml_cache_dir()
+_yaml_cache_dir = os.environ.get("TOPOLOGY_YAML_CACHE_DIR") or None
+# Bump this if the way files are parsed changes, to invalidate old cache entries
+_YAML_CACHE_VERSION = b"1"
+
+
+def set_yaml_cache_dir(cache_dir: Optional[str]) -> None:
+    """Make load_yaml_file() keep the parsed contents of each file it loads in `cache_dir`,
+    keyed by a hash of the file's contents, and use them instead of parsing a file whose
+    contents have been seen before.  Entries are pickles, so `cache_dir` must only be
+    writable by the user the webapp or tools run as.  None disables the cache.
+
+    The default comes from the TOPOLOGY_YAML_CACHE_DIR environment variable.
+    Nothing is removed from the cache on its own; see prune_yaml_cache().
+    """
+    global _yaml_cache_dir
+    _yaml_cache_dir = cache_dir or None
+
+
+def prune_yaml_cache(max_age: float) -> int:
+    """Remove the entries of the on-disk yaml cache (and leftover temp files) that haven't been
+    used in the last `max_age` seconds, so old revisions of files don't pile up forever.  Every
+    use of an entry resets its age.  Return the number of files removed.
+    """
+    if not _yaml_cache_dir:
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        subdirs = [entry.path for entry in os.scandir(_yaml_cache_dir) if entry.is_dir()]
+    except FileNotFoundError:
+        return 0
+    for subdir in subdirs:
+        try:
+            for entry in os.scandir(subdir):
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass  # another process pruned it first
+        except OSError as e:
+            log.warning("Couldn't prune yaml cache dir %s: %r", subdir, e)
+    return removed
+
+
+def _parse_yaml_file(filename) -> ParsedYaml:
+    with open(filename, encoding='utf-8', errors='surrogateescape') as stream:
+        return yaml.load(stream, Loader=SafeLoader)
+
+
+def _parse_yaml_file_cached(filename, cache_dir: str) -> ParsedYaml:
+    with open(filename, "rb") as fh:
+        digest = hashlib.sha1(_YAML_CACHE_VERSION + b"\0" + fh.read()).hexdigest()
+    cache_path = os.path.join(cache_dir, digest[:2], digest + ".pickle")
+    try:
+        with open(cache_path, "rb") as fh:
+            data = pickle.load(fh)
+        try:
+            os.utime(cache_path)  # for prune_yaml_cache()
+        except OSError:
+            pass
+        return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning("Ignoring unreadable yaml cache entry %s for %s: %r", cache_path, filename, e)
+
+    data = _parse_yaml_file(filename)
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log.debug("Couldn't write yaml cache entry %s for %s: %r", cache_path, filename, e)
+    return data
+
+
 def load_yaml_file(filename) -> ParsedYaml:
     """Load a yaml file (wrapper around yaml.safe_load() because it does not
     report the filename in which an error occurred.
 
+    If a cache dir is set (see set_yaml_cache_dir()), unchanged files are
+    loaded from the cache instead of being parsed.
     """
     try:
-        with open(filename, encoding='utf-8', errors='surrogateescape') as stream:
-            return yaml.load(stream, Loader=SafeLoader)
+        if _yaml_cache_dir:
+            return _parse_yaml_file_cached(filename, _yaml_cache_dir)
+        return _parse_yaml_file(filename)
     except yaml.YAMLError as e:
         log.error("YAML error in %s: %s", filename, e)
         raise
 
 
+def _load_yaml_file_or_exception(filename, cache_dir: Optional[str]):
+    """Parse a yaml file in a preload_yaml_files() worker; return (data, None) or (None, exception)"""
+    try:
+        if cache_dir:
+            return _parse_yaml_file_cached(filename, cache_dir), None
+        return _parse_yaml_file(filename), None
+    except Exception as e:
+        return None, e
+
+
+def preload_yaml_files(filenames: Iterable, workers: int) -> Callable[..., ParsedYaml]:
+    """Parse yaml files in a pool of `workers` processes, and return a function to use in place of
+    load_yaml_file() to get the results.  Each preloaded file can be gotten once; other files are
+    loaded with load_yaml_file().
+
+    Errors are raised (and logged) when the file is gotten, not when it's parsed, so callers see the
+    same exceptions in the same order as if they had called load_yaml_file() themselves.
+
+    If `workers` is less than 2, or the pool can't be started, nothing is preloaded.
+    """
+    filenames = [os.fspath(f) for f in filenames]
+    results = {}
+    if workers > 1 and filenames:
+        chunksize = max(1, len(filenames) // (workers * 4))
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                results = dict(zip(filenames, executor.map(_load_yaml_file_or_exception, filenames,
+                                                           itertools.repeat(_yaml_cache_dir),
+                                                           chunksize=chunksize)))
+        except (OSError, concurrent.futures.BrokenExecutor) as e:
+            log.warning("Couldn't parse yaml files in parallel (%r); parsing them one at a time", e)
+            results = {}
+
+    def load(filename) -> ParsedYaml:
+        try:
+            data, error = results.pop(os.fspath(filename))
+        except KeyError:
+            return load_yaml_file(filename)
+        if error is not None:
+            if isinstance(error, yaml.YAMLError):
+                log.error("YAML error in %s: %s", filename, error)
+            raise error
+        return data
+
+    return load
+
+
+class ParsedYamlCache:
+    """Caches the results of load_yaml_file() by path, so a reload of a data tree only has to parse
+    the files that changed.  The caller is responsible for invalidating changed files, e.g. based
+    on `git diff` (see git_changed_files()).
+
+    Entries are stored pickled: each load returns a fresh copy that the caller may modify, and
+    unpickling is much faster than parsing YAML.  Files that fail to parse are not cached.
+    """
+    def __init__(self):
+        self._pickled = {}  # type: Dict[str, bytes]
+
+    @staticmethod
+    def _key(filename) -> str:
+        return os.path.abspath(str(filename))
+
+    def __contains__(self, filename) -> bool:
+        return self._key(filename) in self._pickled
+
+    def load(self, filename, parse: Callable[..., ParsedYaml] = None) -> ParsedYaml:
+        """Return the parsed contents of a yaml file, parsing it with `parse`
+        (load_yaml_file() by default) if it's not in the cache.
+        """
+        key = self._key(filename)
+        pickled = self._pickled.get(key)
+        if pickled is not None:
+            return pickle.loads(pickled)
+        data = (parse or load_yaml_file)(filename)
+        self._pickled[key] = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        return data
+
+    def invalidate(self, filenames: Iterable) -> None:
+        for filename in filenames:
+            self._pickled.pop(self._key(filename), None)
+
+    def clear(self) -> None:
+        self._pickled = {}
+
+    def __len__(self):
+        return len(self._pickled)
+
+
 def readfile(path, logger):
     """ return stripped file contents, or None on errors """
     if path:
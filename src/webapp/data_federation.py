@@ -1,8 +1,8 @@
 import re
 import urllib
 import urllib.parse
-from collections import OrderedDict
-from typing import Optional, List, Dict, Tuple, Union, Set
+from collections import OrderedDict, defaultdict
+from typing import Optional, List, Dict, Tuple, Union, Set, Iterable, Sequence
 
 from .common import PELICAN_CACHE, PELICAN_ORIGIN, XROOTD_CACHE_SERVER, XROOTD_ORIGIN_SERVER, ParsedYaml, is_null
 try:
@@ -11,6 +11,10 @@ except ImportError:  # if asn1 is unavailable
     generate_dn_hash = None
 
 
+ANY = "ANY"
+ANY_PUBLIC = "ANY_PUBLIC"
+
+
 class AuthMethod:
     __slots__ = ("authfile_id", "grid_mapfile_line", "namespaces_scitokens_block")
     is_public = False
@@ -193,7 +197,7 @@ class Namespace:
         vo_name: str,
         allowed_origins: List[str],
         allowed_caches: List[str],
-        authz_list: List[AuthMethod],
+        authz_list: Sequence[AuthMethod],
         writeback: Optional[str],
         dirlist: Optional[str],
         credential_generation: Optional[CredentialGeneration],
@@ -202,7 +206,8 @@ class Namespace:
         self.vo_name = vo_name
         self.allowed_origins = allowed_origins
         self.allowed_caches = allowed_caches
-        self.authz_list = authz_list
+        # A tuple, so code that extends it for its own use can't change it for everyone else
+        self.authz_list: Tuple[AuthMethod, ...] = tuple(authz_list)
         self.writeback = writeback
         self.dirlist = dirlist
         self.credential_generation = credential_generation
@@ -406,3 +411,120 @@ class StashCache:
                 continue
             authz_list.append(parsed_authz)
         return authz_list
+
+
+def resource_allows_namespace(resource: "Resource", namespace: Optional[Namespace]) -> bool:
+    """Return True if the given resource's (cache or origin) AllowedVOs allows a namespace, which happens if:
+
+    - The namespace's VO is in the AllowedVOs list, or
+    - The namespace is public and ANY_PUBLIC is in the AllowedVOs list, or
+    - ANY is in the AllowedVOs list; in this case, namespace may be `None`
+
+    This says nothing about whether the namespace allows the cache/origin.
+    namespace may be None, in which case thie returns true only if ANY is in the AllowedVOs list.
+    No type/service checking is done in this function.
+    """
+    allowed_vos = resource.data.get("AllowedVOs", [])
+    if ANY in allowed_vos:
+        return True
+    if namespace:
+        if ANY_PUBLIC in allowed_vos and namespace.is_public():
+            return True
+        elif namespace.vo_name in allowed_vos:
+            return True
+    return False
+
+
+def namespace_allows_origin_resource(namespace: Namespace, origin: Optional["Resource"]) -> bool:
+    """Return True if the given namespace allows a given origin resouce, which happens if
+    the origin resource's name is in the namespace's AllowedOrigins list.
+    Return False if origin is None.
+
+    This says nothing about whether the origin allows the namespace.
+    No type/service checking is done in this function.
+    """
+    return origin and origin.name in namespace.allowed_origins
+
+
+def namespace_allows_cache_resource(namespace: Namespace, cache: Optional["Resource"]) -> bool:
+    """Return True if the given namespace allows a given cache resource, which happens if:
+
+    - The cache resource's name is in the namespace's AllowedCaches list, or
+    - The namespace's AllowedCaches list contains ANY; in this cache, cache may be None.
+
+    This says nothing about whether the cache allows the namespace.
+    No type/service checking is done in this function.
+    """
+    if ANY in namespace.allowed_caches:
+        return True
+    return cache and cache.name in namespace.allowed_caches
+
+
+class AuthzIndex:
+    """Inverted index between namespaces and the cache and origin resources that support them.
+    "Support" is in both directions: the resource allows the namespace, AND the namespace allows
+    the resource (see the functions above).
+
+    Caches are resources with an XRootD or Pelican cache service; origins are resources with an
+    XRootD or Pelican origin service.  Lists preserve the order the namespaces and resources were
+    given in, so output generated by walking the index is stable.
+
+    Resources are keyed by name and namespaces by identity, so the index is only valid for the
+    topology and VO data it was built from.
+    """
+    def __init__(self, vo_namespaces: Iterable[Tuple[str, Namespace]], resources: Iterable["Resource"]):
+        self.caches_by_namespace = {}  # type: Dict[Namespace, List[Resource]]
+        self.origins_by_namespace = {}  # type: Dict[Namespace, List[Resource]]
+        self.namespaces_by_cache = defaultdict(list)  # type: Dict[str, List[Tuple[str, Namespace]]]
+        self.namespaces_by_origin = defaultdict(list)  # type: Dict[str, List[Tuple[str, Namespace]]]
+        self._cache_pairs = set()  # type: Set[Tuple[int, str]]
+        self._origin_pairs = set()  # type: Set[Tuple[int, str]]
+
+        all_caches = []
+        all_origins = []
+        for resource in resources:
+            if resource.has_xrootd_cache or resource.has_pelican_cache:
+                all_caches.append(resource)
+            if resource.has_xrootd_origin or resource.has_pelican_origin:
+                all_origins.append(resource)
+
+        for vo_name, namespace in vo_namespaces:
+            caches = [cache
+                      for cache in all_caches
+                      if namespace_allows_cache_resource(namespace, cache)
+                      and resource_allows_namespace(cache, namespace)]
+            self.caches_by_namespace[namespace] = caches
+            for cache in caches:
+                self.namespaces_by_cache[cache.name].append((vo_name, namespace))
+                self._cache_pairs.add((id(namespace), cache.name))
+
+            origins = [origin
+                       for origin in all_origins
+                       if namespace_allows_origin_resource(namespace, origin)
+                       and resource_allows_namespace(origin, namespace)]
+            self.origins_by_namespace[namespace] = origins
+            for origin in origins:
+                self.namespaces_by_origin[origin.name].append((vo_name, namespace))
+                self._origin_pairs.add((id(namespace), origin.name))
+
+    def caches_for_namespace(self, namespace: Namespace) -> List["Resource"]:
+        """Return the caches that support `namespace`."""
+        return self.caches_by_namespace.get(namespace, [])
+
+    def origins_for_namespace(self, namespace: Namespace) -> List["Resource"]:
+        """Return the origins that support `namespace`."""
+        return self.origins_by_namespace.get(namespace, [])
+
+    def namespaces_for_cache(self, cache: "Resource") -> List[Tuple[str, Namespace]]:
+        """Return the (VO name, namespace) pairs supported by `cache`."""
+        return self.namespaces_by_cache.get(cache.name, [])
+
+    def namespaces_for_origin(self, origin: "Resource") -> List[Tuple[str, Namespace]]:
+        """Return the (VO name, namespace) pairs supported by `origin`."""
+        return self.namespaces_by_origin.get(origin.name, [])
+
+    def cache_supports(self, cache: "Resource", namespace: Namespace) -> bool:
+        return (id(namespace), cache.name) in self._cache_pairs
+
+    def origin_supports(self, origin: "Resource", namespace: Namespace) -> bool:
+        return (id(namespace), origin.name) in self._origin_pairs
@@ -4,6 +4,30 @@ TOPOLOGY_DATA_DIR = "/tmp/topology/topology"
 TOPOLOGY_DATA_REPO = "https://github.com/opensciencegrid/topology"
 TOPOLOGY_DATA_BRANCH = "master"
 TOPOLOGY_CACHE_LIFETIME = 60 * 5
+# On refresh, reparse only the topology files changed in git since the last load (and nothing if
+# none changed).  Defaults to on unless NO_GIT is set, since local edits aren't seen by git diff.
+# TOPOLOGY_INCREMENTAL_RELOAD = True
+
+# Number of processes to parse topology, VO, and project YAML files in;
+# 0 or 1 parses them in the webapp process, one at a time.
+YAML_PARSE_WORKERS = 0
+
+# YAML_CACHE_DIR and SNAPSHOT_DIR must not be writable by anyone but the webapp user
+# Cache of parsed YAML files, keyed by content hash
+YAML_CACHE_DIR = None
+# Seconds after which unused YAML_CACHE_DIR entries are pruned (checked daily)
+YAML_CACHE_MAX_AGE = 60 * 60 * 24 * 7
+# Snapshots of the loaded data shared between processes, so only one of them loads each dataset
+SNAPSHOT_DIR = None
+
+# Library used to encode JSON responses: "json" (the standard library) or "orjson", which is several
+# times faster, if installed, but writes compact JSON with non-ASCII characters as UTF-8
+JSON_BACKEND = "json"
+
+# Max number of serialized XML/JSON responses (one per endpoint, filter set, and
+# authorization level) kept between data updates.  XML responses that don't fit are
+# streamed to the client as they are serialized instead.
+RESPONSE_CACHE_MAX_ENTRIES = 1000
 
 WEBHOOK_DATA_DIR = "/tmp/topology-webhook/topology.git"
 WEBHOOK_DATA_REPO = "https://github.com/opensciencegrid/topology"
@@ -20,6 +44,14 @@ CONTACT_CACHE_LIFETIME = 60 * 2
 
 CILOGON_LDAP_PASSFILE = None
 
+# ldap3 client strategy for the CILogon and LIGO LDAP queries; None for the default (SYNC).
+# ldap3.MOCK_SYNC works with *_LDAP_URL set to an ldap3.Server populated with test entries.
+# The LDAP data is refreshed in a background thread, every CONTACT_CACHE_LIFETIME seconds.
+LDAP_CLIENT_STRATEGY = None
+
+# Max seconds a data refresh waits for each of the git repos, which are updated concurrently
+# FETCH_TIMEOUTS = {"topology_repo": 300, "contacts_data": 300}
+
 CACHE_LIFETIME = 60 * 5
 
 NO_GIT = False
@@ -1,5 +1,5 @@
 import logging
-from typing import List
+from typing import List, Optional, Union
 
 import ldap3
 
@@ -28,11 +28,20 @@ _ACTIVE_COPERSON_FILTER = "(&(ismemberOf=CO:members:active)" + \
     "(ismemberOf=CO:COU:OASIS Managers:members:active)))"
 
 
-def get_cilogon_ldap_id_map(ldap_url, ldap_user, ldap_pass):
+def _get_server(ldap_url: Union[str, ldap3.Server], timeout: int) -> ldap3.Server:
+    """ return a server for the URL; a Server passed in is used as is, e.g.
+        one populated for ldap3's MOCK_SYNC client strategy """
+    if isinstance(ldap_url, ldap3.Server):
+        return ldap_url
+    return ldap3.Server(ldap_url, connect_timeout=timeout)
+
+
+def get_cilogon_ldap_id_map(ldap_url, ldap_user, ldap_pass, client_strategy: Optional[str] = None):
     """ return dict of cilogon ldap data for each CILogonID, with the
         structure: {CILogonID: { "dn": dn, "data": data }, ...} """
-    server = ldap3.Server(ldap_url, connect_timeout=CILOGON_LDAP_TIMEOUT)
-    conn = ldap3.Connection(server, ldap_user, ldap_pass, receive_timeout=CILOGON_LDAP_TIMEOUT)
+    server = _get_server(ldap_url, CILOGON_LDAP_TIMEOUT)
+    conn = ldap3.Connection(server, ldap_user, ldap_pass, receive_timeout=CILOGON_LDAP_TIMEOUT,
+                            client_strategy=client_strategy or ldap3.SYNC)
     if not conn.bind():
         return None  # connection failure
     conn.search(_cilogon_basedn,
@@ -151,7 +160,8 @@ def merge_yaml_data(yaml_data_main, yaml_data_secondary):
     return yd
 
 
-def get_ligo_ldap_dn_list(ldap_url: str, ldap_user: str, ldap_pass: str) -> List[str]:
+def get_ligo_ldap_dn_list(ldap_url: Union[str, ldap3.Server], ldap_user: str, ldap_pass: str,
+                          client_strategy: Optional[str] = None) -> List[str]:
     """
     Query the LIGO LDAP server for all grid DNs in the IGWN collab.
 
@@ -164,9 +174,9 @@ def get_ligo_ldap_dn_list(ldap_url: str, ldap_user: str, ldap_pass: str) -> List
                'robot': base_query.format(community="robot:OSGRobotCert")}
 
     try:
-        server = ldap3.Server(ldap_url, connect_timeout=LIGO_LDAP_TIMEOUT)
+        server = _get_server(ldap_url, LIGO_LDAP_TIMEOUT)
         conn = ldap3.Connection(server, user=ldap_user, password=ldap_pass, raise_exceptions=True,
-                                receive_timeout=LIGO_LDAP_TIMEOUT)
+                                receive_timeout=LIGO_LDAP_TIMEOUT, client_strategy=client_strategy or ldap3.SYNC)
         conn.bind()
     except ldap3.core.exceptions.LDAPException:
         log.exception("Failed to connect to the LIGO LDAP")
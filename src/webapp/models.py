@@ -1,20 +1,32 @@
+import concurrent.futures
 import contextlib
 import datetime
+import fcntl
 import logging
 import os
+import pickle
+import random
+import threading
 import time
-from typing import Dict, Set, List, Optional
+from typing import Callable, Dict, Hashable, Set, List, Optional, Tuple, TypeVar
 
 import yaml
 try:
-    from prometheus_client import Summary
+    from prometheus_client import Counter, Summary
 except ImportError:
     class Summary:
         """A dummy prometheus_client.Summary class"""
 
-        def __init__(self, name: str, documentation: str):
+        def __init__(self, name: str, documentation: str, labelnames=()):
             _ = name
             _ = documentation
+            _ = labelnames
+
+        def labels(self, *args, **kwargs):
+            return self
+
+        def observe(self, amount):
+            pass
 
         @contextlib.contextmanager
         def time(self):
@@ -22,10 +34,25 @@ except ImportError:
             yield
             pass
 
+    class Counter:
+        """A dummy prometheus_client.Counter class"""
+
+        def __init__(self, name: str, documentation: str, labelnames=()):
+            _ = name
+            _ = documentation
+            _ = labelnames
+
+        def labels(self, *args, **kwargs):
+            return self
+
+        def inc(self, amount=1):
+            pass
+
 
 from webapp import common, contacts_reader, ldap_data, mappings, project_reader, rg_reader, vo_reader
 from webapp.common import readfile
 from webapp.contacts_reader import ContactsData
+from webapp.data_federation import AuthMethod, parse_authz
 from webapp.topology import Topology, Downtime
 from webapp.vos_data import VOsData
 
@@ -37,6 +64,13 @@ topology_git_update_summary = Summary('topology_git_update_seconds', 'Time spent
 contact_update_summary = Summary('contact_update_seconds', 'Time spent updating the contact repo data')
 comanage_update_summary = Summary('comanage_update_seconds', 'Time spent updating the comanage LDAP data')
 ligo_update_summary = Summary('ligo_update_seconds', 'Time spent updating the LIGO LDAP data')
+dataset_refresh_summary = Summary('dataset_refresh_seconds', 'Time spent loading each dataset in a background'
+                                  ' refresh of all the data', ['dataset'])
+refresh_coalesced_counter = Counter('data_refresh_coalesced', 'Refreshes not done because another thread'
+                                    ' or process was already refreshing the data, by whether the stale data was served'
+                                    ' or the thread waited for the refresh', ['dataset', 'outcome'])
+
+T = TypeVar("T")
 
 
 class CachedData:
@@ -48,6 +82,7 @@ class CachedData:
         self.cache_lifetime = cache_lifetime
         self.retry_delay = retry_delay
         self.next_update = self.timestamp + self.cache_lifetime
+        self.generation = 0
 
     def should_update(self):
         """Return True if we should update, either because we're past the next update time
@@ -60,11 +95,230 @@ class CachedData:
         self.next_update = time.monotonic() + self.retry_delay
 
     def update(self, data):
-        """Cache new data and set the next update time to now + the cache lifetime."""
+        """Cache new data and set the next update time to now + the cache lifetime.
+        Bumps the generation so anything derived from the old data can tell it is stale.
+        """
         self.data = data
         self.timestamp = time.monotonic()
         self.next_update = self.timestamp + self.cache_lifetime
         self.force_update = False
+        self.generation += 1
+
+    def keep(self):
+        """Keep the cached data, which was found to be up to date: set the next update time to
+        now + the cache lifetime without bumping the generation.
+        """
+        self.timestamp = time.monotonic()
+        self.next_update = self.timestamp + self.cache_lifetime
+        self.force_update = False
+
+
+class ArtifactCache:
+    """Memoizes artifacts (authfiles, config files, etc.) derived from one or more CachedData objects.
+
+    Each lookup passes a generation stamp -- a tuple of the generations of the CachedData the
+    artifact is computed from.  Entries are keyed on the stamp, and the whole cache is dropped
+    as soon as a lookup comes in with a new one, i.e. right after the underlying data is updated.
+
+    If `max_entries` is set, artifacts computed after that many are stored are returned but not
+    kept, so keys derived from client input can't grow the cache without bound.
+    """
+    def __init__(self, max_entries: Optional[int] = None):
+        self.generation = None
+        self.artifacts = {}  # type: Dict[Tuple, object]
+        self.max_entries = max_entries
+
+    def get(self, generation: Tuple, key: Hashable, compute: Callable[[], T]) -> T:
+        """Return the artifact for `key` at `generation`, calling `compute()` to create it if needed.
+        Exceptions raised by `compute()` are not cached.
+        """
+        if generation != self.generation:
+            # Swap in a new dict instead of clearing the old one: a thread still computing
+            # against the old generation will then write into the discarded dict.
+            self.artifacts = {}
+            self.generation = generation
+        artifacts = self.artifacts
+        full_key = (generation, key)
+        try:
+            return artifacts[full_key]
+        except KeyError:
+            pass
+        value = compute()
+        if self.max_entries is None or len(artifacts) < self.max_entries:
+            artifacts[full_key] = value
+        return value
+
+    def can_keep(self, generation: Tuple, key: Hashable) -> bool:
+        """Return True if the artifact for `key` at `generation` is cached, or would be kept if computed now"""
+        if self.max_entries is None:
+            return True
+        if generation != self.generation:
+            return self.max_entries > 0
+        return (generation, key) in self.artifacts or len(self.artifacts) < self.max_entries
+
+
+class BackgroundRefresher:
+    """Runs refresh jobs periodically in a daemon thread, so the data they load is never
+    refreshed inline by a web request; requests just read whatever the jobs last loaded.
+
+    A job is a callable returning True on success.  After a success it runs again about
+    `interval` seconds later (+/- 10%, to avoid thundering herds); after a failure it is retried
+    with exponential backoff, starting at `retry_delay` seconds and capped at `interval`.
+    """
+    class Job:
+        def __init__(self, name: str, refresh: Callable[[], bool], interval: float, retry_delay: float):
+            self.name = name
+            self.refresh = refresh
+            self.interval = interval
+            self.retry_delay = retry_delay
+            self.next_run = 0.0
+            self.failures = 0  # consecutive failures
+            self.last_success = None  # type: Optional[float]
+            self.last_duration = None  # type: Optional[float]
+
+    def __init__(self):
+        self.jobs = {}  # type: Dict[str, BackgroundRefresher.Job]
+        self._wakeup = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def add(self, name: str, refresh: Callable[[], bool], interval: float, retry_delay: float = 60) -> None:
+        """Add a job; it first runs as soon as the refresher is started (or is running)"""
+        self.jobs[name] = self.Job(name, refresh, interval, min(retry_delay, interval))
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="BackgroundRefresher", daemon=True)
+            self._thread.start()
+
+    def run_pending(self) -> float:
+        """Run the jobs that are due; return the number of seconds until the next one is"""
+        for job in list(self.jobs.values()):
+            if time.monotonic() >= job.next_run:
+                self._run_job(job)
+        if not self.jobs:
+            return 60.0
+        return max(min(job.next_run for job in self.jobs.values()) - time.monotonic(), 0.0)
+
+    def _run_job(self, job: "BackgroundRefresher.Job") -> None:
+        start = time.monotonic()
+        try:
+            ok = job.refresh()
+        except Exception as err:
+            log.exception("Background refresh of %s failed (%s)", job.name, err)
+            ok = False
+        now = time.monotonic()
+        job.last_duration = now - start
+        if ok:
+            job.failures = 0
+            job.last_success = now
+            job.next_run = now + job.interval * random.uniform(0.9, 1.1)
+        else:
+            job.failures += 1
+            delay = min(job.retry_delay * 2 ** (job.failures - 1), job.interval)
+            log.warning("Background refresh of %s failed %d time(s) in a row; retrying in %ds",
+                        job.name, job.failures, delay)
+            job.next_run = now + delay
+
+    def _run(self) -> None:
+        while True:
+            delay = self.run_pending()
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+
+class SharedSnapshot:
+    """A dataset loaded by one of the webapp's processes and handed to the others through a
+    snapshot file, so the git pulls and parsing happen once rather than once per process.
+    Each process still unpickles its own copy of the data; no memory is shared.
+
+    The process that updates the dataset publishes it by pickling it into a temp file and renaming
+    that over the snapshot file; the other processes then load the snapshot instead of updating
+    the dataset themselves.  Updates are done holding an exclusive lock on a side file; while
+    one process updates, the others go on with the data they have (see lock()), and load its
+    result on their next refresh.
+
+    The file holds a version string (unique per publish) followed by the pickled data.  A process
+    that confirms its data is still current "touches" the snapshot instead of republishing it;
+    the other processes then just keep the data they have.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.version = None  # type: Optional[str]
+        self.synced_mtime_ns = 0  # mtime of the snapshot when we last loaded, published, or touched it
+
+    @contextlib.contextmanager
+    def lock(self, blocking=True):
+        """Hold the update lock; yield True, or False if `blocking` is False and another process
+        holds it.  Loading the snapshot (sync()) without the lock is safe, since it's only ever
+        replaced by a rename.
+        """
+        os.makedirs(os.path.dirname(self.lock_path), mode=0o700, exist_ok=True)
+        with open(self.lock_path, "a") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def sync(self, cached: CachedData) -> bool:
+        """If another process has updated the data since we last synced with the snapshot
+        (and not longer than the cache lifetime ago), load its data into `cached` and return True.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if st.st_mtime_ns <= self.synced_mtime_ns or time.time() - st.st_mtime > cached.cache_lifetime:
+            return False
+        try:
+            with open(self.path, "rb") as fh:
+                version = pickle.load(fh)
+                if version == self.version:
+                    cached.keep()
+                else:
+                    cached.update(pickle.load(fh))
+                    self.version = version
+        except Exception as err:
+            log.warning("Failed to load snapshot %s (%s)", self.path, err)
+            return False
+        self.synced_mtime_ns = st.st_mtime_ns
+        return True
+
+    def publish(self, data) -> None:
+        version = "%d-%d" % (os.getpid(), time.time_ns())
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as fh:
+                pickle.dump(version, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self.synced_mtime_ns = os.stat(self.path).st_mtime_ns
+        except Exception as err:
+            log.warning("Failed to publish snapshot %s (%s)", self.path, err)
+            return
+        self.version = version
+
+    def touch(self, data) -> None:
+        """Mark the snapshot as current, republishing `data` if the snapshot doesn't hold it."""
+        try:
+            with open(self.path, "rb") as fh:
+                current = pickle.load(fh) == self.version
+        except Exception:
+            current = False
+        if not current:
+            self.publish(data)
+            return
+        try:
+            os.utime(self.path)
+            self.synced_mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError as err:
+            log.warning("Failed to touch snapshot %s (%s)", self.path, err)
 
 
 class GlobalData:
@@ -86,12 +340,27 @@ class GlobalData:
         self.comanage_data = CachedData(cache_lifetime=contact_cache_lifetime)
         self.merged_contacts_data = CachedData(cache_lifetime=contact_cache_lifetime)
         self.ligo_dn_list = CachedData(cache_lifetime=contact_cache_lifetime)
+        self.cilogon_ssh_keys = CachedData(cache_lifetime=contact_cache_lifetime)
+        self.merged_contacts_comanage_generation = None  # type: Optional[int]
+        # The LIGO DN list that ligo_authz_list was parsed from
+        self.ligo_authz_source = None  # type: Optional[List[str]]
+        self.ligo_authz_list = ()  # type: Tuple[AuthMethod, ...]
         self.dn_set = CachedData(cache_lifetime=topology_cache_lifetime)
         self.projects = CachedData(cache_lifetime=topology_cache_lifetime)
         self.topology = CachedData(cache_lifetime=topology_cache_lifetime)
         self.vos_data = CachedData(cache_lifetime=topology_cache_lifetime)
         self.mappings = CachedData(cache_lifetime=topology_cache_lifetime)
         self.topology_repo_stamp = CachedData(cache_lifetime=topology_cache_lifetime)
+        self.topology_yaml_cache = common.ParsedYamlCache()
+        self.topology_head = None  # type: Optional[str]
+        # The shas the git repos were last updated to (None with NO_GIT: local edits aren't committed)
+        self.topology_repo_head = None  # type: Optional[str]
+        self.contacts_repo_head = None  # type: Optional[str]
+        # The contact repo sha and the contact db data last loaded from it
+        self.contact_db_load = (None, None)  # type: Tuple[Optional[str], Optional[ContactsData]]
+        self.topology_contacts_generation = None  # type: Optional[int]
+        self.stashcache_artifacts = ArtifactCache()
+        self.response_artifacts = ArtifactCache(max_entries=config.get("RESPONSE_CACHE_MAX_ENTRIES", 1000))
         self.topology_data_dir = config["TOPOLOGY_DATA_DIR"]
         self.topology_data_repo = config.get("TOPOLOGY_DATA_REPO", "")
         self.topology_data_branch = config.get("TOPOLOGY_DATA_BRANCH", "")
@@ -108,6 +377,20 @@ class GlobalData:
         self.ligo_ldap_passfile = config.get("LIGO_LDAP_PASSFILE")
         self.ligo_ldap_url = config.get("LIGO_LDAP_URL")
         self.ligo_ldap_user = config.get("LIGO_LDAP_USER")
+        # ldap3 client strategy for the LDAP queries (None for the default); e.g. MOCK_SYNC for testing
+        self.ldap_client_strategy = config.get("LDAP_CLIENT_STRATEGY")
+        # If set, the LDAP data and the datasets loaded from the repos are refreshed by this;
+        # the getters only load them if they haven't been loaded yet
+        self.background_refresher = None  # type: Optional[BackgroundRefresher]
+        # Seconds each step of the last refresh_datasets() took
+        self.refresh_timings = {}  # type: Dict[str, float]
+        # Seconds refresh_datasets() waits for each of its sources, and the last fetch of each
+        self.fetch_timeouts = dict(self.FETCH_TIMEOUTS, **config.get("FETCH_TIMEOUTS", {}))
+        self.pending_fetches = {}  # type: Dict[str, concurrent.futures.Future]
+        # The datasets last published by refresh_datasets() (see DATASETS), and the topology repo sha
+        # they were loaded from
+        self.datasets = CachedData(cache_lifetime=topology_cache_lifetime)
+        self.datasets_topology_head = None  # type: Optional[str]
         self.github_oauth_client_secret = config.get("GITHUB_OAUTH_CLIENT_SECRET")
         self.auto_pr_gh_api_user = config.get("AUTO_PR_GH_API_USER")
         self.auto_pr_gh_api_token = config.get("AUTO_PR_GH_API_TOKEN")
@@ -122,6 +405,18 @@ class GlobalData:
         self.mappings_dir = os.path.join(self.topology_data_dir, "mappings")
         self.config = config
         self.strict = strict
+        # Only trust git to tell us what changed if we're the ones keeping the checkout in sync;
+        # a checkout used with NO_GIT may have local edits.
+        self.topology_incremental_reload = config.get("TOPOLOGY_INCREMENTAL_RELOAD", not config["NO_GIT"])
+        self.yaml_parse_workers = config.get("YAML_PARSE_WORKERS", 0)
+        self.yaml_cache_max_age = config.get("YAML_CACHE_MAX_AGE", 60 * 60 * 24 * 7)
+        self.refresh_locks = {name: threading.Lock() for name in ["topology", "vos_data", "projects"]}
+        self.topology_repo_lock = threading.Lock()
+        self.contacts_repo_lock = threading.Lock()
+        self.snapshots = {}  # type: Dict[str, SharedSnapshot]
+        if config.get("SNAPSHOT_DIR"):
+            for name in ["topology", "vos_data", "projects", "datasets"]:
+                self.snapshots[name] = SharedSnapshot(os.path.join(config["SNAPSHOT_DIR"], name + ".pickle"))
 
     def update_webhook_repo(self):
         if not self.config["NO_GIT"]:
@@ -142,10 +437,11 @@ class GlobalData:
         if not self.config["NO_GIT"]:
             parent = os.path.dirname(self.topology_data_dir)
             os.makedirs(parent, mode=0o755, exist_ok=True)
-            ok = common.git_clone_or_pull(self.topology_data_repo, self.topology_data_dir,
-                                          self.topology_data_branch)
-            if ok:
+            head = common.git_clone_or_pull(self.topology_data_repo, self.topology_data_dir,
+                                            self.topology_data_branch)
+            if head:
                 log.debug("topology repo update ok")
+                self.topology_repo_head = head
             else:
                 log.error("topology repo update failed")
                 return False
@@ -155,29 +451,32 @@ class GlobalData:
                 return False
         return True
 
-    def maybe_update_topology_repo(self) -> bool:
+    def maybe_update_topology_repo(self, force=False) -> bool:
         """Update the local git clone of the topology github repo if it hasn't
-        been updated recently (based on the cache time for self.topology_repo_stamp).
+        been updated recently (based on the cache time for self.topology_repo_stamp),
+        or if `force` is set.
         """
-        if self.topology_repo_stamp.should_update():
-            with topology_git_update_summary.time():
-                ok = self._update_topology_repo()
-            if ok:
-                self.topology_repo_stamp.update(time.monotonic())
-                return True
-            else:
-                self.topology_repo_stamp.try_again()
-                return False
-        return bool(self.topology_repo_stamp.data)
+        with self.topology_repo_lock:
+            if force or self.topology_repo_stamp.should_update():
+                with topology_git_update_summary.time():
+                    ok = self._update_topology_repo()
+                if ok:
+                    self.topology_repo_stamp.update(time.monotonic())
+                    return True
+                else:
+                    self.topology_repo_stamp.try_again()
+                    return False
+            return bool(self.topology_repo_stamp.data)
 
     def _update_contacts_repo(self):
         if not self.config["NO_GIT"]:
             parent = os.path.dirname(self.config["CONTACT_DATA_DIR"])
             os.makedirs(parent, mode=0o700, exist_ok=True)
-            ok = common.git_clone_or_pull(self.config["CONTACT_DATA_REPO"], self.config["CONTACT_DATA_DIR"],
-                                   self.config["CONTACT_DATA_BRANCH"], self.config["GIT_SSH_KEY"])
-            if ok:
+            head = common.git_clone_or_pull(self.config["CONTACT_DATA_REPO"], self.config["CONTACT_DATA_DIR"],
+                                            self.config["CONTACT_DATA_BRANCH"], self.config["GIT_SSH_KEY"])
+            if head:
                 log.debug("contact repo update ok")
+                self.contacts_repo_head = head
             else:
                 log.error("contact repo update failed")
                 return False
@@ -197,64 +496,124 @@ class GlobalData:
             log.debug("CONTACT_DATA_DIR not specified; getting empty contacts")
             data = contacts_reader.get_contacts_data(None)
             self.contacts_data.update(data)
-        elif self.contacts_data.should_update():
+        elif self._should_refresh(self.contacts_data):
             with contact_update_summary.time():
-                ok = self._update_contacts_repo()
-                if ok:
-                    try:
-                        self.contacts_data.update(contacts_reader.get_contacts_data(self.contacts_file))
-                    except Exception as err:
-                        if self.strict:
-                            raise
-                        log.exception("Failed to update contacts data (%s)", err)
+                try:
+                    data = self._load_contact_db_data()
+                    if data is not None and data is self.contacts_data.data:
+                        self.contacts_data.keep()
+                    elif data is not None:
+                        self.contacts_data.update(data)
+                    else:
                         self.contacts_data.try_again()
-                else:
+                except Exception as err:
+                    if self.strict:
+                        raise
+                    log.exception("Failed to update contacts data (%s)", err)
                     self.contacts_data.try_again()
 
         return self.contacts_data.data
 
+    def _load_contact_db_data(self) -> Optional[ContactsData]:
+        """Update the contact repo and load the contact db data from it; return None if the update fails.
+        If the repo is still at the commit last loaded, return the data loaded then.
+        """
+        if not self.config.get("CONTACT_DATA_DIR", None):
+            return contacts_reader.get_contacts_data(None)
+        with self.contacts_repo_lock:
+            if not self._update_contacts_repo():
+                return None
+            head = self.contacts_repo_head
+            loaded_head, loaded_data = self.contact_db_load
+            if head and head == loaded_head:
+                log.debug("Contact db data unchanged at %s", head)
+                return loaded_data
+            data = contacts_reader.get_contacts_data(self.contacts_file)
+            self.contact_db_load = (head, data)
+            return data
+
+    def _has_cilogon_ldap(self) -> bool:
+        return bool(self.cilogon_ldap_url and self.cilogon_ldap_user and self.cilogon_ldap_passfile)
+
+    def _has_ligo_ldap(self) -> bool:
+        return bool(self.ligo_ldap_url and self.ligo_ldap_user and self.ligo_ldap_passfile)
+
     def get_comanage_data(self) -> Optional[ContactsData]:
         """
         Get the contact information from comanage / cilogon ldap
         May return None if we fail to get the data for the first time.
         """
-        if not (self.cilogon_ldap_url and self.cilogon_ldap_user and
-                self.cilogon_ldap_passfile):
+        if not self._has_cilogon_ldap():
             log.debug("CILOGON_LDAP_{URL|USER|PASSFILE} not specified; "
                       "getting empty contacts")
-            data = contacts_reader.get_contacts_data(None)
-            self.comanage_data.update(data)
-        elif self.comanage_data.should_update():
-            with comanage_update_summary.time():
-                try:
-                    idmap = self.get_cilogon_ldap_id_map()
-                    data = ldap_data.cilogon_id_map_to_yaml_data(idmap)
-                    self.comanage_data.update(ContactsData(data))
-                except Exception as err:
-                    if self.strict:
-                        raise
-                    log.exception("Failed to update comanage data (%s)", err)
-                    self.comanage_data.try_again()
+            if self.comanage_data.data is None:
+                self.comanage_data.update(contacts_reader.get_contacts_data(None))
+        elif self.background_refresher is None and self.comanage_data.should_update():
+            self.refresh_comanage_data()
 
         return self.comanage_data.data
 
+    def get_cilogon_ssh_keys_map(self) -> Optional[Dict[str, List[str]]]:
+        """
+        Get the SSH public keys of each CILogonID from cilogon ldap; it comes from the same query
+        as the comanage data.
+        May return None if we fail to get the data for the first time.
+        """
+        if (self._has_cilogon_ldap() and self.background_refresher is None
+                and self.cilogon_ssh_keys.should_update()):
+            self.refresh_comanage_data()
+
+        return self.cilogon_ssh_keys.data
+
+    def refresh_comanage_data(self) -> bool:
+        """
+        Query cilogon ldap and update the comanage data and the SSH keys map from the result,
+        keeping the old data if that fails.  Return True on success.
+        """
+        with comanage_update_summary.time():
+            try:
+                idmap = self.get_cilogon_ldap_id_map()
+                if idmap is None:
+                    raise ConnectionError("could not bind to %s" % self.cilogon_ldap_url)
+                data = ldap_data.cilogon_id_map_to_yaml_data(idmap)
+                ssh_keys = ldap_data.cilogon_id_map_to_ssh_keys(idmap)
+                # Only bump the generations if something changed, so the data derived from them is kept
+                if self.comanage_data.data is not None and data == self.comanage_data.data.yaml_data:
+                    self.comanage_data.keep()
+                else:
+                    self.comanage_data.update(ContactsData(data))
+                if ssh_keys == self.cilogon_ssh_keys.data:
+                    self.cilogon_ssh_keys.keep()
+                else:
+                    self.cilogon_ssh_keys.update(ssh_keys)
+                return True
+            except Exception as err:
+                if self.strict:
+                    raise
+                log.exception("Failed to update comanage data (%s)", err)
+                self.comanage_data.try_again()
+                self.cilogon_ssh_keys.try_again()
+                return False
+
     def get_cilogon_ldap_id_map(self):
         url = self.cilogon_ldap_url
         user = self.cilogon_ldap_user
         ldappass = readfile(self.cilogon_ldap_passfile, log)
-        return ldap_data.get_cilogon_ldap_id_map(url, user, ldappass)
+        return ldap_data.get_cilogon_ldap_id_map(url, user, ldappass, client_strategy=self.ldap_client_strategy)
 
     def get_contacts_data(self) -> Optional[ContactsData]:
         """
         Get the contact information from a private git repo
         May return None if we fail to get the data for the first time.
         """
-        if self.merged_contacts_data.should_update():
+        comanage_data = self.get_comanage_data()
+        if self.background_refresher is not None and self.merged_contacts_data.data is not None:
+            pass  # refresh_datasets() merges the latest comanage data
+        elif (self.merged_contacts_data.should_update()
+                or self.comanage_data.generation != self.merged_contacts_comanage_generation):
             try:
-                yd1 = self.get_comanage_data().yaml_data
-                yd2 = self.get_contact_db_data().yaml_data
-                yd_merged = ldap_data.merge_yaml_data(yd1, yd2)
-                self.merged_contacts_data.update(ContactsData(yd_merged))
+                self.merged_contacts_data.update(self._merge_contacts(comanage_data, self.get_contact_db_data()))
+                self.merged_contacts_comanage_generation = self.comanage_data.generation
             except Exception as err:
                 if self.strict:
                     raise
@@ -263,36 +622,95 @@ class GlobalData:
 
         return self.merged_contacts_data.data
 
+    @staticmethod
+    def _merge_contacts(comanage_data: Optional[ContactsData], contact_db_data: ContactsData) -> ContactsData:
+        if comanage_data is None:
+            # Not loaded yet; go with the contact db data until it is
+            comanage_data = contacts_reader.get_contacts_data(None)
+        yd_merged = ldap_data.merge_yaml_data(comanage_data.yaml_data, contact_db_data.yaml_data)
+        return ContactsData(yd_merged)
+
     def get_ligo_dn_list(self) -> Optional[List[str]]:
         """
         Get list of DNs of authorized LIGO users from their LDAP
         May return None if we fail to get the data for the first time.
         """
-        if not (self.ligo_ldap_url and self.ligo_ldap_user and
-                self.ligo_ldap_passfile):
+        if not self._has_ligo_ldap():
             log.debug("LIGO_LDAP_{URL|USER|PASSFILE} not specified; "
                       "getting empty list")
             return []
-        elif self.ligo_dn_list.should_update():
-            with ligo_update_summary.time():
-                try:
-                    ligo_ldap_pass = readfile(self.ligo_ldap_passfile, log)
-                    new_dn_list = ldap_data.get_ligo_ldap_dn_list(self.ligo_ldap_url, self.ligo_ldap_user, ligo_ldap_pass)
-                    self.ligo_dn_list.update(new_dn_list)
-                except Exception as err:
-                    if self.strict:
-                        raise
-                    log.exception("Failed to update LIGO data (%s)", err)
-                    self.ligo_dn_list.try_again()
+        elif self.background_refresher is None and self.ligo_dn_list.should_update():
+            self.refresh_ligo_dn_list()
 
         return self.ligo_dn_list.data
 
+    def refresh_ligo_dn_list(self) -> bool:
+        """
+        Query the LIGO LDAP and update the LIGO DN list, keeping the old list if that fails.
+        Return True on success.
+        """
+        with ligo_update_summary.time():
+            try:
+                ligo_ldap_pass = readfile(self.ligo_ldap_passfile, log)
+                new_dn_list = ldap_data.get_ligo_ldap_dn_list(self.ligo_ldap_url, self.ligo_ldap_user, ligo_ldap_pass,
+                                                              client_strategy=self.ldap_client_strategy)
+                if not new_dn_list:
+                    # get_ligo_ldap_dn_list() logs and returns nothing if it can't reach the server
+                    raise ConnectionError("no DNs from %s" % self.ligo_ldap_url)
+                self.ligo_dn_list.update(new_dn_list)
+                return True
+            except Exception as err:
+                if self.strict:
+                    raise
+                log.exception("Failed to update LIGO data (%s)", err)
+                self.ligo_dn_list.try_again()
+                return False
+
+    def start_background_refresh(self) -> None:
+        """
+        Refresh all the data in a background thread from now on: the LDAP-derived data (comanage
+        contacts, CILogon SSH keys, and LIGO DNs), each with its own backoff, and with
+        refresh_datasets(), everything loaded from the repos.  The getters then only return the
+        last data loaded.
+
+        The LDAP data isn't in the datasets snapshot, so every process queries it itself.
+        """
+        if self.background_refresher is not None:
+            return
+        refresher = BackgroundRefresher()
+        if self._has_cilogon_ldap():
+            refresher.add("comanage", self.refresh_comanage_data, self.comanage_data.cache_lifetime,
+                          self.comanage_data.retry_delay)
+        if self._has_ligo_ldap():
+            refresher.add("ligo_dn_list", self.refresh_ligo_dn_list, self.ligo_dn_list.cache_lifetime,
+                          self.ligo_dn_list.retry_delay)
+        refresher.add("datasets", self.refresh_datasets, self.topology.cache_lifetime, self.topology.retry_delay)
+        if self.config.get("YAML_CACHE_DIR"):
+            refresher.add("prune_yaml_cache", self.prune_yaml_cache, 60 * 60 * 24)
+        self.background_refresher = refresher
+        refresher.start()
+
+    def get_ligo_authz_list(self) -> Tuple[AuthMethod, ...]:
+        """
+        Get the DNs of authorized LIGO users as authz objects.  They are parsed once per
+        refresh of the LIGO DN list; don't modify the result.
+        Raises an error if the LIGO DN list has never been loaded, rather than leaving the DNs out.
+        """
+        dn_list = self.get_ligo_dn_list()
+        if dn_list is None:
+            log.error("The LIGO DN list from %s has not been loaded", self.ligo_ldap_url)
+            raise ConnectionError("LIGO DN list unavailable")
+        if dn_list is not self.ligo_authz_source:
+            self.ligo_authz_list = tuple(parse_authz(f"DN:{dn}")[0] for dn in dn_list)
+            self.ligo_authz_source = dn_list
+        return self.ligo_authz_list
+
     def get_dns(self) -> Optional[Set]:
         """
         Get the set of DNs allowed to access "special" data (such as contact info)
         May return None if we fail to get the data for the first time.
         """
-        if self.dn_set.should_update():
+        if self._should_refresh(self.dn_set):
             contacts_data = self.get_contacts_data()
             try:
                 self.dn_set.update(set(contacts_data.get_dns()))
@@ -308,21 +726,271 @@ class GlobalData:
         Get Topology data.
         May return None if we fail to get the data for the first time.
         """
-        if self.topology.should_update():
-            with topology_update_summary.time():
-                self.update_topology()
+        if self._should_refresh(self.topology):
+            self._refresh("topology", self.topology, self._update_topology)
 
         return self.topology.data
 
+    def _update_shared(self, name: str, cached: CachedData, update: Callable[[], None]) -> None:
+        """Update `cached` by calling `update()`, unless snapshots are enabled and another process
+        has already updated it, in which case load its snapshot instead.  Publish the result if
+        we did the update.  If another process is updating it right now, keep the stale data
+        (as _refresh() does for other threads) unless there is none yet.
+        """
+        snapshot = self.snapshots.get(name)
+        if not snapshot:
+            update()
+            return
+        with snapshot.lock(blocking=cached.data is None) as locked:
+            if not locked:
+                log.debug("Another process is updating %s; keeping the stale data", name)
+                refresh_coalesced_counter.labels(dataset=name, outcome="stale").inc()
+                return
+            if snapshot.sync(cached):
+                log.debug("Loaded %s from snapshot", name)
+                return
+            generation, timestamp = cached.generation, cached.timestamp
+            update()
+            if cached.generation != generation:
+                snapshot.publish(cached.data)
+            elif cached.timestamp != timestamp:
+                snapshot.touch(cached.data)
+
+    def _refresh(self, name: str, cached: CachedData, update: Callable[[], None], force=False) -> None:
+        """Refresh `cached` (see _update_shared()) if it's due for an update or `force` is True,
+        letting only one thread at a time do it.  While one thread refreshes, the others go on
+        serving the stale data; if there is no data yet, they wait for the refresh instead.
+        """
+        lock = self.refresh_locks[name]
+        if not lock.acquire(blocking=False):
+            if cached.data is not None:
+                refresh_coalesced_counter.labels(dataset=name, outcome="stale").inc()
+                return
+            refresh_coalesced_counter.labels(dataset=name, outcome="wait").inc()
+            lock.acquire()
+        try:
+            if force or cached.should_update():
+                with topology_update_summary.time():
+                    self._update_shared(name, cached, update)
+        finally:
+            lock.release()
+
+    def _should_refresh(self, cached: CachedData) -> bool:
+        """Return True if a getter should refresh `cached` itself: it's due for an update, and either
+        there's no background refresher or the refresher hasn't loaded it yet.
+        """
+        return cached.should_update() and (self.background_refresher is None or cached.data is None)
+
     def update_topology(self) -> None:
         """
-        Update topology facility/site/ResourceGroup data
+        Update topology facility/site/ResourceGroup data, unless another thread is already doing it
+        """
+        self._refresh("topology", self.topology, self._update_topology, force=True)
+
+    def prune_yaml_cache(self) -> bool:
+        """Remove the YAML_CACHE_DIR entries not used in YAML_CACHE_MAX_AGE seconds"""
+        removed = common.prune_yaml_cache(self.yaml_cache_max_age)
+        log.info("Removed %d unused entries from the yaml cache", removed)
+        return True
+
+    # The datasets refresh_datasets() loads, in the order it loads them
+    DATASETS = ["contacts_data", "merged_contacts_data", "topology", "vos_data", "projects", "mappings", "dn_set"]
+    # Default seconds refresh_datasets() waits for each of its sources (see _fetch_sources())
+    FETCH_TIMEOUTS = {"topology_repo": 300, "contacts_data": 300}
+
+    def refresh_datasets(self) -> bool:
+        """
+        Fetch the sources (see _fetch_sources()), then reload every dataset that depends on them, in
+        dependency order: contacts, then topology and VOs, then projects, mappings, and DNs; then
+        build the indexes derived from them.  Only once all of them are loaded are they published, back to
+        back, so requests don't see e.g. a new topology with the old VOs.  If any of them fails to
+        load, all the old data is kept.  Return True on success.
+
+        The time each step took is kept in `refresh_timings`.  With snapshots, one process does the
+        loading and the others load its snapshot of the complete set; a process that finds another
+        one loading keeps its data, and loads the snapshot on its next refresh.
+        """
+        # Keep the getters from loading these themselves meanwhile; in the order _update_projects()
+        # takes them, so we can't deadlock with it
+        locks = [self.refresh_locks[name] for name in ["projects", "vos_data", "topology"]]
+        for lock in locks:
+            lock.acquire()
+        try:
+            snapshot = self.snapshots.get("datasets")
+            if not snapshot:
+                return self._refresh_datasets()
+            with snapshot.lock(blocking=self.datasets.data is None) as locked:
+                if not locked:
+                    log.debug("Another process is refreshing the datasets; keeping the stale data")
+                    refresh_coalesced_counter.labels(dataset="datasets", outcome="stale").inc()
+                    return True
+                generation = self.datasets.generation
+                if snapshot.sync(self.datasets):
+                    if self.datasets.generation != generation:
+                        log.debug("Loaded datasets from snapshot")
+                        # We don't know what commit the other process loaded, and our topology
+                        # YAML cache didn't see what it parsed
+                        self.datasets_topology_head = None
+                        self._publish_datasets(self.datasets.data, topology_head=None)
+                        # The authz index isn't pickled
+                        self.vos_data.data.get_authz_index(self.topology.data)
+                    return True
+                ok = self._refresh_datasets()
+                if ok and self.datasets.generation == generation:
+                    snapshot.touch(self.datasets.data)
+                elif ok:
+                    snapshot.publish(self.datasets.data)
+                return ok
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _refresh_datasets(self) -> bool:
+        timings = {}  # type: Dict[str, float]
+        start = time.monotonic()
+
+        def timed(step: str, load: Callable[[], T]) -> T:
+            start = time.monotonic()
+            value = load()
+            timings[step] = time.monotonic() - start
+            dataset_refresh_summary.labels(dataset=step).observe(timings[step])
+            return value
+
+        try:
+            fetched = self._fetch_sources(timings)
+            if not fetched["topology_repo"]:
+                raise RuntimeError("topology repo update failed or timed out")
+            contacts_db = fetched["contacts_data"]
+            if contacts_db is None:
+                raise RuntimeError("contact repo update failed or timed out")
+            if self._sources_unchanged(contacts_db):
+                log.info("Sources unchanged since the last refresh (topology repo at %s); keeping the datasets",
+                         self.topology_repo_head)
+                self.datasets.keep()
+                for name in self.DATASETS:
+                    getattr(self, name).keep()
+                self.refresh_timings = timings
+                return True
+            # The comanage data is whatever its background job (or the getter) last loaded
+            contacts = timed("merged_contacts_data", lambda: self._merge_contacts(self.get_comanage_data(), contacts_db))
+            old_contacts = self.merged_contacts_data.data
+            contacts_changed = old_contacts is None or contacts.yaml_data != old_contacts.yaml_data
+            if not contacts_changed:
+                contacts = old_contacts  # so the topology can tell nothing changed
+
+            topology, topology_head = timed("topology", lambda: self._load_topology(contacts, contacts_changed))
+            topology = topology or self.topology.data
+            vos_data = timed("vos_data", lambda: vo_reader.get_vos_data(self.vos_dir, contacts, strict=self.strict,
+                                                                         workers=self.yaml_parse_workers))
+            projects = timed("projects", lambda: self._load_projects(vos_data))
+            mappings_ = timed("mappings", lambda: mappings.get_mappings(indir=self.mappings_dir, strict=self.strict))
+            dn_set = timed("dn_set", lambda: set(contacts.get_dns()))
+            timed("indexes", lambda: (topology.get_filter_index(), vos_data.get_authz_index(topology)))
+        except Exception as err:
+            if self.strict:
+                raise
+            log.exception("Failed to refresh the datasets; keeping the old data (%s)", err)
+            self.refresh_timings = timings
+            return False
+
+        datasets = {"contacts_data": contacts_db, "merged_contacts_data": contacts, "topology": topology,
+                    "vos_data": vos_data, "projects": projects, "mappings": mappings_, "dn_set": dn_set}
+        self.datasets.update(datasets)
+        self.datasets_topology_head = self.topology_repo_head
+        self._publish_datasets(datasets, topology_head)
+        self.refresh_timings = timings
+        log.info("Refreshed the datasets in %.1fs (%s)", time.monotonic() - start,
+                 ", ".join("%s %.2fs" % item for item in timings.items()))
+        return True
+
+    def _sources_unchanged(self, contacts_db: ContactsData) -> bool:
+        """Return True if the datasets were loaded from the same topology repo commit, contact db
+        data, and comanage data as were just fetched, so there's nothing to reload.  Never true
+        with NO_GIT, since local changes to the topology repo can't be seen.
         """
+        return bool(self.datasets.data is not None
+                    and self.topology_repo_head and self.topology_repo_head == self.datasets_topology_head
+                    and (contacts_db is self.contacts_data.data
+                         or contacts_db.yaml_data == self.contacts_data.data.yaml_data)
+                    and self.comanage_data.generation == self.merged_contacts_comanage_generation)
+
+    def _fetch_sources(self, timings: Dict[str, float]) -> Dict[str, object]:
+        """
+        Update the git repos the datasets are loaded from -- the topology repo and the contact repo --
+        concurrently, each in its own thread.  (The LDAP data has its own background jobs.)  Wait for
+        each for up to its timeout in `fetch_timeouts`, so this takes as long as the slowest source
+        instead of all of them together.  Return the result of each source's fetch function
+        (None for one that failed or timed out), and put the time each took into `timings`.
+
+        A fetch that times out is left to finish in the background.  Until it does, the source isn't
+        fetched again (its result is None), so there's at most one thread per source; the repos are
+        also updated holding their locks, so nothing else updates them meanwhile.
+        """
+        sources = {"topology_repo": lambda: self.maybe_update_topology_repo(force=True),
+                   "contacts_data": self._load_contact_db_data}  # type: Dict[str, Callable[[], object]]
+
+        def timed_fetch(name: str, fetch: Callable[[], T]) -> T:
+            start = time.monotonic()
+            try:
+                return fetch()
+            finally:
+                timings[name] = time.monotonic() - start
+                dataset_refresh_summary.labels(dataset=name).observe(timings[name])
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="fetch")
+        try:
+            start = time.monotonic()
+            results = {}
+            futures = {}
+            for name, fetch in sources.items():
+                pending = self.pending_fetches.get(name)
+                if pending is not None and not pending.done():
+                    log.error("Fetching %s from a previous refresh is still running; skipping it", name)
+                    results[name] = None
+                    continue
+                futures[name] = self.pending_fetches[name] = executor.submit(timed_fetch, name, fetch)
+            for name, future in futures.items():
+                timeout = self.fetch_timeouts[name]
+                try:
+                    results[name] = future.result(timeout=max(start + timeout - time.monotonic(), 0))
+                except concurrent.futures.TimeoutError:
+                    log.error("Fetching %s timed out after %ss", name, timeout)
+                    results[name] = None
+                except Exception:
+                    log.exception("Fetching %s failed", name)
+                    results[name] = None
+        finally:
+            executor.shutdown(wait=False)
+        return results
+
+    def _publish_datasets(self, datasets: Dict[str, object], topology_head: Optional[str] = None) -> None:
+        """Swap in a complete set of datasets from refresh_datasets(), whose topology was loaded from
+        the topology repo at `topology_head` (None if unknown)
+        """
+        for name in self.DATASETS:
+            cached = getattr(self, name)  # type: CachedData
+            if datasets[name] is cached.data:
+                cached.keep()
+            else:
+                cached.update(datasets[name])
+        self.merged_contacts_comanage_generation = self.comanage_data.generation
+        self.topology_contacts_generation = self.merged_contacts_data.generation
+        self.topology_head = topology_head
+
+    def _update_topology(self) -> None:
         ok = self.maybe_update_topology_repo()
         if ok:
             try:
-                log.debug("Updating topology RG data")
-                self.topology.update(rg_reader.get_topology(self.topology_dir, self.get_contacts_data(), strict=self.strict))
+                contacts_data = self.get_contacts_data()
+                contacts_generation = self.merged_contacts_data.generation
+                topology, head = self._load_topology(contacts_data,
+                                                     contacts_generation != self.topology_contacts_generation)
+                if topology is None:
+                    self.topology.keep()
+                    return
+                self.topology.update(topology)
+                self.topology_head = head
+                self.topology_contacts_generation = contacts_generation
                 log.debug("Updated topology RG data successfully")
             except Exception as err:
                 if self.strict:
@@ -332,52 +1000,140 @@ class GlobalData:
         else:
             self.topology.try_again()
 
+    def _load_topology(self, contacts_data: ContactsData,
+                       contacts_changed: bool) -> Tuple[Optional[Topology], Optional[str]]:
+        """
+        Load the topology RG data from the repo, or return None if it is known to be unchanged since
+        the last load: with incremental reload, if neither the git HEAD nor the contacts changed.
+        Also return the git HEAD loaded (None without incremental reload), which the caller sets
+        `topology_head` to once the topology is published.
+        """
+        head = None
+        if self.topology_incremental_reload:
+            head = common.git_head(self.topology_data_dir)
+            if head and head == self.topology_head and not contacts_changed and self.topology.data:
+                log.debug("Topology RG data unchanged at %s", head)
+                return None, head
+            self._invalidate_topology_yaml_cache(head)
+            yaml_cache = self.topology_yaml_cache
+        else:
+            yaml_cache = None
+        log.debug("Updating topology RG data")
+        topology = rg_reader.get_topology(self.topology_dir, contacts_data, strict=self.strict,
+                                          yaml_cache=yaml_cache, workers=self.yaml_parse_workers)
+        return topology, head
+
+    def _invalidate_topology_yaml_cache(self, head: Optional[str]) -> None:
+        """Drop the parsed YAML of the files changed between the last loaded commit and `head`
+        from the topology YAML cache, or all of it if we can't tell what changed.
+        """
+        changed = None
+        if head and self.topology_head:
+            changed = common.git_changed_files(self.topology_data_dir, self.topology_head, head)
+        if changed is None:
+            self.topology_yaml_cache.clear()
+        else:
+            log.debug("%d file(s) changed since %s", len(changed), self.topology_head)
+            self.topology_yaml_cache.invalidate(os.path.join(self.topology_data_dir, path) for path in changed)
+
     def get_vos_data(self) -> Optional[VOsData]:
         """
         Get VO Data.
         May return None if we fail to get the data for the first time.
         """
-        if self.vos_data.should_update():
-            with topology_update_summary.time():
-                ok = self.maybe_update_topology_repo()
-                if ok:
-                    try:
-                        log.debug("Updating VOs")
-                        self.vos_data.update(vo_reader.get_vos_data(self.vos_dir, self.get_contacts_data(), strict=self.strict))
-                        log.debug("Updated VOs successfully")
-                    except Exception as err:
-                        if self.strict:
-                            raise
-                        log.exception("Failed to update VOs (%s)", err)
-                        self.vos_data.try_again()
-                else:
-                    self.vos_data.try_again()
+        if self._should_refresh(self.vos_data):
+            self._refresh("vos_data", self.vos_data, self._update_vos_data)
 
         return self.vos_data.data
 
+    def _update_vos_data(self) -> None:
+        ok = self.maybe_update_topology_repo()
+        if ok:
+            try:
+                log.debug("Updating VOs")
+                self.vos_data.update(vo_reader.get_vos_data(self.vos_dir, self.get_contacts_data(), strict=self.strict,
+                                                            workers=self.yaml_parse_workers))
+                log.debug("Updated VOs successfully")
+            except Exception as err:
+                if self.strict:
+                    raise
+                log.exception("Failed to update VOs (%s)", err)
+                self.vos_data.try_again()
+        else:
+            self.vos_data.try_again()
+
     def get_projects(self) -> Optional[Dict]:
         """
         Get Project data.
         May return None if we fail to get the data for the first time.
         """
-        if self.projects.should_update():
-            with topology_update_summary.time():
-                ok = self.maybe_update_topology_repo()
-                if ok:
-                    try:
-                        log.debug("Updating projects")
-                        self.projects.update(project_reader.get_projects(self.projects_dir, strict=self.strict))
-                        log.debug("Updated projects successfully")
-                    except Exception as err:
-                        if self.strict:
-                            raise
-                        log.exception("Failed to update projects (%s)", err)
-                        self.projects.try_again()
-                else:
-                    self.projects.try_again()
+        if self._should_refresh(self.projects):
+            self._refresh("projects", self.projects, self._update_projects)
 
         return self.projects.data
 
+    def _update_projects(self) -> None:
+        ok = self.maybe_update_topology_repo()
+        if ok:
+            try:
+                log.debug("Updating projects")
+                vos_data = self.get_vos_data()
+                self.projects.update(self._load_projects(vos_data))
+                log.debug("Updated projects successfully")
+            except Exception as err:
+                if self.strict:
+                    raise
+                log.exception("Failed to update projects (%s)", err)
+                self.projects.try_again()
+        else:
+            self.projects.try_again()
+
+    def _load_projects(self, vos_data: Optional[VOsData]) -> Dict:
+        # Use the VO IDs from the VO data we already have instead of having project_reader load it again
+        vo_ids = vos_data.get_vo_name_to_id() if vos_data else None
+        return project_reader.get_projects(self.projects_dir, strict=self.strict,
+                                           workers=self.yaml_parse_workers, vo_ids=vo_ids)
+
+    def get_stashcache_generation(self) -> Tuple[int, int, int]:
+        """
+        Return the generation stamp of the data StashCache/OSDF config files are generated from,
+        refreshing the topology and VO data first if they are due.
+
+        The LIGO DN list is not refreshed here since most files don't use it; it gets refreshed
+        when a file that needs it is regenerated, which happens at least once per topology update.
+        """
+        self.get_topology()
+        self.get_vos_data()
+        return self.topology.generation, self.vos_data.generation, self.ligo_dn_list.generation
+
+    def get_stashcache_artifact(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Get a StashCache/OSDF config file (or other artifact derived from the topology and VO data),
+        calling `compute()` only if it hasn't been generated since the data was last updated.
+
+        `key` must identify the artifact, e.g. ("cache_authfile", fqdn, legacy).
+        """
+        return self.stashcache_artifacts.get(self.get_stashcache_generation(), key, compute)
+
+    def get_response_artifact(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Get a serialized response (or other artifact derived from the topology, VO, and project data),
+        calling `compute()` only if it hasn't been generated since the data was last updated.
+
+        This does not refresh any data: call the getter(s) for the data the response is built from
+        first, so the response is generated from (and cached under) the latest data.
+
+        `key` must identify the response, e.g. (endpoint, filters, authorized).
+        """
+        return self.response_artifacts.get(self._get_response_generation(), key, compute)
+
+    def can_cache_response(self, key: Hashable) -> bool:
+        """Return True if get_response_artifact() has, or would keep, the response for `key`"""
+        return self.response_artifacts.can_keep(self._get_response_generation(), key)
+
+    def _get_response_generation(self) -> Tuple[int, int, int]:
+        return self.topology.generation, self.vos_data.generation, self.projects.generation
+
     def get_mappings(self, strict=None) -> Optional[mappings.Mappings]:
         """
         Get mappings data.
@@ -385,7 +1141,7 @@ class GlobalData:
         """
         if strict is None:
             strict = self.strict
-        if self.mappings.should_update():
+        if self._should_refresh(self.mappings):
             with topology_update_summary.time():
                 ok = self.maybe_update_topology_repo()
                 if ok:
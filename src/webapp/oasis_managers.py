@@ -2,12 +2,10 @@
 
 
 from webapp.common import safe_dict_get
-from webapp.ldap_data import get_cilogon_ldap_id_map
-from webapp.ldap_data import cilogon_id_map_to_ssh_keys
 from webapp.ldap_data import get_contact_cilogon_id_map
 
 
-def get_oasis_manager_endpoint_info(global_data, vo, ldappass):
+def get_oasis_manager_endpoint_info(global_data, vo):
     """ return list of oasis manager info for endpoint with the structure:
 
         [ {'ContactID': ContactID, 'Name': Name, 'DNs': DNs,
@@ -28,10 +26,8 @@ def get_oasis_manager_endpoint_info(global_data, vo, ldappass):
         if not managers:
             return []
 
-    ldap_url = global_data.cilogon_ldap_url
-    ldap_user = global_data.cilogon_ldap_user
-    cilogon_id_map = get_cilogon_ldap_id_map(ldap_url, ldap_user, ldappass)
-    ssh_keys_map = cilogon_id_map_to_ssh_keys(cilogon_id_map)
+    # the ssh keys come from the last cilogon ldap query, not a new one
+    ssh_keys_map = global_data.get_cilogon_ssh_keys_map() or {}
     contact_cilogon_ids = get_contact_cilogon_id_map(global_data)
 
     if vo == "*":
@@ -6,16 +6,15 @@ import logging
 import os
 import pprint
 import sys
-from typing import Dict
+from typing import Dict, Optional
 
 import yaml
 
 if __name__ == "__main__" and __package__ is None:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from webapp.common import load_yaml_file, to_xml, is_null, gen_id_from_yaml
+from webapp.common import load_yaml_file, preload_yaml_files, to_xml, is_null, gen_id_from_yaml
 from webapp.vo_reader import get_vos_data
-from webapp.vos_data import VOsData
 
 
 log = logging.getLogger(__name__)
@@ -45,13 +44,14 @@ def get_resource_allocation(ra: Dict, idx: int) -> OrderedDict:
     return new_ra
 
 
-def get_one_project(file: str, campus_grid_ids: Dict, vos_data: VOsData) -> Dict:
+def get_one_project(file: str, campus_grid_ids: Dict, vo_ids: Dict[str, str], load_yaml=load_yaml_file) -> Dict:
+    """Load one project file.  `vo_ids` maps VO names to IDs, e.g. from VOsData.get_vo_name_to_id()."""
     project = OrderedDict.fromkeys(["ID", "Name", "Description", "PIName", "Organization", "Department",
                                     "FieldOfScience", "Sponsor", "ResourceAllocations", "InstitutionID",
                                     "FieldOfScienceID"])
     data = None
     try:
-        data = load_yaml_file(file)
+        data = load_yaml(file)
         if 'Sponsor' in data:
             if 'CampusGrid' in data['Sponsor']:
                 name = data['Sponsor']['CampusGrid']['Name']
@@ -59,7 +59,7 @@ def get_one_project(file: str, campus_grid_ids: Dict, vos_data: VOsData) -> Dict
                 data['Sponsor']['CampusGrid'] = OrderedDict([("ID", ID), ("Name", name)])
             elif 'VirtualOrganization' in data['Sponsor']:
                 name = data['Sponsor']['VirtualOrganization']['Name']
-                ID = vos_data.vos[name]['ID']
+                ID = vo_ids[name]
                 data['Sponsor']['VirtualOrganization'] = OrderedDict([("ID", ID), ("Name", name)])
 
         if 'ResourceAllocations' in data:
@@ -86,12 +86,24 @@ def get_campus_grid_ids(indir="."):
     return load_yaml_file(os.path.join(indir, "_CAMPUS_GRIDS.yaml"))
 
 
-def get_projects(indir="../projects", strict=False):
+def get_projects(indir="../projects", strict=False, workers=0, vo_ids: Optional[Dict[str, str]] = None):
+    """Load the project data under `indir`.  If `workers` is 2 or more, the files are parsed up front
+    in that many processes.  `vo_ids` maps VO names to IDs; if not given, the VO data next to `indir`
+    is loaded to get it.
+    """
     to_output = {"Projects":{"Project": []}}
     projects = []
 
     campus_grid_ids = get_campus_grid_ids(indir)
-    vos_data = get_vos_data(os.path.join(indir, "../virtual-organizations"), None)
+    if vo_ids is None:
+        vo_ids = get_vos_data(os.path.join(indir, "../virtual-organizations"), None,
+                              workers=workers).get_vo_name_to_id()
+
+    load_yaml = load_yaml_file
+    if workers > 1:
+        load_yaml = preload_yaml_files([os.path.join(indir, file) for file in os.listdir(indir)
+                                        if file.endswith(".yaml") and not file.endswith("_CAMPUS_GRIDS.yaml")],
+                                       workers)
 
     for file in os.listdir(indir):
         if not file.endswith(".yaml"):
@@ -99,7 +111,7 @@ def get_projects(indir="../projects", strict=False):
         elif file.endswith("_CAMPUS_GRIDS.yaml"):
             continue
         try:
-            project = get_one_project(os.path.join(indir, file), campus_grid_ids, vos_data)
+            project = get_one_project(os.path.join(indir, file), campus_grid_ids, vo_ids, load_yaml)
             projects.append(project)
         except yaml.YAMLError:
             if strict:
@@ -22,7 +22,8 @@ import yaml
 if __name__ == "__main__" and __package__ is None:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from webapp.common import ensure_list, to_xml, Filters, load_yaml_file, gen_id_from_yaml
+from webapp.common import ensure_list, to_xml, Filters, load_yaml_file, gen_id_from_yaml, ParsedYamlCache, \
+    preload_yaml_files
 from webapp.contacts_reader import get_contacts_data
 from webapp.topology import CommonData, Topology
 
@@ -60,10 +61,28 @@ def get_rgsummary_rgdowntime(indir, contacts_file=None, authorized=False, strict
            topology.get_downtimes(authorized=authorized, filters=filters)
 
 
-def get_topology(indir="../topology", contacts_data=None, strict=False):
+def get_topology(indir="../topology", contacts_data=None, strict=False, yaml_cache: ParsedYamlCache = None,
+                 workers=0):
+    """Load the topology tree under `indir`.  If `yaml_cache` is given, files are loaded through it,
+    so only files not already in the cache are parsed.  If `workers` is 2 or more, the files are
+    parsed up front in that many processes.
+    """
     root = Path(indir)
-    support_centers = load_yaml_file(root / "support-centers.yaml")
-    service_types = load_yaml_file(root / "services.yaml")
+    parse = load_yaml_file
+    if workers > 1:
+        paths = [root / "support-centers.yaml", root / "services.yaml"]
+        paths.extend(root.glob("*/FACILITY.yaml"))
+        paths.extend(root.glob("*/*/*.yaml"))
+        if yaml_cache is not None:
+            paths = [p for p in paths if p not in yaml_cache]
+        parse = preload_yaml_files(paths, workers)
+    if yaml_cache is not None:
+        def load_yaml(filename):
+            return yaml_cache.load(filename, parse)
+    else:
+        load_yaml = parse
+    support_centers = load_yaml(root / "support-centers.yaml")
+    service_types = load_yaml(root / "services.yaml")
     tables = CommonData(contacts=contacts_data, service_types=service_types, support_centers=support_centers)
     topology = Topology(tables)
 
@@ -74,13 +93,13 @@ def get_topology(indir="../topology", contacts_data=None, strict=False):
             continue
         name = facility_path.parts[-1]
         facility_yaml_path = facility_path / 'FACILITY.yaml'
-        facility_data = load_yaml_file(facility_yaml_path) if facility_yaml_path.exists() else {}
+        facility_data = load_yaml(facility_yaml_path) if facility_yaml_path.exists() else {}
         id_ = gen_id_from_yaml(facility_data or {}, name)
         topology.add_facility(name, id_, facility_data['InstitutionID'] if 'InstitutionID' in facility_data else None)
     for site_path in root.glob("*/*/SITE.yaml"):
         facility, name = site_path.parts[-3:-1]
         assert facility in topology.facilities, f"Missing facility {facility} for site {name}"
-        site_info = load_yaml_file(site_path)
+        site_info = load_yaml(site_path)
         id_ = gen_id_from_yaml(site_info, name)
         topology.add_site(facility, name, id_, site_info)
     for yaml_path in root.glob("*/*/*.yaml"):
@@ -98,7 +117,7 @@ def get_topology(indir="../topology", contacts_data=None, strict=False):
                 log.error(skip_msg)
                 continue
         try:
-            rg = load_yaml_file(yaml_path)
+            rg = load_yaml(yaml_path)
         except yaml.YAMLError:
             if strict:
                 raise
@@ -110,7 +129,7 @@ def get_topology(indir="../topology", contacts_data=None, strict=False):
         downtimes = None
         if downtime_yaml_path.exists():
             try:
-                downtimes = ensure_list(load_yaml_file(downtime_yaml_path))
+                downtimes = ensure_list(load_yaml(downtime_yaml_path))
             except yaml.YAMLError:
                 if strict:
                     raise
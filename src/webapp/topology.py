@@ -1,9 +1,14 @@
+from bisect import bisect_left, bisect_right
+import calendar
 from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta, timezone
 from enum import Enum
+from functools import lru_cache
 from logging import getLogger
+import re
+import sys
 import urllib.parse
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import icalendar
 
@@ -11,7 +16,6 @@ from .common import RGDOWNTIME_SCHEMA_URL, RGSUMMARY_SCHEMA_URL, Filters, Parsed
     is_null, expand_attr_list_single, expand_attr_list, ensure_list, XROOTD_ORIGIN_SERVER, XROOTD_CACHE_SERVER, \
     gen_id_from_yaml, GRIDTYPE_1, GRIDTYPE_2, is_true, PELICAN_ORIGIN, PELICAN_CACHE
 from .contacts_reader import ContactsData, User
-from .exceptions import DataError
 
 log = getLogger(__name__)
 
@@ -25,6 +29,11 @@ class Timeframe(Enum):
 class TopologyError(Exception): pass
 
 
+def _intern(value):
+    """Intern `value` if it's a string, so the many copies of the same name or keyword share one object"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class CommonData(object):
     """Global data, e.g. various mappings and contacts info"""
     def __init__(self, contacts: ContactsData, service_types: Dict, support_centers: Dict):
@@ -41,76 +50,83 @@ class CommonData(object):
 
 
 class Facility(object):
+    __slots__ = ("name", "id", "institution_id", "sites_by_name", "is_ccstar", "_tree")
+
     def __init__(self, name: str, id: int, institution_id: str = None):
-        self.name = name
+        self.name = _intern(name)
         self.id = id
         self.institution_id = institution_id
         self.sites_by_name = dict()
+        # Whether any sites in this facility are tagged CC*
+        self.is_ccstar = False
+        self._tree = None  # type: Optional[OrderedDict]
 
     def get_tree(self) -> OrderedDict:
-        return OrderedDict([
-            ("ID", self.id),
-            ("InstitutionID", self.institution_id),
-            ("Name", self.name),
-            ("IsCCStar", self.is_ccstar)
-        ])
+        """Return the tree for this facility; it is shared, so don't modify it"""
+        if self._tree is None:
+            self._tree = OrderedDict([
+                ("ID", self.id),
+                ("InstitutionID", self.institution_id),
+                ("Name", self.name),
+                ("IsCCStar", self.is_ccstar)
+            ])
+
+        return self._tree
 
     def add_site(self, site: 'Site'):
         self.sites_by_name[site.name] = site
-        try:
-            del self._is_ccstar
-        except AttributeError:
-            pass
-
-    @property
-    def is_ccstar(self):
-        """Check if any sites in this facility are tagged CC*"""
-        if not hasattr(self, "_is_ccstar"):
-            self._is_ccstar = any(site.is_ccstar for site in self.sites_by_name.values())
-
-        return self._is_ccstar
+        # is_ccstar and the tree depend on the sites
+        self.is_ccstar = any(site.is_ccstar for site in self.sites_by_name.values())
+        self._tree = None
 
 
 class Site(object):
+    __slots__ = ("name", "id", "facility", "resource_groups_by_name", "other_data", "is_ccstar", "_tree")
+
     # probably will have some other attributes like address, latitude, longitude, etc.
     def __init__(self, name: str, id: int, facility: Facility, site_info):
-        self.name = name
+        self.name = _intern(name)
         self.id = id
         self.facility = facility
         self.resource_groups_by_name = {}
         self.other_data = site_info
         if "ID" in self.other_data:
             del self.other_data["ID"]
+        # Whether any resource groups in this site are tagged CC*
+        self.is_ccstar = False
+        self._tree = None  # type: Optional[OrderedDict]
 
     def get_tree(self) -> OrderedDict:
-        # Sort the other_data
-        sorted_other_data = sorted(list(self.other_data.items()), key=lambda tup: tup[0])
-        return OrderedDict(
-            [
-                ("ID", self.id),
-                ("Name", self.name),
-                ("IsCCStar", self.is_ccstar)
-            ] + sorted_other_data
-        )
+        """Return the tree for this site; it is shared, so don't modify it"""
+        if self._tree is None:
+            # Sort the other_data
+            sorted_other_data = sorted(list(self.other_data.items()), key=lambda tup: tup[0])
+            self._tree = OrderedDict(
+                [
+                    ("ID", self.id),
+                    ("Name", self.name),
+                    ("IsCCStar", self.is_ccstar)
+                ] + sorted_other_data
+            )
+
+        return self._tree
 
     def add_resource_group(self, resource_group: 'ResourceGroup'):
         self.resource_groups_by_name[resource_group.name] = resource_group
-        try:
-            del self._is_ccstar
-        except AttributeError:
-            pass
-
-    @property
-    def is_ccstar(self):
-        """Check if any resource groups in this site are tagged CC*"""
-        if not hasattr(self, "_is_ccstar"):
-            self._is_ccstar = any(resource_group.is_ccstar for resource_group in self.resource_groups_by_name.values())
-
-        return self._is_ccstar
+        # is_ccstar and the tree depend on the resource groups
+        self.is_ccstar = any(resource_group.is_ccstar for resource_group in self.resource_groups_by_name.values())
+        self._tree = None
+        # ...and so do the facility's; re-adding this site updates them
+        if self.name in self.facility.sites_by_name:
+            self.facility.add_site(self)
 
 class Resource(object):
+    __slots__ = ("name", "service_types", "common_data", "has_xrootd_cache", "has_xrootd_origin",
+                 "has_pelican_cache", "has_pelican_origin", "service_names", "services", "data", "fqdn", "id",
+                 "rg", "is_ccstar", "_base_trees")
+
     def __init__(self, name: str, yaml_data: ParsedYaml, common_data: CommonData, rg: "ResourceGroup"):
-        self.name = name
+        self.name = _intern(name)
         self.service_types = common_data.service_types
         self.common_data = common_data
         # Some "indexes" to speed up data lookup
@@ -142,107 +158,34 @@ class Resource(object):
         self.fqdn = self.data["FQDN"]
         self.id = self.data["ID"]
         self.rg = rg
+        # Whether this resource is tagged CC*
+        self.is_ccstar = "CC*" in self.data.get("Tags", [])
+        self._base_trees = {}  # type: Dict[bool, OrderedDict]
 
     def get_stashcache_files(self, global_data, legacy):
         """Gets a resources Cache files as a dictionary"""
-        # TODO Cache this.
-
         # Until https://opensciencegrid.atlassian.net/browse/SOFTWARE-5276, skip LIGO DNs
         # because otherwise each file hits the LIGO LDAP server.
         legacy = False
 
+        # The files for all resources are generated in one go and cached until the data changes
         import stashcache
-        cache_file_generators_and_file_names = [
-            (
-                lambda resource: stashcache.generate_public_cache_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    legacy=legacy,
-                    suppress_errors=False
-                ), "CacheAuthfilePublic"
-            ),
-            (
-                lambda resource: stashcache.generate_cache_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    legacy=legacy,
-                    suppress_errors=False
-                ), "CacheAuthfile"
-            ),
-            (
-                lambda resource: stashcache.generate_cache_scitokens(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False
-                ), "CacheScitokens"
-            ),
-        ]
-        origin_file_generators_and_file_names = [
-            (
-                lambda resource: stashcache.generate_origin_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False,
-                    public_origin=True
-                ), "OriginAuthfilePublic"
-            ),
-            (
-                lambda resource: stashcache.generate_origin_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False,
-                    public_origin=False
-                ), "OriginAuthfile"
-            ),
-            (
-                lambda resource: stashcache.generate_origin_scitokens(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False
-                ), "OriginScitokens"
-            ),
-        ]
-
-        stashcache_files = {}
-        if XROOTD_CACHE_SERVER in self.service_names:
-            for (file_generator, file_name) in cache_file_generators_and_file_names:
-                try:
-                    stashcache_files[file_name] = file_generator(self)
-                except (ValueError, DataError):
-                    continue
-        if XROOTD_ORIGIN_SERVER in self.service_names:
-            for (file_generator, file_name) in origin_file_generators_and_file_names:
-                try:
-                    stashcache_files[file_name] = file_generator(self)
-                except (ValueError, DataError):
-                    continue
-
-        stashcache_files = {k: v for k, v in stashcache_files.items() if v}  # Remove empty dicts
+        all_stashcache_files = global_data.get_stashcache_artifact(
+            ("resource_stashcache_files", legacy),
+            lambda: stashcache.generate_resource_stashcache_files(global_data, legacy=legacy)
+        )
 
-        return stashcache_files
+        return all_stashcache_files.get(self.name, {})
 
     def get_tree(self, authorized=False, filters: Filters = None) -> Optional[OrderedDict]:
         if filters is None:
             filters = Filters()
 
-        defaults = {
-            "Active": True,
-            "Description": "(No resource description)",
-            "Disable": False,
-            "VOOwnership": "(Information not available)",
-            "WLCGInformation": "(Information not available)",
-            "IsCCStar": self.is_ccstar
-        }
-
-        new_res = OrderedDict.fromkeys(["ID", "Name", "Active", "Disable", "Services", "Tags",
-                                        "Description", "FQDN", "FQDNAliases", "VOOwnership",
-                                        "WLCGInformation", "ContactLists", "IsCCStar"])
-        new_res.update(defaults)
-        new_res.update(self.data)
+        base = self._get_base_tree(authorized)
 
-        if filters.active is not None and new_res["Active"] != filters.active:
+        if filters.active is not None and base["Active"] != filters.active:
             return
-        if filters.disable is not None and new_res["Disable"] != filters.disable:
+        if filters.disable is not None and base["Disable"] != filters.disable:
             return
 
         filtered_services = self.services
@@ -255,12 +198,43 @@ class Resource(object):
                                  and svc["Details"]["hidden"] == filters.service_hidden]
         if not filtered_services:
             return  # all services filtered out
-        new_res["Services"] = {"Service": filtered_services}
 
         if filters.voown_name:
             if "VOOwnership" not in self.data \
                     or set(filters.voown_name).isdisjoint(self.data["VOOwnership"].keys()):
                 return
+        if filters.has_wlcg is True and not isinstance(self.data.get("WLCGInformation"), dict):
+            return
+
+        new_res = OrderedDict(base)
+        if filtered_services is not self.services:
+            new_res["Services"] = {"Service": filtered_services}
+        return new_res
+
+    def _get_base_tree(self, authorized: bool) -> OrderedDict:
+        """Return the tree for this resource with all its services, i.e. the parts that don't depend
+        on the filters.  It is computed once for each value of `authorized` and shared, so don't modify it.
+        """
+        authorized = bool(authorized)
+        if authorized in self._base_trees:
+            return self._base_trees[authorized]
+
+        defaults = {
+            "Active": True,
+            "Description": "(No resource description)",
+            "Disable": False,
+            "VOOwnership": "(Information not available)",
+            "WLCGInformation": "(Information not available)",
+            "IsCCStar": self.is_ccstar
+        }
+
+        new_res = OrderedDict.fromkeys(["ID", "Name", "Active", "Disable", "Services", "Tags",
+                                        "Description", "FQDN", "FQDNAliases", "VOOwnership",
+                                        "WLCGInformation", "ContactLists", "IsCCStar"])
+        new_res.update(defaults)
+        new_res.update(self.data)
+        new_res["Services"] = {"Service": self.services}
+
         if "VOOwnership" in self.data:
             new_res["VOOwnership"] = self._expand_voownership(self.data["VOOwnership"])
         if "FQDNAliases" in self.data:
@@ -270,8 +244,6 @@ class Resource(object):
         new_res["Name"] = self.name
         if "WLCGInformation" in self.data and isinstance(self.data["WLCGInformation"], dict):
             new_res["WLCGInformation"] = self._expand_wlcginformation(self.data["WLCGInformation"])
-        elif filters.has_wlcg is True:
-            return
         if "Tags" in self.data:
             new_res["Tags"] = self._expand_tags(self.data["Tags"])
 
@@ -283,6 +255,7 @@ class Resource(object):
         if 'AllowedVOs' in new_res:
             del new_res['AllowedVOs']
 
+        self._base_trees[authorized] = new_res
         return new_res
 
     @property
@@ -290,18 +263,10 @@ class Resource(object):
         """Check if the Resource is active and not disabled"""
         return self.data.get("Active", True) and not self.data.get("Disable", False)
 
-    @property
-    def is_ccstar(self):
-        """Check if this site is tagged as a CC* Site"""
-        if not hasattr(self, "_is_ccstar"):
-            self._is_ccstar = "CC*" in self.data.get("Tags", [])
-
-        return self._is_ccstar
-
-
     def _expand_services(self, services: Dict) -> List[OrderedDict]:
         services_list = expand_attr_list(services, "Name", ordering=["Name", "Description", "Details"])
         for svc in services_list:
+            svc["Name"] = _intern(svc["Name"])
             svc["ID"] = self.service_types[svc["Name"]]
             svc.move_to_end("ID", last=False)
         return services_list
@@ -384,17 +349,22 @@ class Resource(object):
 
 
 class ResourceGroup(object):
+    __slots__ = ("name", "site", "service_types", "common_data", "production", "support_center", "id",
+                 "resources_by_name", "data", "is_ccstar", "_base_tree")
+
     def __init__(self, name: str, yaml_data: ParsedYaml, site: Site, common_data: CommonData):
-        self.name = name
+        self.name = _intern(name)
         self.site = site
         self.service_types = common_data.service_types
         self.common_data = common_data
         self.production = is_true(yaml_data.get("Production", ""))
 
-        scname = yaml_data["SupportCenter"]
+        scname = _intern(yaml_data["SupportCenter"])
         scid = int(common_data.support_centers[scname]["ID"])
         self.support_center = OrderedDict([("ID", scid), ("Name", scname)])
 
+        self.id = gen_id_from_yaml(yaml_data, name, "GroupID")
+
         self.resources_by_name = {}
         for res_name, res in yaml_data["Resources"].items():
             try:
@@ -407,6 +377,9 @@ class ResourceGroup(object):
                 continue
 
         self.data = yaml_data
+        # Whether any resources in this resource group are tagged CC*
+        self.is_ccstar = any(resource.is_ccstar for resource in self.resources_by_name.values())
+        self._base_tree = None  # type: Optional[OrderedDict]
 
     @property
     def resources(self):
@@ -441,35 +414,28 @@ class ResourceGroup(object):
         if not filtered_resources:
             return  # all resources filtered out
         try:
-            filtered_data = self._expand_rg()
+            if self._base_tree is None:
+                self._base_tree = self._expand_rg()
+            filtered_data = OrderedDict(self._base_tree)
+            # These can change as resource groups are added, so they aren't part of the base tree
+            filtered_data["Facility"] = self.site.facility.get_tree()
+            filtered_data["Site"] = self.site.get_tree()
         except (AttributeError, KeyError, ValueError) as err:
             log.exception("Error with resource group %s/%s: %r", self.site, self.name, err)
             return
         filtered_data["Resources"] = {"Resource": filtered_resources}
         return filtered_data
 
-    @property
-    def id(self):
-        return gen_id_from_yaml(self.data, self.name, "GroupID")
-
     @property
     def key(self):
         return (self.site.name, self.name)
 
-    @property
-    def is_ccstar(self):
-        """Check if any resources in this resource group are tagged CC*"""
-        if not hasattr(self, "_is_ccstar"):
-            self._is_ccstar = any(resource.is_ccstar for resource in self.resources_by_name.values())
-
-        return self._is_ccstar
-
     def _expand_rg(self) -> OrderedDict:
         new_rg = OrderedDict.fromkeys(["GridType", "GroupID", "GroupName", "Disable", "Facility", "Site",
                                        "SupportCenter", "GroupDescription", "IsCCStar"])
         new_rg.update({"Disable": False})
         new_rg.update(self.data)
-        new_rg['GroupID'] = gen_id_from_yaml(self.data, self.name, "GroupID")
+        new_rg['GroupID'] = self.id
 
         new_rg["Facility"] = self.site.facility.get_tree()
         new_rg["Site"] = self.site.get_tree()
@@ -487,6 +453,16 @@ class ResourceGroup(object):
 class Downtime(object):
     TIME_OUTPUT_FMT = "%b %d, %Y %H:%M %p %Z"
     PREFERRED_TIME_FMT = "%b %d, %Y %H:%M %z"  # preferred format, e.g. "Mar 7, 2017 03:00 -0500"
+    # Matches the usual forms of all the formats accepted by parsetime() at once
+    # (the AM/PM is ignored by strptime too since the hour is a 24-hour clock hour)
+    _TIME_RE = re.compile(r"(?P<month>[a-z]{3})\s+(?P<day>\d{1,2}),\s+(?P<year>\d{4})\s+"
+                          r"(?P<hour>\d{1,2}):(?P<minute>\d{2})"
+                          r"(?:\s+(?:(?P<tzsign>[+-])(?P<tzhour>\d{2})(?P<tzminute>[0-5]\d)|(?:[ap]m\s+)?utc))?",
+                          re.IGNORECASE)
+    _MONTHS = {name.lower(): num for num, name in enumerate(calendar.month_abbr) if name}
+
+    __slots__ = ("rg", "data", "start_time", "end_time", "created_time", "res_name", "res", "service_names",
+                 "service_ids", "id", "_ical_event_bytes")
 
     def __init__(self, rg: ResourceGroup, yaml_data: ParsedYaml, common_data: CommonData):
         self.rg = rg
@@ -496,6 +472,9 @@ class Downtime(object):
         for k in ["StartTime", "EndTime", "ID", "Class", "Severity", "ResourceName", "Services"]:
             if is_null(yaml_data, k):
                 raise ValueError(f"{k} is missing or empty")
+        # There are only a few distinct values of these, repeated across all downtimes
+        for k in ["Class", "Severity", "ResourceName"]:
+            yaml_data[k] = _intern(yaml_data[k])
         self.start_time = self.parsetime(yaml_data["StartTime"])
         self.end_time = self.parsetime(yaml_data["EndTime"])
         self.created_time = None
@@ -503,9 +482,10 @@ class Downtime(object):
             self.created_time = self.parsetime(yaml_data["CreatedTime"])
         self.res_name = yaml_data["ResourceName"]
         self.res = rg.resources_by_name[self.res_name]
-        self.service_names = yaml_data["Services"]
+        self.service_names = [_intern(x) for x in yaml_data["Services"]]
         self.service_ids = [common_data.service_types[x] for x in yaml_data["Services"]]
         self.id = yaml_data["ID"]
+        self._ical_event_bytes = None  # type: Optional[bytes]
 
     @property
     def timeframe(self) -> Timeframe:
@@ -560,7 +540,20 @@ class Downtime(object):
     def get_ical_event(self, filters: Filters = None) -> Optional[icalendar.Event]:
         if not self._is_shown(filters):
             return None
+        return self._make_ical_event()
 
+    def get_ical_event_bytes(self, filters: Filters = None) -> bytes:
+        """Return the rendered VEVENT for this downtime, or b"" if it's filtered out or malformed.
+        The event is only rendered the first time; later calls return the same bytes.
+        """
+        if not self._is_shown(filters):
+            return b""
+        if self._ical_event_bytes is None:
+            evt = self._make_ical_event()
+            self._ical_event_bytes = evt.to_ical() if evt else b""
+        return self._ical_event_bytes
+
+    def _make_ical_event(self) -> Optional[icalendar.Event]:
         evt = icalendar.Event()
         try:
             evt["uid"] = str(self.data.get("ID", 0))
@@ -637,7 +630,27 @@ class Downtime(object):
 
         Raises ValueError if time_str cannot be parsed with any of the formats.
         """
+        return cls._parsetime_memo(time_str)
 
+    @staticmethod
+    @lru_cache(maxsize=32768)
+    def _parsetime_memo(time_str: str) -> datetime:
+        match = Downtime._TIME_RE.fullmatch(time_str)
+        if match:
+            try:
+                tz = timezone.utc
+                if match["tzsign"]:
+                    offset = timedelta(hours=int(match["tzhour"]), minutes=int(match["tzminute"]))
+                    tz = timezone(-offset if match["tzsign"] == "-" else offset)
+                time = datetime(int(match["year"]), Downtime._MONTHS[match["month"].lower()], int(match["day"]),
+                                int(match["hour"]), int(match["minute"]), tzinfo=tz)
+                return time.astimezone(timezone.utc)
+            except (KeyError, ValueError):
+                pass  # out of range; let strptime decide
+        return Downtime._parsetime_strptime(time_str)
+
+    @classmethod
+    def _parsetime_strptime(cls, time_str: str) -> datetime:
         fmts = [cls.PREFERRED_TIME_FMT,
                 "%b %d, %Y %H:%M UTC",  # explicit UTC timezone
                 "%b %d, %Y %H:%M",  # without timezone (assumes UTC)
@@ -658,12 +671,165 @@ class Downtime(object):
         raise ValueError("Cannot parse time {}".format(time_str))
 
 
+def _new_ical_calendar() -> icalendar.Calendar:
+    cal = icalendar.Calendar()
+    cal.add("prodid", "-//Open Science Grid//Topology//EN")
+    cal.add("version", "2.0")
+    return cal
+
+
+class DowntimeIndex(object):
+    """Downtimes indexed by start and end time, so the past, present, and future downtimes as of
+    any moment can be found with a binary search instead of being sorted into timeframes once,
+    when they are loaded.  Lookups return downtimes in the order they were added.
+    """
+    def __init__(self):
+        self.downtimes = []  # type: List[Downtime]
+        # The longest downtime; present downtimes started no earlier than this before now
+        self.max_duration = timedelta(0)
+        # (start times, indexes by start time, end times, indexes by end time); built on first lookup
+        self._sorted = None  # type: Optional[Tuple[List[datetime], List[int], List[datetime], List[int]]]
+
+    def __len__(self):
+        return len(self.downtimes)
+
+    def __iter__(self):
+        return iter(self.downtimes)
+
+    def add(self, dt: Downtime):
+        self.downtimes.append(dt)
+        self.max_duration = max(self.max_duration, dt.end_time - dt.start_time)
+        self._sorted = None
+
+    def _get_sorted(self) -> Tuple[List[datetime], List[int], List[datetime], List[int]]:
+        sorted_ = self._sorted
+        if sorted_ is None:
+            by_start = sorted(range(len(self.downtimes)), key=lambda i: self.downtimes[i].start_time)
+            by_end = sorted(range(len(self.downtimes)), key=lambda i: self.downtimes[i].end_time)
+            sorted_ = ([self.downtimes[i].start_time for i in by_start], by_start,
+                       [self.downtimes[i].end_time for i in by_end], by_end)
+            self._sorted = sorted_
+        return sorted_
+
+    def _select(self, indexes: Iterable[int]) -> List[Downtime]:
+        return [self.downtimes[i] for i in sorted(indexes)]
+
+    def past(self, now: datetime, since: Optional[datetime] = None) -> List[Downtime]:
+        """Return the downtimes that ended before `now` (and, if given, no earlier than `since`)"""
+        _, _, ends, by_end = self._get_sorted()
+        lo = 0 if since is None else bisect_left(ends, since)
+        return self._select(by_end[lo:bisect_left(ends, now)])
+
+    def present(self, now: datetime) -> List[Downtime]:
+        """Return the downtimes that are in progress at `now`"""
+        starts, by_start, _, _ = self._get_sorted()
+        lo = bisect_left(starts, now - self.max_duration)
+        hi = bisect_right(starts, now)
+        return self._select(i for i in by_start[lo:hi] if self.downtimes[i].end_time >= now)
+
+    def future(self, now: datetime) -> List[Downtime]:
+        """Return the downtimes that start after `now`"""
+        starts, by_start, _, _ = self._get_sorted()
+        return self._select(i for i in by_start[bisect_right(starts, now):] if self.downtimes[i].end_time >= now)
+
+    def select(self, indexes: Iterable[int], now: datetime, since: Optional[datetime] = None) \
+            -> Tuple[List[Downtime], List[Downtime], List[Downtime]]:
+        """Return the downtimes at `indexes` (positions in the order the downtimes were added) that
+        past(now, since), present(now), and future(now) would return, without searching all downtimes.
+        """
+        past, present, future = [], [], []
+        for i in sorted(indexes):
+            dt = self.downtimes[i]
+            if dt.end_time < now:
+                if since is None or dt.end_time >= since:
+                    past.append(dt)
+            elif dt.start_time > now:
+                future.append(dt)
+            else:
+                present.append(dt)
+        return past, present, future
+
+    def epoch(self, now: datetime) -> int:
+        """Return the number of downtime start and end times that have passed by `now`.
+        This changes exactly when some downtime moves to a different timeframe.
+        """
+        starts, _, ends, _ = self._get_sorted()
+        return bisect_right(starts, now) + bisect_left(ends, now)
+
+
+class FilterIndex(object):
+    """Secondary indexes from the IDs that Filters select on (facility, site, support center,
+    resource group, and service IDs) to the resource groups and downtimes that have them, so that
+    filtered queries only look at the entities that can match.
+    """
+    # Filters attribute -> function returning the IDs a resource group has for it
+    RG_KEYS = {
+        "facility_id": lambda rg: [rg.site.facility.id],
+        "site_id": lambda rg: [rg.site.id],
+        "support_center_id": lambda rg: [rg.support_center["ID"]],
+        "rg_id": lambda rg: [rg.id],
+        "service_id": lambda rg: [svc["ID"] for res in rg.resources for svc in res.services if "ID" in svc],
+    }
+    # Filters attribute -> function returning the IDs a downtime has for it
+    DOWNTIME_KEYS = {
+        "facility_id": lambda dt: [dt.rg.site.facility.id],
+        "site_id": lambda dt: [dt.rg.site.id],
+        "support_center_id": lambda dt: [dt.rg.support_center["ID"]],
+        "rg_id": lambda dt: [dt.rg.id],
+        "service_id": lambda dt: dt.service_ids,
+    }
+
+    def __init__(self, rgs: List[ResourceGroup], downtimes: List[Downtime]):
+        self.rgs = rgs
+        self.rgs_by = self._build(rgs, self.RG_KEYS)
+        self.downtimes_by = self._build(downtimes, self.DOWNTIME_KEYS)
+
+    @staticmethod
+    def _build(items: List, keys: Dict) -> Dict[str, Dict[object, List[int]]]:
+        index = {}
+        for attr, get_ids in keys.items():
+            positions_by_id = defaultdict(list)
+            for position, item in enumerate(items):
+                try:
+                    ids = get_ids(item)
+                except (AttributeError, KeyError, ValueError):
+                    continue  # the query will log this when it gets to the entity
+                for id_ in set(ids):
+                    positions_by_id[id_].append(position)
+            index[attr] = dict(positions_by_id)
+        return index
+
+    @staticmethod
+    def _select(index: Dict[str, Dict[object, List[int]]], filters: Filters) -> Optional[Set[int]]:
+        """Return the positions of the items that have an ID in each ID list set in `filters`,
+        or None if no ID list is set.
+        """
+        selected = None
+        for attr, positions_by_id in index.items():
+            filter_list = getattr(filters, attr)
+            if not filter_list:
+                continue
+            matches = set()
+            for id_ in filter_list:
+                matches.update(positions_by_id.get(id_, ()))
+            selected = matches if selected is None else selected & matches
+        return selected
+
+    def select_rgs(self, filters: Filters) -> List[ResourceGroup]:
+        """Return the resource groups that may match `filters`, sorted by name"""
+        selected = self._select(self.rgs_by, filters)
+        if selected is None:
+            return self.rgs
+        return [self.rgs[i] for i in sorted(selected)]
+
+    def select_downtimes(self, filters: Filters) -> Optional[Set[int]]:
+        """Return the positions of the downtimes that may match `filters`, or None for all of them"""
+        return self._select(self.downtimes_by, filters)
+
+
 class Topology(object):
     def __init__(self, common_data: CommonData):
-        self.downtimes_by_timeframe = {
-            Timeframe.PAST: [],
-            Timeframe.PRESENT: [],
-            Timeframe.FUTURE: []}
+        self.downtimes = DowntimeIndex()
         self.common_data = common_data
         self.facilities = {}
         self.sites = {}
@@ -678,9 +844,24 @@ class Topology(object):
         self.service_names_by_resource = {}  # type: Dict[str, List[str]]
         self.downtime_path_by_resource_group = defaultdict(set)
         self.downtime_path_by_resource = {}
-        self.present_downtimes_by_resource = defaultdict(list)  # type: defaultdict[str, List[Downtime]]
+
+    def get_filter_index(self) -> FilterIndex:
+        """Return the secondary indexes of the resource groups and downtimes, building them the first time"""
+        if not hasattr(self, "_filter_index"):
+            rgs = [self.rgs[key] for key in sorted(self.rgs.keys(), key=lambda x: x[1].lower())]
+            self._filter_index = FilterIndex(rgs, self.downtimes.downtimes)
+
+        return self._filter_index
+
+    def _invalidate_filter_index(self):
+        try:
+            del self._filter_index
+        except AttributeError:
+            pass
 
     def add_rg(self, facility_name: str, site_name: str, name: str, parsed_data: ParsedYaml):
+        self._invalidate_filter_index()
+        facility_name, site_name = _intern(facility_name), _intern(site_name)
         try:
             rg = ResourceGroup(name, parsed_data, self.sites[site_name], self.common_data)
             self.rgs[(site_name, name)] = rg
@@ -697,12 +878,13 @@ class Topology(object):
             log.exception("RG %s, %s error: %r; skipping", site_name, name, err)
 
     def add_facility(self, name, id, institution_id=None):
-        self.facilities[name] = Facility(name, id, institution_id)
+        facility = Facility(name, id, institution_id)
+        self.facilities[facility.name] = facility
 
     def add_site(self, facility_name, name, id, site_info):
         site = Site(name, id, self.facilities[facility_name], site_info)
         self.facilities[facility_name].add_site(site)
-        self.sites[name] = site
+        self.sites[site.name] = site
 
     def get_resource_group_list(self):
         """
@@ -714,8 +896,7 @@ class Topology(object):
         if filters is None:
             filters = Filters()
         rglist = []
-        for rgkey in sorted(self.rgs.keys(), key=lambda x: x[1].lower()):
-            rgval = self.rgs[rgkey]
+        for rgval in self.get_filter_index().select_rgs(filters):
             assert isinstance(rgval, ResourceGroup)
             rgtree = rgval.get_tree(authorized, filters)
             if rgtree:
@@ -725,6 +906,20 @@ class Topology(object):
                  "@xsi:schemaLocation": RGSUMMARY_SCHEMA_URL,
                  "ResourceGroup": rglist}}
 
+    def _get_downtimes_by_timeframe(self, filters: Filters) -> List[Tuple[Timeframe, List[Downtime]]]:
+        now = datetime.now(timezone.utc)
+        since = None
+        if filters.past_days >= 0:
+            # Downtimes that ended more than past_days ago are not shown; don't bother looking at them
+            since = now - timedelta(days=filters.past_days)
+        selected = self.get_filter_index().select_downtimes(filters)
+        if selected is not None:
+            return list(zip([Timeframe.PAST, Timeframe.PRESENT, Timeframe.FUTURE],
+                            self.downtimes.select(selected, now, since)))
+        return [(Timeframe.PAST, self.downtimes.past(now, since)),
+                (Timeframe.PRESENT, self.downtimes.present(now)),
+                (Timeframe.FUTURE, self.downtimes.future(now))]
+
     def get_downtimes(self, authorized=False, filters: Filters = None) -> Dict:
         _ = authorized
         if filters is None:
@@ -733,11 +928,12 @@ class Topology(object):
         tree = {"Downtimes": {"@xsi:schemaLocation": RGDOWNTIME_SCHEMA_URL,
                               "@xmlns:xsi": "http://www.w3.org/2001/XMLSchema-instance"}}
 
-        for treekey, dtkey in [("PastDowntimes", Timeframe.PAST),
-                               ("CurrentDowntimes", Timeframe.PRESENT),
-                               ("FutureDowntimes", Timeframe.FUTURE)]:
+        treekeys = {Timeframe.PAST: "PastDowntimes",
+                    Timeframe.PRESENT: "CurrentDowntimes",
+                    Timeframe.FUTURE: "FutureDowntimes"}
+        for timeframe, downtimes in self._get_downtimes_by_timeframe(filters):
             dtlist = []
-            for dt in self.downtimes_by_timeframe[dtkey]:
+            for dt in downtimes:
                 try:
                     dttree = dt.get_tree(filters)
                 except (AttributeError, KeyError, ValueError) as err:
@@ -745,7 +941,7 @@ class Topology(object):
                     continue
                 if dttree:
                     dtlist.append(dttree)
-            tree["Downtimes"][treekey] = {
+            tree["Downtimes"][treekeys[timeframe]] = {
                 "Downtime": dtlist}
 
         return tree
@@ -755,12 +951,10 @@ class Topology(object):
         if filters is None:
             filters = Filters()
 
-        cal = icalendar.Calendar()
-        cal.add("prodid", "-//Open Science Grid//Topology//EN")
-        cal.add("version", "2.0")
+        cal = _new_ical_calendar()
 
-        for tf in [Timeframe.PAST, Timeframe.PRESENT, Timeframe.FUTURE]:
-            for dt in self.downtimes_by_timeframe[tf]:
+        for _, downtimes in self._get_downtimes_by_timeframe(filters):
+            for dt in downtimes:
                 try:
                     event = dt.get_ical_event(filters)
                 except (AttributeError, KeyError, ValueError) as err:
@@ -771,6 +965,45 @@ class Topology(object):
 
         return cal
 
+    def get_downtimes_ical_bytes(self, authorized=False, filters: Filters = None) -> bytes:
+        """Return the same calendar as get_downtimes_ical(), already serialized.  Each downtime's
+        event is rendered once and reused, so this is much faster than calling to_ical() on the
+        result of get_downtimes_ical().
+        """
+        _ = authorized
+        if filters is None:
+            filters = Filters()
+
+        # The calendar without any events, split where the events go
+        begin, end = _new_ical_calendar().to_ical().rsplit(b"END:VCALENDAR", 1)
+        chunks = [begin]
+        for _, downtimes in self._get_downtimes_by_timeframe(filters):
+            for dt in downtimes:
+                try:
+                    chunks.append(dt.get_ical_event_bytes(filters))
+                except (AttributeError, KeyError, ValueError) as err:
+                    log.exception("Error with downtime %s: %r", dt, err)
+        chunks.append(b"END:VCALENDAR" + end)
+
+        return b"".join(chunks)
+
+    def get_present_downtimes_by_resource(self, now: Optional[datetime] = None) -> Dict[str, List[Downtime]]:
+        """Return the downtimes in progress at `now` (default: the current time), keyed by resource name"""
+        if now is None:
+            now = datetime.now(timezone.utc)
+        present_downtimes_by_resource = defaultdict(list)
+        for dt in self.downtimes.present(now):
+            present_downtimes_by_resource[dt.res_name].append(dt)
+        return present_downtimes_by_resource
+
+    def downtime_epoch(self, now: Optional[datetime] = None) -> int:
+        """Return a number that changes whenever a downtime starts or ends, for use in cache keys
+        of data that depends on which downtimes are in progress.
+        """
+        if now is None:
+            now = datetime.now(timezone.utc)
+        return self.downtimes.epoch(now)
+
     def add_downtime(self, sitename: str, rgname: str, downtime: ParsedYaml):
         try:
             rg = self.rgs[(sitename, rgname)]
@@ -794,9 +1027,8 @@ class Topology(object):
         except TypeError as err:
             log.warning("Invalid type in downtime(s) -- skipping: %r", err)
             return
-        self.downtimes_by_timeframe[dt.timeframe].append(dt)
-        if dt.timeframe == Timeframe.PRESENT:
-            self.present_downtimes_by_resource[dt.res_name].append(dt)
+        self.downtimes.add(dt)
+        self._invalidate_filter_index()
 
     def safe_get_resource_by_fqdn(self, fqdn: str) -> Optional[Resource]:
         """Returns the first resource that has the given FQDN or None if no such resource exists."""
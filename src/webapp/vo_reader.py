@@ -11,7 +11,7 @@ import yaml
 if __name__ == "__main__" and __package__ is None:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from webapp.common import load_yaml_file, to_xml, ParsedYaml
+from webapp.common import load_yaml_file, preload_yaml_files, to_xml, ParsedYaml
 from webapp.contacts_reader import get_contacts_data
 from webapp.vos_data import VOsData
 
@@ -19,15 +19,22 @@ from webapp.vos_data import VOsData
 log = logging.getLogger(__name__)
 
 
-def get_vos_data(indir, contacts_data, strict=False) -> VOsData:
-    reporting_groups_data = load_yaml_file(os.path.join(indir, "REPORTING_GROUPS.yaml"))
+def get_vos_data(indir, contacts_data, strict=False, workers=0) -> VOsData:
+    """Load the VO data under `indir`.  If `workers` is 2 or more, the files are parsed up front
+    in that many processes.
+    """
+    load_yaml = load_yaml_file
+    if workers > 1:
+        load_yaml = preload_yaml_files([os.path.join(indir, file) for file in os.listdir(indir)
+                                        if file.endswith(".yaml")], workers)
+    reporting_groups_data = load_yaml(os.path.join(indir, "REPORTING_GROUPS.yaml"))
     vos_data = VOsData(contacts_data=contacts_data, reporting_groups_data=reporting_groups_data)
     for file in os.listdir(indir):
         if file == "REPORTING_GROUPS.yaml": continue
         if not file.endswith(".yaml"): continue
         name = file[:-5]
         try:
-            data = load_yaml_file(os.path.join(indir, file))
+            data = load_yaml(os.path.join(indir, file))
             vos_data.add_vo(name, data)
         except yaml.YAMLError:
             if strict:
@@ -2,10 +2,10 @@ import copy
 
 from collections import OrderedDict
 from logging import getLogger
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from .common import Filters, ParsedYaml, VOSUMMARY_SCHEMA_URL, is_null, expand_attr_list, order_dict, escape, gen_id_from_yaml
-from .data_federation import StashCache
+from .data_federation import AuthzIndex, Namespace, StashCache
 from .contacts_reader import ContactsData
 
 
@@ -16,15 +16,32 @@ class VOsData(object):
     def __init__(self, contacts_data: ContactsData, reporting_groups_data: ParsedYaml):
         self.contacts_data = contacts_data
         self.vos = {}  # type: Dict[str, ParsedYaml]
+        self.vo_names_by_id = {}  # type: Dict[int, str]
         self.reporting_groups_data = reporting_groups_data
         self.stashcache_by_vo_name = {}  # type: Dict[str, StashCache]
+        self._authz_index = None  # type: Optional[AuthzIndex]
+        self._authz_index_topology = None
+
+    def __getstate__(self):
+        # Don't pickle the authz index; it refers to a topology that won't be the one it's used with
+        state = self.__dict__.copy()
+        state["_authz_index"] = None
+        state["_authz_index_topology"] = None
+        return state
 
     def get_vo_id_to_name(self) -> Dict[str, str]:
-        return {self.vos[name]["ID"]: name for name in self.vos}
+        """Return the VO name for each VO ID.  The dict is shared, so don't modify it."""
+        return self.vo_names_by_id
+
+    def get_vo_name_to_id(self) -> Dict[str, str]:
+        return {name: self.vos[name]["ID"] for name in self.vos}
 
     def add_vo(self, vo_name: str, vo_data: ParsedYaml):
         vo_data["ID"] = gen_id_from_yaml(vo_data, vo_name)
+        if vo_name in self.vos:
+            self.vo_names_by_id.pop(self.vos[vo_name]["ID"], None)
         self.vos[vo_name] = vo_data
+        self.vo_names_by_id[vo_data["ID"]] = vo_name
         stashcache_data = vo_data.get('DataFederations', {}).get('StashCache')
         if stashcache_data:
             stashcache_obj = StashCache(vo_name, stashcache_data)
@@ -33,6 +50,25 @@ class VOsData(object):
                               vo_name, "\n".join(stashcache_obj.errors))
             else:
                 self.stashcache_by_vo_name[vo_name] = stashcache_obj
+                self._authz_index = None
+
+    def get_vo_namespaces(self) -> Iterable[Tuple[str, Namespace]]:
+        """Iterate over (VO name, Namespace) pairs for every namespace of every VO."""
+        for vo_name, stashcache_obj in self.stashcache_by_vo_name.items():
+            for namespace in stashcache_obj.namespaces.values():
+                yield vo_name, namespace
+
+    def get_authz_index(self, topology) -> AuthzIndex:
+        """Return the index of which caches and origins in `topology` support which namespaces.
+        The index is built on first use and kept until a VO is added or a different topology is passed.
+        """
+        if self._authz_index is None or self._authz_index_topology is not topology:
+            resources = (resource
+                         for group in topology.get_resource_group_list()
+                         for resource in group.resources)
+            self._authz_index = AuthzIndex(self.get_vo_namespaces(), resources)
+            self._authz_index_topology = topology
+        return self._authz_index
 
     def get_expansion(self, authorized=False, filters: Filters = None):
         if not filters: